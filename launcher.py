@@ -98,7 +98,7 @@ def view_project_info():
     print("\nPROJECT INFORMATION")
     print("=" * 30)
     print("Name: TLS Bypass Rule Manager")
-    print("Version: 2.0")
+    print("Version: 3.0")
     print("Author: Security Tools Team")
     print("License: MIT")
     print(f"Current Directory: {os.getcwd()}")
@@ -320,14 +320,17 @@ def auto_update_rule_file_version():
             elif line.startswith("# Last Updated:"):
                 last_updated_line = i
         
-        # Automatically update both version and timestamp
+        # Keep the declared format version (RuleManager migrates older
+        # files itself); files without one are treated as v2
         new_version = "2.0"
+        if version_line is not None:
+            new_version = lines[version_line].split(":", 1)[1].strip() or new_version
         new_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # Update version line
         if version_line is not None:
             lines[version_line] = f"# Version: {new_version}\n"
-            print(f"Version updated to {new_version}")
+            print(f"Version kept at {new_version}")
         else:
             # Insert after the first line if no version line exists
             lines.insert(1, f"# Version: {new_version}\n")
@@ -363,11 +366,12 @@ def create_default_rule_file(rule_file):
     with open(rule_file, 'w', encoding="utf-8") as f:
         f.write(
             "# TLS BYPASS RULE\n"
-            "# Version: 2.0\n"
+            "# Version: 3.0\n"
             f"# Last Updated: {datetime.now()}\n"
             "# For authorized security testing only\n\n"
             "[BLOCK_HOSTS]\n\n"
-            "[BLOCK_RULES]\n"
+            "[BLOCK_RULES]\n\n"
+            "[BLOCK_CIDRS]\n"
         )
 
 
@@ -552,8 +556,11 @@ def auto_update_rule_file_if_needed():
             elif line.startswith("# Last Updated:"):
                 last_updated_line = i
         
-        # Automatically update both version and timestamp
+        # Keep the declared format version (RuleManager migrates older
+        # files itself); files without one are treated as v2
         new_version = "2.0"
+        if version_line is not None:
+            new_version = lines[version_line].split(":", 1)[1].strip() or new_version
         new_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # Update version line
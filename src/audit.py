@@ -0,0 +1,147 @@
+from typing import Dict, Iterable, List, Tuple
+
+from cidr import CIDRTable, nested_ranges
+from matcher import RuleMatcher
+from minimize import _shape
+
+
+# Unmatched hosts listed in the report
+MAX_SAMPLES = 20
+
+# Rule pairs listed in the report, most shared hosts first
+TOP_OVERLAPS = 20
+
+
+def _bit_indices(bits: int) -> List[int]:
+    indices = []
+    while bits:
+        low = bits & -bits
+        indices.append(low.bit_length() - 1)
+        bits ^= low
+    return indices
+
+
+def _shadowed_rules(rules: Iterable[Tuple[str, str]]) -> Tuple[Dict[str, List[str]], List[CIDRTable]]:
+    """
+    Find the rules the matcher tables drop, so the audit can still count them.
+
+    The tables keep one pattern per host and per suffix, and only the
+    outermost of nested CIDRs. Returns the patterns sharing a host or
+    suffix key, by the pattern the tables kept for it, and one CIDRTable
+    per nesting level below the outermost.
+    """
+    kept: Dict[Tuple[str, str], str] = {}
+    duplicates: Dict[str, List[str]] = {}
+    networks = []
+    for pattern, rule_type in rules:
+        kind, name = _shape({"pattern": pattern, "type": rule_type})
+        if kind == "cidr":
+            if name is not None:
+                networks.append((name, pattern))
+        elif kind in ("host", "suffix"):
+            owner = kept.setdefault((kind, name), pattern)
+            if owner != pattern:
+                duplicates.setdefault(owner, []).append(pattern)
+    return duplicates, [CIDRTable(layer) for layer in nested_ranges(networks)[1:]]
+
+
+def audit_rules(matcher: RuleMatcher, rules: List[Tuple[str, str]], hosts: Iterable[str]) -> Dict:
+    """
+    Measure how the rules cover a host corpus and how they overlap on it.
+
+    rules are the (pattern, rule_type) pairs of the enabled rules, in the
+    order the matcher tables were built from.
+
+    Each host goes through matcher.match_all once, plus the rules its
+    tables drop: a second rule on the same host or suffix fires with the
+    one kept, and a CIDR nested in another is looked up on its own. The
+    rules it matches
+    form its signature, a Python int bitset with one bit per rule;
+    hosts are grouped by signature, and real corpora have few distinct
+    signatures, so everything below is computed per signature instead of
+    per host or per rule pair:
+
+    - coverage: hosts each rule matches
+    - overlaps: hosts each pair of rules both match
+    - subsumed: rules whose every matched host is also matched by other
+      rules, found by ANDing the signatures that contain the rule
+    - unmatched: hosts no rule matches
+
+    Returns:
+        Dict: "hosts", "matched", "unmatched" (count) and "unmatched_samples",
+        "rules" ({"pattern", "coverage"} in patterns order, duplicates
+        once), "unused" (patterns matching no host), "overlaps" ({"rules",
+        "hosts"}, most shared first, at most TOP_OVERLAPS) and "subsumed"
+        ({"pattern", "coverage", "covered_by"})
+    """
+    patterns = [pattern for pattern, _ in rules]
+    known = set(patterns)
+    duplicates, inner_networks = _shadowed_rules(rules)
+    # Bits are given out to rules as they first match, so rules that never
+    # match (most host rules, on a large rule file) cost nothing
+    index: Dict[str, int] = {}
+    fired: List[str] = []
+
+    signatures: Dict[int, int] = {}
+    total = 0
+    unmatched_samples = []
+    for host in hosts:
+        total += 1
+        signature = 0
+        matched = matcher.match_all(host)
+        for pattern in matched[:]:
+            matched.extend(duplicates.get(pattern, ()))
+        for table in inner_networks:
+            pattern = table.match(host)
+            if pattern is None:
+                break
+            matched.append(pattern)
+        for pattern in matched:
+            position = index.get(pattern)
+            if position is None:
+                if pattern not in known:
+                    continue
+                position = index[pattern] = len(fired)
+                fired.append(pattern)
+            signature |= 1 << position
+        signatures[signature] = signatures.get(signature, 0) + 1
+        if not signature and len(unmatched_samples) < MAX_SAMPLES and host not in unmatched_samples:
+            unmatched_samples.append(host)
+
+    coverage = [0] * len(fired)
+    # Per rule: AND of the signatures containing it, i.e. the rules that fire whenever it does
+    always_with: Dict[int, int] = {}
+    overlaps: Dict[Tuple[int, int], int] = {}
+    for signature, count in signatures.items():
+        members = _bit_indices(signature)
+        for position, member in enumerate(members):
+            coverage[member] += count
+            always_with[member] = always_with.get(member, signature) & signature
+            for other in members[position + 1:]:
+                pair = (member, other)
+                overlaps[pair] = overlaps.get(pair, 0) + count
+
+    subsumed = []
+    for member, common in sorted(always_with.items()):
+        others = common & ~(1 << member)
+        if others:
+            subsumed.append({
+                "pattern": fired[member],
+                "coverage": coverage[member],
+                "covered_by": [fired[other] for other in _bit_indices(others)],
+            })
+
+    top_pairs = sorted(overlaps.items(), key=lambda item: (-item[1], item[0]))[:TOP_OVERLAPS]
+    unmatched = signatures.get(0, 0)
+    return {
+        "hosts": total,
+        "matched": total - unmatched,
+        "unmatched": unmatched,
+        "unmatched_samples": unmatched_samples,
+        "rules": [{"pattern": pattern, "coverage": coverage[index[pattern]] if pattern in index else 0}
+                  for pattern in dict.fromkeys(patterns)],
+        "unused": [pattern for pattern in dict.fromkeys(patterns) if pattern not in index],
+        "overlaps": [{"rules": (fired[first], fired[second]), "hosts": count}
+                     for (first, second), count in top_pairs],
+        "subsumed": subsumed,
+    }
@@ -0,0 +1,182 @@
+import random
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from cidr import parse_address
+from matcher import RuleMatcher
+
+try:  # Optional: vectorised lookups for large host corpora
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy not installed
+    np = None
+
+
+# Hosts classified per vectorised batch; bounds the size of the hash arrays
+BATCH_SIZE = 100000
+
+
+# Label-suffix hashes are polynomial hashes modulo two primes, combined into
+# one int64; the bases are drawn per process so collisions cannot be planned
+_MODULI = (2147483647, 2147483629)
+_BASES = tuple(random.SystemRandom().randrange(256, modulus - 1) for modulus in _MODULI)
+
+
+def suffix_hash(text: str) -> int:
+    """Return the hash BatchMatcher computes for text (a host or a suffix such as ".example.com")."""
+    combined = 0
+    for base, modulus in zip(_BASES, _MODULI):
+        value = 0
+        for byte in text.encode("utf-8"):
+            value = (value * base + byte) % modulus
+        combined = (combined << 32) | value
+    return combined
+
+
+class BatchMatcher:
+    """
+    Vectorised exact-host and subdomain-suffix lookups with NumPy.
+
+    A batch of hosts is joined into one byte array and every character is
+    weighted by its distance from the end of its host, so the hash of any
+    suffix is a difference of two cumulative sums. That gives, without a
+    Python loop, the hash of each host and of each of its label suffixes
+    walking the labels from the right (.com, .example.com, ...). The hashes
+    of the [BLOCK_HOSTS] entries and suffix rules are kept sorted, so the
+    whole batch is resolved with np.isin and np.searchsorted. Hosts neither
+    table decides (no hit, or an IP address a CIDR rule may claim first) go
+    through RuleMatcher.match, so results are the same as matching one host
+    at a time.
+    """
+
+    def __init__(self, matcher: RuleMatcher):
+        if np is None:
+            raise RuntimeError("BatchMatcher requires numpy")
+        self.matcher = matcher
+        self._host_keys, self._host_patterns = self._table(matcher.hosts)
+        self._suffix_keys, self._suffix_patterns = self._table(matcher.suffixes)
+        # Longest suffix rule, in labels; host suffixes beyond it cannot match
+        self.depth = max((key.count(".") for key in matcher.suffixes), default=0)
+        # Rules that the hash tables cannot express; without any, a miss is final
+        self._needs_fallback = bool(matcher.prefixes or matcher.tails or matcher.substrings or matcher.regexes)
+
+    @staticmethod
+    def _table(entries):
+        """Return (sorted int64 key hashes, rule patterns in the same order)."""
+        keys = np.fromiter((suffix_hash(key) for key in entries), dtype=np.int64, count=len(entries))
+        patterns = np.array(list(entries.values()), dtype=object)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], patterns[order]
+
+    @staticmethod
+    def _lookup(keys, patterns, queries):
+        """Return (hit mask, pattern per query) for int64 query hashes."""
+        hits = np.isin(queries, keys)
+        positions = np.searchsorted(keys, queries[hits])
+        found = np.full(queries.shape, None, dtype=object)
+        found[hits] = patterns[positions]
+        return hits, found
+
+    def _hash_batch(self, hosts: List[str]):
+        """
+        Return (host hashes, [host, depth] label-suffix hashes, presence mask).
+
+        Column d holds the suffix starting at the (d + 1)th dot from the
+        right, so column 0 is the top-level domain.
+        """
+        data = np.frombuffer("\n".join(hosts).encode("utf-8") + b"\n", dtype=np.uint8)
+        ends = np.flatnonzero(data == ord("\n"))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        # Distance of every byte from the end of its host (-1 on separators)
+        distance = np.repeat(ends - 1, ends - starts + 1) - np.arange(len(data))
+
+        suffixes = np.zeros((len(hosts), max(self.depth, 1)), dtype=np.int64)
+        present = np.zeros(suffixes.shape, dtype=bool)
+        dots = np.flatnonzero(data == ord(".")) if self.depth else np.zeros(0, dtype=np.int64)
+        if len(dots):
+            # Depth of a dot = dots from it to the end of its host, itself included
+            dot_owner = np.searchsorted(ends, dots)
+            first_dot = np.concatenate(([0], np.cumsum(np.bincount(dot_owner, minlength=len(hosts)))))
+            depth = first_dot[dot_owner + 1] - np.arange(len(dots))
+            keep = depth <= self.depth
+            dots, dot_owner, depth = dots[keep], dot_owner[keep], depth[keep]
+            dot_ends = ends[dot_owner]
+
+        exact = np.zeros(len(hosts), dtype=np.int64)
+        dot_hashes = np.zeros(len(dots), dtype=np.int64)
+        longest = int(distance.max(initial=0)) + 1
+        for base, modulus in zip(_BASES, _MODULI):
+            powers = [1]
+            for _ in range(longest):
+                powers.append(powers[-1] * base % modulus)
+            powers = np.array(powers, dtype=np.uint64)
+            # Terms are below 2**39, so BATCH_SIZE hosts of up to 253 bytes sum
+            # without overflowing 2**64; separators get weight 0
+            weights = data * powers[np.maximum(distance, 0)]
+            weights[ends] = 0
+            totals = np.concatenate((np.zeros(1, dtype=np.uint64), np.cumsum(weights, dtype=np.uint64)))
+            exact = (exact << 32) | ((totals[ends] - totals[starts]) % np.uint64(modulus)).astype(np.int64)
+            if len(dots):
+                dot_hashes = (dot_hashes << 32) | ((totals[dot_ends] - totals[dots]) % np.uint64(modulus)).astype(np.int64)
+
+        if len(dots):
+            suffixes[dot_owner, depth - 1] = dot_hashes
+            present[dot_owner, depth - 1] = True
+        return exact, suffixes, present
+
+    def _match_batch(self, hosts: List[str]) -> List[Optional[str]]:
+        exact, suffixes, present = self._hash_batch(hosts)
+        exact_hits, result = self._lookup(self._host_keys, self._host_patterns, exact)
+        if self.matcher.host_table is not None:
+            # Host rules of large rule files live in the on-disk table
+            for row in np.flatnonzero(~exact_hits):
+                pattern = self.matcher.host_table.get(hosts[row])
+                if pattern is not None:
+                    result[row] = pattern
+                    exact_hits[row] = True
+
+        if self.depth:
+            suffix_hits, suffix_found = self._lookup(self._suffix_keys, self._suffix_patterns, suffixes)
+            suffix_hits &= present
+            # RuleMatcher tries the longest suffix first: take the deepest hit column
+            deepest = suffix_hits.shape[1] - 1 - np.argmax(suffix_hits[:, ::-1], axis=1)
+            rows = np.flatnonzero(suffix_hits.any(axis=1) & ~exact_hits)
+            result[rows] = suffix_found[rows, deepest[rows]]
+
+        result = result.tolist()
+        if len(self.matcher.cidrs):
+            # CIDR rules take precedence over suffix rules for addresses
+            for row in np.flatnonzero(~exact_hits):
+                if parse_address(hosts[row]) is not None:
+                    result[row] = self.matcher.match(hosts[row])
+        if self._needs_fallback:
+            scan = self.matcher._iter_scan_matches
+            for row, pattern in enumerate(result):
+                if pattern is None:
+                    result[row] = next(scan(hosts[row]), None)
+        return result
+
+    def match(self, hosts: Iterable[str]) -> List[Optional[str]]:
+        """Return the pattern of the first rule matching each host (or None), in input order."""
+        hosts = list(hosts)
+        results = []
+        for start in range(0, len(hosts), BATCH_SIZE):
+            results.extend(self._match_batch(hosts[start:start + BATCH_SIZE]))
+        return results
+
+
+def classify_hosts(matcher: RuleMatcher, hosts: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Yield (host, pattern of the first matching rule or None) for many hosts.
+
+    Hosts are classified BATCH_SIZE at a time with a BatchMatcher when
+    numpy is installed, and one RuleMatcher.match call at a time
+    otherwise; the results are identical.
+    """
+    if np is None:
+        for host in hosts:
+            yield host, matcher.match(host)
+        return
+    batch_matcher = BatchMatcher(matcher)
+    hosts = iter(hosts)
+    for chunk in iter(lambda: list(islice(hosts, BATCH_SIZE)), []):
+        yield from zip(chunk, batch_matcher.match(chunk))
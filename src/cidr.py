@@ -0,0 +1,212 @@
+import ipaddress
+from bisect import bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Burp has no CIDR syntax, so CIDR rules are exported either as regexes
+# (IPv4 only) or as the list of addresses they contain
+EXPORT_MODES = ("regex", "hosts")
+
+# Largest network expanded into individual hosts
+MAX_EXPANDED_HOSTS = 256
+
+_IP_START = frozenset("0123456789abcdefABCDEF:")
+
+
+def canonical_network(pattern: str) -> Optional[str]:
+    """Return the canonical CIDR notation of pattern (host bits cleared), or None if it is not a network."""
+    try:
+        return str(ipaddress.ip_network(pattern.strip(), strict=False))
+    except ValueError:
+        return None
+
+
+def parse_address(host: str):
+    """Return host as an IP address object, or None for hostnames."""
+    if not host or host[0] not in _IP_START:
+        return None
+    try:
+        return ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return None
+
+
+def collapse_networks(patterns: Iterable[str]) -> List[str]:
+    """
+    Merge overlapping and adjacent networks into the fewest CIDRs.
+
+    10.0.0.0/25 and 10.0.0.128/25 become 10.0.0.0/24; IPv4 networks come
+    before IPv6 ones.
+    """
+    networks = {4: [], 6: []}
+    for pattern in patterns:
+        network = ipaddress.ip_network(pattern, strict=False)
+        networks[network.version].append(network)
+    return [str(network) for version in (4, 6) for network in ipaddress.collapse_addresses(networks[version])]
+
+
+def build_ranges(rules: Iterable[Tuple[str, str]]) -> List[List]:
+    """
+    Turn (network, pattern) pairs into sorted, disjoint [version, first, last, pattern] ranges.
+
+    Two CIDRs are either disjoint or nested, so dropping every range inside
+    an earlier one leaves disjoint ranges that still report, for any
+    address, the outermost rule containing it.
+    """
+    ranges = []
+    for network, pattern in rules:
+        network = ipaddress.ip_network(network, strict=False)
+        ranges.append((network.version, int(network.network_address), int(network.broadcast_address), pattern))
+    ranges.sort(key=lambda entry: (entry[0], entry[1], -entry[2]))
+
+    disjoint = []
+    for version, first, last, pattern in ranges:
+        if disjoint and disjoint[-1][0] == version and first <= disjoint[-1][2]:
+            continue
+        disjoint.append([version, first, last, pattern])
+    return disjoint
+
+
+def nested_ranges(rules: Iterable[Tuple[str, str]]) -> List[List[List]]:
+    """
+    Split (network, pattern) pairs into layers of disjoint ranges by nesting depth.
+
+    The first layer is what build_ranges keeps; each further one holds the
+    ranges directly inside the previous layer's, so an address is in every
+    rule containing it by looking it up once per layer. A repeated network
+    nests inside its first occurrence.
+    """
+    ranges = []
+    for network, pattern in rules:
+        network = ipaddress.ip_network(network, strict=False)
+        ranges.append((network.version, int(network.network_address), int(network.broadcast_address), pattern))
+    ranges.sort(key=lambda entry: (entry[0], entry[1], -entry[2]))
+
+    layers: List[List[List]] = []
+    # Ranges containing the current one, outermost first
+    enclosing: List[Tuple[int, int]] = []
+    for version, first, last, pattern in ranges:
+        while enclosing and (enclosing[-1][0] != version or first > enclosing[-1][1]):
+            enclosing.pop()
+        if len(enclosing) == len(layers):
+            layers.append([])
+        layers[len(enclosing)].append([version, first, last, pattern])
+        enclosing.append((version, last))
+    return layers
+
+
+class CIDRTable:
+    """
+    IP range lookup over sorted integer ranges.
+
+    Classifying an address is one bisect over the range starts of its IP
+    version, so it stays logarithmic however many CIDR rules there are.
+    """
+
+    def __init__(self, ranges: Iterable[List]):
+        self._starts: Dict[int, List[int]] = {4: [], 6: []}
+        self._ends: Dict[int, List[int]] = {4: [], 6: []}
+        self._patterns: Dict[int, List[str]] = {4: [], 6: []}
+        for version, first, last, pattern in ranges:
+            self._starts[version].append(first)
+            self._ends[version].append(last)
+            self._patterns[version].append(pattern)
+
+    def __len__(self) -> int:
+        return len(self._starts[4]) + len(self._starts[6])
+
+    def match_address(self, address) -> Optional[str]:
+        """Return the pattern of the CIDR rule containing an ip_address, or None."""
+        value = int(address)
+        index = bisect_right(self._starts[address.version], value) - 1
+        if index >= 0 and value <= self._ends[address.version][index]:
+            return self._patterns[address.version][index]
+        return None
+
+    def match(self, host: str) -> Optional[str]:
+        """Return the pattern of the CIDR rule containing host, or None for hostnames and other addresses."""
+        if not len(self):
+            return None
+        address = parse_address(host)
+        return self.match_address(address) if address is not None else None
+
+
+def _digit_ranges(low: str, high: str) -> List[str]:
+    """Regex alternatives for the integers low..high, both written with the same number of digits."""
+    if low == high:
+        return [low]
+    if len(low) == 1:
+        return [r"\d" if (low, high) == ("0", "9") else f"[{low}-{high}]"]
+    if low[0] == high[0]:
+        return [low[0] + part for part in _digit_ranges(low[1:], high[1:])]
+
+    width = len(low) - 1
+    parts = []
+    first, last = int(low[0]), int(high[0])
+    if low[1:] != "0" * width:
+        parts += [low[0] + part for part in _digit_ranges(low[1:], "9" * width)]
+        first += 1
+    tail = []
+    if high[1:] != "9" * width:
+        tail = [high[0] + part for part in _digit_ranges("0" * width, high[1:])]
+        last -= 1
+    if first <= last:
+        lead = str(first) if first == last else f"[{first}-{last}]"
+        parts.append(lead + (r"\d" if width == 1 else rf"\d{{{width}}}"))
+    return parts + tail
+
+
+def number_range_regex(low: int, high: int) -> str:
+    """Return a regex matching the decimal integers low..high (no leading zeros)."""
+    if (low, high) == (0, 255):
+        return r"\d{1,3}"
+    parts = []
+    for digits in range(len(str(low)), len(str(high)) + 1):
+        first = max(low, 10 ** (digits - 1) if digits > 1 else 0)
+        last = min(high, 10 ** digits - 1)
+        if first <= last:
+            parts += _digit_ranges(str(first), str(last))
+    return parts[0] if len(parts) == 1 else "(?:" + "|".join(parts) + ")"
+
+
+def network_to_regex(network: str) -> Optional[str]:
+    """
+    Return one anchored regex matching exactly the dotted quads of an IPv4 network.
+
+    10.0.0.0/8 -> ^10\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}$; a prefix inside an
+    octet becomes a numeric range for that octet. IPv6 has no single textual
+    form, so it returns None.
+    """
+    network = ipaddress.ip_network(network, strict=False)
+    if network.version != 4:
+        return None
+    octets = str(network.network_address).split(".")
+    last_octets = str(network.broadcast_address).split(".")
+    parts = []
+    for low, high in zip(octets, last_octets):
+        parts.append(low if low == high else number_range_regex(int(low), int(high)))
+    return "^" + r"\.".join(parts) + "$"
+
+
+def export_networks(patterns: Iterable[str], mode: str = "regex") -> Iterator[str]:
+    """
+    Yield Burp-compatible entries for CIDR rules.
+
+    The networks are collapsed first. In "regex" mode every IPv4 network
+    becomes one regex; in "hosts" mode networks are listed address by
+    address. Networks that cannot be expressed (IPv6 ranges, or more than
+    MAX_EXPANDED_HOSTS addresses in hosts mode) fall back to the other form
+    when possible and are otherwise reported as a comment.
+    """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"mode must be one of {', '.join(EXPORT_MODES)}")
+    for pattern in collapse_networks(patterns):
+        network = ipaddress.ip_network(pattern)
+        small = network.num_addresses <= MAX_EXPANDED_HOSTS
+        regex = network_to_regex(pattern) if network.version == 4 and (mode == "regex" or not small) else None
+        if regex is not None:
+            yield regex
+        elif small:
+            yield from (str(address) for address in network)
+        else:
+            yield f"# {pattern}: too large to list as hosts"
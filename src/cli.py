@@ -1,6 +1,9 @@
+import json
 import os
 import sys
-from typing import Optional
+import time
+import xml.etree.ElementTree as ET
+from typing import List, Optional
 from colorama import Fore, Style, init
 
 # Initialize colorama
@@ -9,7 +12,10 @@ init(autoreset=True)
 # Add the project root to the Python path to import our modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from rules import RuleManager, RuleTemplate
+import batch
+from rules import RuleTemplate
+from rulestore import open_rule_manager
+from suggest import MIN_SUBDOMAINS
 from utils import ColorPrinter
 from exports import RuleExporterImporter
 
@@ -18,7 +24,7 @@ class CLIRuleManager:
     """Command-line interface for the TLS Bypass Rule Manager."""
     
     def __init__(self):
-        self.rule_manager = RuleManager()
+        self.rule_manager = open_rule_manager()
         self.exporter_importer = RuleExporterImporter(self.rule_manager)
         self.running = True
     
@@ -50,6 +56,10 @@ class CLIRuleManager:
         print("   Useful for multiple hosts")
         print("   Examples: .*\\.internal\\.corp, ^dev-.*\\.example\\.com$")
         print()
+        print("3) BLOCK CIDR - Matches IP-literal hosts in a range")
+        print("   Examples: 10.0.0.0/8, 192.168.1.0/24, 2001:db8::/32")
+        print("   Exported to Burp as regexes (or host lists for IPv6).")
+        print()
         print(f"{Fore.GREEN}RULE TEMPLATES{Style.RESET_ALL}")
         print("The tool provides guided templates for common patterns:")
         print("- Match all subdomains")
@@ -71,30 +81,46 @@ class CLIRuleManager:
         print(f"{Fore.CYAN}{'-'*30}")
         print(f"{Fore.YELLOW}Total Host Rules: {stats['total_hosts']}")
         print(f"{Fore.YELLOW}Total Regex Rules: {stats['total_rules']}")
+        print(f"{Fore.YELLOW}Total CIDR Rules: {stats['total_cidrs']}")
         print(f"{Fore.YELLOW}Total All Rules: {stats['total_all']}")
         print(f"{Fore.GREEN}Enabled Rules: {stats['enabled']}")
         print(f"{Fore.RED}Disabled Rules: {stats['disabled']}")
         print(f"{Fore.YELLOW}File Path: {stats['file_path']}")
+        
+        hits = self.rule_manager.get_hit_stats()
+        if hits is None:
+            return
+        print(f"\n{Fore.CYAN}RULE HITS ({hits['requests']} requests ingested, last {hits['updated']})")
+        print(f"{Fore.CYAN}{'-'*30}")
+        for pattern, count, last_seen in hits["hot"]:
+            print(f"{Fore.GREEN}  {count:>8}  {pattern}{Style.RESET_ALL} (last seen {last_seen or 'unknown'})")
+        if hits["dead_count"]:
+            print(f"{Fore.RED}Dead rules (no hits): {hits['dead_count']}")
+            for pattern in hits["dead"]:
+                print(f"{Fore.RED}  {pattern}")
     
-    def list_rules(self):
-        """List all rules."""
-        all_rules = self.rule_manager.get_all_rules()
+    def list_rules(self, all_rules=None):
+        """List all rules (the given ones, or a fresh read of the rule file) and return them."""
+        if all_rules is None:
+            all_rules = self.rule_manager.get_all_rules()
         
         if not all_rules:
             ColorPrinter.info("No rules found.")
-            return
+            return all_rules
         
         print(f"\n{Fore.CYAN}CURRENT RULES")
         print(f"{Fore.CYAN}{'-'*50}")
         
         for i, rule in enumerate(all_rules, 1):
             status_color = Fore.GREEN if rule["enabled"] else Fore.RED
-            type_color = Fore.YELLOW if rule["type"] == "host" else Fore.MAGENTA
+            type_color = {"host": Fore.YELLOW, "cidr": Fore.BLUE}.get(rule["type"], Fore.MAGENTA)
             status = "ENABLED" if rule["enabled"] else "DISABLED"
             
             print(f"{i:2d}. [{status_color}{status}{Style.RESET_ALL}] "
                   f"[{type_color}{rule['type'].upper()}{Style.RESET_ALL}] "
                   f"{rule['pattern']}")
+        
+        return all_rules
     
     def add_rule_menu(self):
         """Menu for adding new rules."""
@@ -104,15 +130,18 @@ class CLIRuleManager:
         print("Choose rule type:")
         print("1. Host Rule (exact match)")
         print("2. Regex Rule (pattern match)")
-        print("3. Guided Rule Template")
+        print("3. CIDR Rule (IP range)")
+        print("4. Guided Rule Template")
         
-        choice = input(f"\nSelect option (1-3): ").strip()
+        choice = input(f"\nSelect option (1-4): ").strip()
         
         if choice == "1":
             self.add_host_rule()
         elif choice == "2":
             self.add_regex_rule()
         elif choice == "3":
+            self.add_cidr_rule()
+        elif choice == "4":
             self.guided_rule_creation()
         else:
             ColorPrinter.error("Invalid choice.")
@@ -127,9 +156,24 @@ class CLIRuleManager:
         
         if self.rule_manager.add_rule(host, "host"):
             ColorPrinter.success(f"Host rule '{host}' added successfully.")
+            self.report_rewrites()
         else:
             ColorPrinter.error("Failed to add host rule.")
     
+    def add_cidr_rule(self):
+        """Add a CIDR rule."""
+        network = input("Enter IP range (e.g. 10.0.0.0/8 or 2001:db8::/32): ").strip()
+        
+        if not network:
+            ColorPrinter.error("IP range cannot be empty.")
+            return
+        
+        if self.rule_manager.add_rule(network, "cidr"):
+            ColorPrinter.success(f"CIDR rule '{network}' added successfully.")
+            self.report_rewrites()
+        else:
+            ColorPrinter.error("Failed to add CIDR rule. Expected an IPv4 or IPv6 network.")
+    
     def add_regex_rule(self):
         """Add a regex rule."""
         pattern = input("Enter regex pattern: ").strip()
@@ -143,6 +187,7 @@ class CLIRuleManager:
         if not is_valid:
             ColorPrinter.error(f"Invalid regex pattern: {error_msg}")
             return
+        self.warn_regex_issues(pattern)
         
         # Test the regex
         test_input = input("Test string (optional, press Enter to skip): ").strip()
@@ -155,9 +200,24 @@ class CLIRuleManager:
         
         if self.rule_manager.add_rule(pattern, "regex"):
             ColorPrinter.success(f"Regex rule '{pattern}' added successfully.")
+            self.report_rewrites()
         else:
             ColorPrinter.error("Failed to add regex rule.")
     
+    def warn_regex_issues(self, pattern: str):
+        """Print the ReDoS findings and measured cost of a valid regex."""
+        report = self.rule_manager.analyze_regex(pattern)
+        for issue in report["issues"]:
+            ColorPrinter.warning(f"Regex {report['risk']} risk: {issue}")
+        if report["issues"]:
+            ColorPrinter.info(f"Estimated cost: {report['cost']:.2f} µs per host")
+    
+    def report_rewrites(self):
+        """Print the rewrites the normaliser applied to newly added rules."""
+        for rewrite in self.rule_manager.pop_rewrites():
+            for change in rewrite["changes"]:
+                ColorPrinter.info(f"Normalized: {change}")
+    
     def guided_rule_creation(self):
         """Create a rule using guided templates."""
         templates = RuleTemplate.get_templates()
@@ -205,6 +265,7 @@ class CLIRuleManager:
                 if not is_valid:
                     ColorPrinter.error(f"Generated pattern is invalid: {error_msg}")
                     return
+                self.warn_regex_issues(pattern)
                 
                 # Test the pattern
                 test_input = input("Test string (optional, press Enter to skip): ").strip()
@@ -218,6 +279,7 @@ class CLIRuleManager:
                 # Add the rule
                 if self.rule_manager.add_rule(pattern, "regex"):
                     ColorPrinter.success(f"Rule added successfully: {pattern}")
+                    self.report_rewrites()
                 else:
                     ColorPrinter.error("Failed to add rule.")
             else:
@@ -233,7 +295,7 @@ class CLIRuleManager:
             ColorPrinter.info("No rules to toggle.")
             return
         
-        self.list_rules()
+        self.list_rules(all_rules)
         
         try:
             choice = int(input(f"\nSelect rule to toggle (1-{len(all_rules)}): ").strip())
@@ -241,7 +303,7 @@ class CLIRuleManager:
                 rule = all_rules[choice - 1]
                 pattern = rule['pattern']
                 
-                if self.rule_manager.toggle_rule(pattern):
+                if self.rule_manager.toggle_rule(pattern, rule_id=rule.id):
                     new_status = "disabled" if rule['enabled'] else "enabled"
                     ColorPrinter.success(f"Rule {new_status}: {pattern}")
                 else:
@@ -259,7 +321,7 @@ class CLIRuleManager:
             ColorPrinter.info("No rules to remove.")
             return
         
-        self.list_rules()
+        self.list_rules(all_rules)
         
         try:
             choice = int(input(f"\nSelect rule to remove (1-{len(all_rules)}): ").strip())
@@ -269,7 +331,7 @@ class CLIRuleManager:
                 
                 confirm = input(f"Confirm removal of '{pattern}'? (y/N): ").strip().lower()
                 if confirm in ['y', 'yes']:
-                    if self.rule_manager.remove_rule(pattern):
+                    if self.rule_manager.remove_rule(pattern, rule_id=rule.id):
                         ColorPrinter.success(f"Rule removed: {pattern}")
                     else:
                         ColorPrinter.error("Failed to remove rule.")
@@ -326,15 +388,12 @@ class CLIRuleManager:
             return
         
         try:
-            exported_content = self.exporter_importer.export(format_type)
-            
             filename = input(f"Enter filename (or press Enter for default): ").strip()
             if not filename:
                 from utils import generate_export_filename
                 filename = generate_export_filename(format_type)
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(exported_content)
+            self.exporter_importer.export_to_file(format_type, filename)
             
             ColorPrinter.success(f"Rules exported to: {filename}")
         except Exception as e:
@@ -368,11 +427,226 @@ class CLIRuleManager:
             
             if self.exporter_importer.import_rules(format_type, content):
                 ColorPrinter.success(f"Rules imported from: {filename}")
+                self.report_rewrites()
             else:
                 ColorPrinter.error("Import failed. Invalid format or content.")
         except Exception as e:
             ColorPrinter.error(f"Import failed: {str(e)}")
     
+    def import_scope(self, filename: Optional[str] = None, dry_run: bool = False):
+        """Import a bug-bounty program scope list."""
+        if filename is None:
+            print(f"\n{Fore.CYAN}IMPORT SCOPE LIST")
+            print(f"{Fore.CYAN}{'-'*20}")
+            print("Accepts text, CSV, JSON and JSON Lines program scope exports.")
+            filename = input("Enter scope filename: ").strip()
+        
+        if not os.path.exists(filename):
+            ColorPrinter.error(f"File does not exist: {filename}")
+            return
+        
+        try:
+            summary = self.rule_manager.ingest_scope(filename, dry_run=dry_run)
+        except Exception as e:
+            ColorPrinter.error(f"Scope import failed: {str(e)}")
+            return
+        
+        print(f"Entries read:        {summary['entries']}")
+        print(f"Out of scope:        {summary['out_of_scope']}")
+        print(f"Duplicates:          {summary['duplicates']}")
+        print(f"Already covered:     {summary['covered']}")
+        print(f"New host rules:      {summary['hosts']}")
+        print(f"New wildcard rules:  {summary['suffixes']}")
+        print(f"New regex rules:     {summary['regexes']}")
+        print(f"New CIDR rules:      {summary['cidrs']}")
+        if summary["invalid"]:
+            ColorPrinter.warning(f"{summary['invalid']} entries were not hostnames or IP ranges, "
+                                 f"e.g. {', '.join(summary['invalid_samples'][:5])}")
+        for pattern in summary["rejected"]:
+            ColorPrinter.warning(f"Rejected invalid pattern: {pattern}")
+        
+        if dry_run:
+            ColorPrinter.info(f"Dry run: {len(summary['rules'])} rules would be added.")
+        else:
+            ColorPrinter.success(f"Added {summary['added']} rules from: {filename}")
+    
+    def minimize_rules(self, apply: Optional[bool] = None):
+        """Report redundant rules and optionally remove them."""
+        report = self.rule_manager.minimize_rules()
+        
+        print(f"\n{Fore.CYAN}RULE SET MINIMIZER")
+        print(f"{Fore.CYAN}{'-'*25}")
+        print(f"Enabled rules:  {report['enabled']}")
+        print(f"Minimal set:    {report['minimal']}")
+        
+        for rule in report["removable"]:
+            print(f"  {Fore.RED}{rule['pattern']}{Style.RESET_ALL} ({rule['type']}) covered by {rule['covered_by']}")
+        
+        for suggestion in report["suggestions"]:
+            ColorPrinter.info(f"{len(suggestion['hosts'])} host rules under {suggestion['suffix']} could be "
+                              f"replaced by {suggestion['pattern']} (matches every subdomain)")
+        
+        if not report["removable"]:
+            ColorPrinter.success("No redundant rules found.")
+            return
+        
+        if apply is None:
+            apply = input(f"\nRemove {len(report['removable'])} redundant rules? (y/N): ").strip().lower() == "y"
+        if apply:
+            removed = self.rule_manager.minimize_rules(apply=True)["removed"]
+            ColorPrinter.success(f"Removed {removed} redundant rules.")
+    
+    def check_hosts(self, hosts: List[str], regex_engine: Optional[str] = None):
+        """Classify hosts (from argv or stdin, one per line) and report match cache usage."""
+        if regex_engine is not None:
+            self.rule_manager.regex_engine = regex_engine
+        if not hosts:
+            hosts = (line.strip() for line in sys.stdin)
+            # A long-running stream: keep the regex rules ranked by the live hits
+            self.rule_manager.start_profiler()
+        for host in hosts:
+            if not host:
+                continue
+            pattern = self.rule_manager.match_host(host)
+            if pattern is None:
+                print(f"{host}\t{Fore.YELLOW}no match")
+            else:
+                print(f"{host}\t{Fore.GREEN}{pattern}")
+            keywords = self.rule_manager.match_keywords(host)
+            if keywords:
+                print(f"  keyword rules fired: {', '.join(keywords)}")
+        
+        stats = self.rule_manager.match_cache_stats()
+        ColorPrinter.info(f"Match cache: {stats['size']}/{stats['maxsize']} entries, {stats['hits']} hits, "
+                          f"{stats['misses']} misses, {stats['evictions']} evictions "
+                          f"({stats['hit_ratio']:.1%} hit ratio)")
+        self.rule_manager.stop_profiler()
+        matcher = self.rule_manager.load_matcher()
+        stats = matcher.regex_stats()
+        if stats["scans"]:
+            ColorPrinter.info(f"Regex rules: {stats['searches_per_scan']:.1f} of {stats['rules']} searched per host "
+                              f"that reached them")
+        dfa = matcher.dfa
+        if dfa is not None:
+            stats = dfa.stats()
+            ColorPrinter.info(f"DFA: {stats['rules']} regex rules compiled, {stats['fallback_rules']} matched with re, "
+                              f"{stats['dfa_states']} states built ({stats['flushes']} cache flushes)")
+    
+    def classify_hosts(self, filename: str, output: Optional[str] = None):
+        """Classify every host in a file (one per line) and summarise the matches."""
+        if not os.path.exists(filename):
+            ColorPrinter.error(f"File {filename} not found.")
+            return
+        
+        total = matched = 0
+        rule_hits = {}
+        with open(filename, "r", encoding="utf-8", errors="replace") as f:
+            out = open(output, "w", encoding="utf-8") if output else None
+            try:
+                for host, pattern in self.rule_manager.classify_hosts(f):
+                    total += 1
+                    if pattern is not None:
+                        matched += 1
+                        rule_hits[pattern] = rule_hits.get(pattern, 0) + 1
+                    if out is not None:
+                        out.write(f"{host}\t{pattern or ''}\n")
+            finally:
+                if out is not None:
+                    out.close()
+        
+        print(f"\n{Fore.CYAN}HOST CLASSIFICATION")
+        print(f"{Fore.CYAN}{'-'*25}")
+        print(f"Hosts:     {total}")
+        print(f"Matched:   {matched}")
+        print(f"Unmatched: {total - matched}")
+        for pattern, hits in sorted(rule_hits.items(), key=lambda item: item[1], reverse=True)[:10]:
+            print(f"  {hits:>8}  {pattern}")
+        if batch.np is None:
+            ColorPrinter.info("Install numpy to classify exact and suffix rules in vectorised batches.")
+        if output:
+            ColorPrinter.success(f"Results written to {output}")
+    
+    def ingest_traffic(self, filenames: List[str]):
+        """Count rule hits in HAR files, Burp XML exports or proxy logs."""
+        for filename in filenames:
+            if not os.path.exists(filename):
+                ColorPrinter.error(f"File {filename} not found.")
+                continue
+            try:
+                summary = self.rule_manager.ingest_traffic(filename)
+            except (OSError, ET.ParseError) as e:
+                ColorPrinter.error(f"Could not read {filename}: {e}")
+                continue
+            ColorPrinter.success(f"{filename}: {summary['requests']} requests, {summary['matched']} matched "
+                                 f"({summary['rules_hit']} rules), {summary['unmatched']} unmatched, "
+                                 f"{summary['unparsed']} without a host")
+        self.show_stats()
+    
+    def suggest_rules(self, filename: str, min_subdomains: int = MIN_SUBDOMAINS, apply: bool = False):
+        """Suggest subdomain rules for the suffixes most hosts in a traffic file share."""
+        if not os.path.exists(filename):
+            ColorPrinter.error(f"File {filename} not found.")
+            return
+        
+        report = self.rule_manager.suggest_suffix_rules(filename, min_subdomains)
+        suggestions = report["suggestions"]
+        
+        print(f"\n{Fore.CYAN}SUBDOMAIN RULE SUGGESTIONS")
+        print(f"{Fore.CYAN}{'-'*30}")
+        print(f"Hostnames read:  {report['hosts']}")
+        print(f"Distinct hosts:  {report['distinct']}")
+        for suggestion in suggestions[:20]:
+            print(f"  {Fore.GREEN}{suggestion['pattern']}{Style.RESET_ALL}: {suggestion['observed']} hosts seen, "
+                  f"replaces {suggestion['replaces']} host rules")
+        if len(suggestions) > 20:
+            ColorPrinter.info(f"... and {len(suggestions) - 20} more.")
+        
+        if not suggestions:
+            ColorPrinter.info("No suffix has enough distinct subdomains to suggest a rule.")
+            return
+        if apply:
+            result = self.rule_manager.add_rules((suggestion["pattern"], "regex", True) for suggestion in suggestions)
+            ColorPrinter.success(f"Added {result['added']} subdomain rules. "
+                                 f"Run 'minimize --apply' to drop the host rules they cover.")
+    
+    def audit_rules(self, filename: str, output: Optional[str] = None):
+        """Report rule coverage and overlap over a reference host corpus."""
+        if not os.path.exists(filename):
+            ColorPrinter.error(f"File {filename} not found.")
+            return
+        
+        report = self.rule_manager.audit_rules(filename)
+        
+        print(f"\n{Fore.CYAN}RULE COVERAGE AUDIT")
+        print(f"{Fore.CYAN}{'-'*25}")
+        print(f"Hosts:        {report['hosts']}")
+        print(f"Matched:      {report['matched']}")
+        print(f"Unmatched:    {report['unmatched']}")
+        print(f"Rules:        {len(report['rules'])}")
+        print(f"Unused rules: {len(report['unused'])}")
+        
+        top = sorted(report["rules"], key=lambda rule: rule["coverage"], reverse=True)[:10]
+        if top and top[0]["coverage"]:
+            print(f"\n{Fore.CYAN}Widest rules:")
+            for rule in top:
+                if rule["coverage"]:
+                    print(f"  {rule['coverage']:>8}  {rule['pattern']}")
+        if report["overlaps"]:
+            print(f"\n{Fore.CYAN}Most overlapping rule pairs:")
+            for overlap in report["overlaps"][:10]:
+                first, second = overlap["rules"]
+                print(f"  {overlap['hosts']:>8}  {first}  &  {second}")
+        for rule in report["subsumed"]:
+            ColorPrinter.warning(f"{rule['pattern']} matched {rule['coverage']} hosts, all also matched by "
+                                 f"{', '.join(rule['covered_by'])}")
+        if report["unmatched_samples"]:
+            ColorPrinter.info(f"Unmatched hosts, e.g. {', '.join(report['unmatched_samples'][:5])}")
+        
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            ColorPrinter.success(f"Full report written to {output}")
+    
     def show_conflicts(self):
         """Show potential rule conflicts."""
         conflicts = self.rule_manager.find_rule_conflicts()
@@ -391,6 +665,24 @@ class CLIRuleManager:
             print(f"   Type: {conflict['type']}")
             print()
     
+    def watch_rules(self):
+        """Watch the rule file for external edits until interrupted."""
+        def on_change(rules, changed):
+            enabled = sum(1 for rule in rules if rule["enabled"])
+            ColorPrinter.info(f"Reloaded {', '.join(changed)} section(s): {len(rules)} rules, "
+                              f"{enabled} enabled. Burp sync file updated.")
+        
+        watcher = self.rule_manager.watch(callback=on_change)
+        ColorPrinter.info(f"Watching {self.rule_manager.rule_file} for changes. Press Ctrl+C to stop.")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print()
+            ColorPrinter.info("Stopped watching.")
+        finally:
+            watcher.stop()
+    
     def main_menu(self):
         """Display the main menu and handle user input."""
         while self.running:
@@ -408,9 +700,12 @@ class CLIRuleManager:
             print("8. Import rules")
             print("9. Check for conflicts")
             print("10. Help / Playbook")
-            print("11. Exit")
+            print("11. Watch rule file for changes")
+            print("12. Import program scope list")
+            print("13. Minimize rule set")
+            print("14. Exit")
             
-            choice = input(f"\nSelect option (1-11): ").strip()
+            choice = input(f"\nSelect option (1-14): ").strip()
             
             if choice == "1":
                 self.show_stats()
@@ -433,11 +728,17 @@ class CLIRuleManager:
             elif choice == "10":
                 self.print_help()
             elif choice == "11":
+                self.watch_rules()
+            elif choice == "12":
+                self.import_scope()
+            elif choice == "13":
+                self.minimize_rules()
+            elif choice == "14":
                 print(f"\n{Fore.CYAN}Thank you for using TLS Bypass Rule Manager!")
                 print(f"{Fore.YELLOW}Remember: Use only for authorized testing.")
                 self.running = False
             else:
-                ColorPrinter.error("Invalid option. Please select 1-11.")
+                ColorPrinter.error("Invalid option. Please select 1-14.")
             
             if self.running:
                 input(f"\n{Fore.CYAN}Press Enter to continue...")
@@ -456,7 +757,28 @@ class CLIRuleManager:
 def main():
     """Main entry point."""
     app = CLIRuleManager()
-    app.run()
+    if sys.argv[1:2] == ["watch"]:
+        app.watch_rules()
+    elif sys.argv[1:2] == ["scope"] and len(sys.argv) > 2:
+        app.import_scope(sys.argv[2], dry_run="--dry-run" in sys.argv[3:])
+    elif sys.argv[1:2] == ["check"]:
+        hosts = [arg for arg in sys.argv[2:] if arg != "--dfa"]
+        app.check_hosts(hosts, regex_engine="dfa" if "--dfa" in sys.argv[2:] else None)
+    elif sys.argv[1:2] == ["classify"] and len(sys.argv) > 2:
+        output = sys.argv[sys.argv.index("--output") + 1] if "--output" in sys.argv[3:-1] else None
+        app.classify_hosts(sys.argv[2], output)
+    elif sys.argv[1:2] == ["traffic"] and len(sys.argv) > 2:
+        app.ingest_traffic(sys.argv[2:])
+    elif sys.argv[1:2] == ["suggest"] and len(sys.argv) > 2:
+        minimum = int(sys.argv[sys.argv.index("--min") + 1]) if "--min" in sys.argv[3:-1] else MIN_SUBDOMAINS
+        app.suggest_rules(sys.argv[2], minimum, apply="--apply" in sys.argv[3:])
+    elif sys.argv[1:2] == ["audit"] and len(sys.argv) > 2:
+        output = sys.argv[sys.argv.index("--output") + 1] if "--output" in sys.argv[3:-1] else None
+        app.audit_rules(sys.argv[2], output)
+    elif sys.argv[1:2] == ["minimize"]:
+        app.minimize_rules(apply="--apply" in sys.argv[2:])
+    else:
+        app.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+import os
+import re
+import tempfile
+from collections import deque
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from normalize import regex_to_host
+from rulefile import (FORMAT_VERSION, detect_format_version, format_rule_line, format_timestamp, migrate_v2_lines,
+                      parse_rule_line)
+
+
+SECTION_NAMES = {
+    "[BLOCK_HOSTS]": "hosts",
+    "[BLOCK_RULES]": "rules",
+    "[BLOCK_CIDRS]": "cidrs",
+}
+
+# Lines handed to a worker at a time
+CHUNK_SIZE = 10000
+
+# Number of unconvertible patterns listed in the summary
+MAX_UNCONVERTED_SAMPLES = 20
+
+
+def host_to_regex(host: str) -> str:
+    """Return the exact-match regex for a host."""
+    return f"^{re.escape(host)}$"
+
+
+def convert_chunk(job: Tuple[str, str, List[Tuple[Optional[str], str]]]) -> Tuple[List[Tuple[str, str]], int, List[str]]:
+    """
+    Convert one chunk of (section, line) pairs.
+
+    Runs in worker processes, so it only takes and returns plain data.
+    Returns (ops, converted, unconverted) where each op is (destination,
+    line): the line's own section, or "to_hosts"/"to_rules" for rules that
+    changed type and must move to the other section.
+    """
+    conversion_type, target_section, chunk = job
+    ops = []
+    converted = 0
+    unconverted = []
+    for section, line in chunk:
+        stripped = line.strip()
+        if (section is None or not stripped or stripped.startswith("#")
+                or target_section not in ("both", section)):
+            ops.append((section, line))
+            continue
+
+        enabled, pattern, metadata = parse_rule_line(stripped)
+        tags = metadata["tags"].split(",") if metadata.get("tags") else None
+        if conversion_type == "regex" and section == "hosts":
+            ops.append(("to_rules", format_rule_line(host_to_regex(pattern), enabled, metadata.get("id"), tags)))
+            converted += 1
+        elif conversion_type == "static" and section == "rules":
+            host = regex_to_host(pattern)
+            if host is None:
+                # Not an exact-match pattern, so it cannot become a host
+                ops.append((section, line))
+                unconverted.append(pattern)
+            else:
+                ops.append(("to_hosts", format_rule_line(host, enabled, metadata.get("id"), tags)))
+                converted += 1
+        else:
+            ops.append((section, line))
+    return ops, converted, unconverted
+
+
+class SectionSpool:
+    """
+    Disk-backed buffer for one section's lines.
+
+    Trailing blank lines are held back so that entries appended later
+    (rules moved from the other section) join the section's last block.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.blank_lines = 0
+
+    def write(self, line: str):
+        if not line.strip():
+            self.blank_lines += 1
+            return
+        self.file.write("\n" * self.blank_lines + line + "\n")
+        self.blank_lines = 0
+
+    def copy_to(self, out):
+        self.file.seek(0)
+        for line in self.file:
+            out.write(line)
+
+    def close(self):
+        self.file.close()
+
+
+def _read_chunks(lines: Iterable[str], conversion_type: str,
+                 target_section: str) -> Iterator[Tuple[str, str, List[Tuple[Optional[str], str]]]]:
+    """Tag each line with its section and group them into worker jobs."""
+    section = None
+    chunk = []
+    for line in lines:
+        marker = SECTION_NAMES.get(line.strip())
+        if marker is not None:
+            section = marker
+            continue
+        chunk.append((section, line))
+        if len(chunk) >= CHUNK_SIZE:
+            yield conversion_type, target_section, chunk
+            chunk = []
+    if chunk:
+        yield conversion_type, target_section, chunk
+
+
+def _convert_chunks(jobs: Iterator, processes: int):
+    """Yield converted chunks in input order, keeping at most a few chunks in flight."""
+    if processes <= 1:
+        for job in jobs:
+            yield convert_chunk(job)
+        return
+
+    with Pool(processes) as pool:
+        in_flight = deque()
+        for job in jobs:
+            in_flight.append(pool.apply_async(convert_chunk, (job,)))
+            if len(in_flight) >= processes * 2:
+                yield in_flight.popleft().get()
+        while in_flight:
+            yield in_flight.popleft().get()
+
+
+def convert_rule_file(input_file: str, output_file: str, target_section: str = "both",
+                      conversion_type: str = "regex", processes: int = 1) -> Dict:
+    """
+    Stream a rule file through the host <-> regex conversion.
+
+    The input is read line by line and section bodies are spooled to
+    temporary files, so memory use does not depend on the file size.
+    Converted rules are moved into the section matching their new type.
+    With processes > 1 the conversion is sharded across worker processes.
+    The output is written next to output_file and swapped in at the end,
+    so output_file may be the input file.
+
+    Returns a summary of what was converted and what could not be.
+    """
+    if conversion_type not in ("regex", "static"):
+        raise ValueError("conversion_type must be either 'regex' or 'static'")
+    if target_section not in ("hosts", "rules", "both"):
+        raise ValueError("target_section must be 'hosts', 'rules' or 'both'")
+
+    summary = {
+        "input_file": input_file,
+        "output_file": output_file,
+        "conversion_type": conversion_type,
+        "target_section": target_section,
+        "lines": 0,
+        "converted": 0,
+        "moved_to_hosts": 0,
+        "moved_to_rules": 0,
+        "unconverted": 0,
+        "unconverted_samples": [],
+    }
+    spools = {name: SectionSpool() for name in ("hosts", "rules", "cidrs", "to_hosts", "to_rules")}
+    sections_seen = set()
+    temp_path = f"{output_file}.tmp"
+    try:
+        with open(input_file, "r", encoding="utf-8") as src, open(temp_path, "w", encoding="utf-8") as out:
+            head = src.read(4096)
+            src.seek(0)
+            lines = (line.rstrip("\r\n") for line in src)
+            if detect_format_version(head.encode("utf-8")) < FORMAT_VERSION:
+                lines = migrate_v2_lines(lines, format_timestamp())
+
+            jobs = _read_chunks(lines, conversion_type, target_section)
+            for ops, converted, unconverted in _convert_chunks(jobs, processes):
+                summary["lines"] += len(ops)
+                summary["converted"] += converted
+                summary["unconverted"] += len(unconverted)
+                room = MAX_UNCONVERTED_SAMPLES - len(summary["unconverted_samples"])
+                summary["unconverted_samples"].extend(unconverted[:max(room, 0)])
+                for destination, line in ops:
+                    sections_seen.add(destination)
+                    if destination is None:
+                        # Header and comments before the first section
+                        out.write(line + "\n")
+                    else:
+                        spools[destination].write(line)
+
+            summary["moved_to_hosts"] = summary["converted"] if conversion_type == "static" else 0
+            summary["moved_to_rules"] = summary["converted"] if conversion_type == "regex" else 0
+
+            out.write("[BLOCK_HOSTS]\n")
+            spools["hosts"].copy_to(out)
+            spools["to_hosts"].copy_to(out)
+            out.write("\n[BLOCK_RULES]\n")
+            spools["rules"].copy_to(out)
+            spools["to_rules"].copy_to(out)
+            if "cidrs" in sections_seen:
+                # CIDR rules are never converted, only carried over
+                out.write("\n[BLOCK_CIDRS]\n")
+                spools["cidrs"].copy_to(out)
+        os.replace(temp_path, output_file)
+    finally:
+        for spool in spools.values():
+            spool.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return summary
@@ -0,0 +1,304 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from regex_safety import HOSTNAME_ALPHABET, sre_constants, sre_parse
+
+
+# Lazily built DFA states kept before the state cache is flushed
+MAX_DFA_STATES = 10000
+
+# NFA states one rule may expand to (counted repeats are unrolled)
+MAX_NFA_STATES = 2000
+
+SYMBOLS = {char: index for index, char in enumerate(HOSTNAME_ALPHABET)}
+ALL_SYMBOLS = (1 << len(HOSTNAME_ALPHABET)) - 1
+
+_DIGITS = sum(1 << SYMBOLS[char] for char in "0123456789")
+_WORD = sum(1 << index for char, index in SYMBOLS.items() if char.isalnum())
+_CATEGORIES = {
+    "DIGIT": _DIGITS,
+    "WORD": _WORD,
+    "SPACE": 0,
+    "LINEBREAK": 0,
+}
+
+# Epsilon edge kinds: always, only at the start of the host, only at its end
+_EPSILON, _AT_BEGIN, _AT_END = 0, 1, 2
+
+_BEGIN_ANCHORS = {sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING}
+_END_ANCHORS = {sre_constants.AT_END, sre_constants.AT_END_STRING}
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+
+
+class Unsupported(Exception):
+    """The pattern uses a construct the DFA cannot express."""
+
+
+def _category_mask(category) -> int:
+    name = str(category).upper()
+    for key, mask in _CATEGORIES.items():
+        if name.endswith("_" + key):
+            return ALL_SYMBOLS & ~mask if "_NOT_" in name else mask
+    raise Unsupported(name)
+
+
+def _literal_mask(code: int) -> int:
+    index = SYMBOLS.get(chr(code))
+    return 0 if index is None else 1 << index
+
+
+def _class_mask(items) -> int:
+    mask = 0
+    negate = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            mask |= _literal_mask(av)
+        elif op == sre_constants.RANGE:
+            low, high = av
+            mask |= sum(1 << index for char, index in SYMBOLS.items() if low <= ord(char) <= high)
+        elif op == sre_constants.CATEGORY:
+            mask |= _category_mask(av)
+        else:
+            raise Unsupported(str(op))
+    return ALL_SYMBOLS & ~mask if negate else mask
+
+
+class _NFA:
+    """
+    Thompson NFA shared by every rule.
+
+    Each state has symbol edges (bitmask over HOSTNAME_ALPHABET, target)
+    and epsilon edges (kind, target); accepting states map to a rule index.
+    """
+
+    def __init__(self):
+        self.edges: List[List[Tuple[int, int]]] = []
+        self.epsilons: List[List[Tuple[int, int]]] = []
+        self.accepts: Dict[int, int] = {}
+        self.start = self.state()
+
+    def state(self) -> int:
+        self.edges.append([])
+        self.epsilons.append([])
+        return len(self.edges) - 1
+
+    def add_rule(self, pattern: str, rule: int):
+        """Compile pattern into the NFA; raises Unsupported (leaving no reachable states) when it cannot."""
+        try:
+            parsed = sre_parse.parse(pattern)
+        except Exception as e:
+            raise Unsupported(str(e))
+        if parsed.state.flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_LOCALE):
+            raise Unsupported("flags")
+        first = len(self.edges)
+        try:
+            start, end = self._sequence(list(parsed.data), first)
+        except Unsupported:
+            del self.edges[first:], self.epsilons[first:]
+            raise
+        self.epsilons[self.start].append((_EPSILON, start))
+        self.accepts[end] = rule
+
+    def _check_size(self, first: int):
+        if len(self.edges) - first > MAX_NFA_STATES:
+            raise Unsupported("too many states")
+
+    def _sequence(self, items, first: int) -> Tuple[int, int]:
+        start = end = self.state()
+        for op, av in items:
+            item_start, item_end = self._item(op, av, first)
+            self.epsilons[end].append((_EPSILON, item_start))
+            end = item_end
+        return start, end
+
+    def _symbols(self, mask: int) -> Tuple[int, int]:
+        start, end = self.state(), self.state()
+        if mask:
+            self.edges[start].append((mask, end))
+        return start, end
+
+    def _item(self, op, av, first: int) -> Tuple[int, int]:
+        self._check_size(first)
+        if op == sre_constants.LITERAL:
+            return self._symbols(_literal_mask(av))
+        if op == sre_constants.NOT_LITERAL:
+            return self._symbols(ALL_SYMBOLS & ~_literal_mask(av))
+        if op == sre_constants.ANY:
+            return self._symbols(ALL_SYMBOLS)
+        if op == sre_constants.IN:
+            return self._symbols(_class_mask(av))
+        if op == sre_constants.AT:
+            start, end = self.state(), self.state()
+            if av in _BEGIN_ANCHORS:
+                self.epsilons[start].append((_AT_BEGIN, end))
+            elif av in _END_ANCHORS:
+                self.epsilons[start].append((_AT_END, end))
+            else:
+                raise Unsupported(str(av))
+            return start, end
+        if op == sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            if add_flags & (sre_constants.SRE_FLAG_IGNORECASE | sre_constants.SRE_FLAG_LOCALE):
+                raise Unsupported("flags")
+            return self._sequence(list(sub.data), first)
+        if op == sre_constants.BRANCH:
+            start, end = self.state(), self.state()
+            for alternative in av[1]:
+                alt_start, alt_end = self._sequence(list(alternative.data), first)
+                self.epsilons[start].append((_EPSILON, alt_start))
+                self.epsilons[alt_end].append((_EPSILON, end))
+            return start, end
+        if op in _REPEATS:
+            low, high, sub = av
+            start = end = self.state()
+            for _ in range(low):
+                sub_start, sub_end = self._sequence(list(sub.data), first)
+                self.epsilons[end].append((_EPSILON, sub_start))
+                end = sub_end
+            if high == sre_constants.MAXREPEAT:
+                sub_start, sub_end = self._sequence(list(sub.data), first)
+                self.epsilons[end].append((_EPSILON, sub_start))
+                self.epsilons[sub_end].append((_EPSILON, end))
+                return start, end
+            exit_state = self.state()
+            for _ in range(high - low):
+                sub_start, sub_end = self._sequence(list(sub.data), first)
+                self.epsilons[end].append((_EPSILON, sub_start))
+                self.epsilons[end].append((_EPSILON, exit_state))
+                end = sub_end
+            self.epsilons[end].append((_EPSILON, exit_state))
+            return start, exit_state
+        # Backreferences, lookarounds, atomic groups, possessive repeats, \b
+        raise Unsupported(str(op))
+
+
+class HostDFA:
+    """
+    One lazily built DFA for many regex rules, over the hostname alphabet.
+
+    The rules are compiled into a shared NFA; DFA states (sets of NFA
+    states) and their transitions are only built the first time a host
+    needs them, one table row of len(HOSTNAME_ALPHABET) entries per state.
+    A scan is one table lookup per character whatever the number of rules,
+    so matching is O(len(host)). When more than max_states states have
+    been built the cache is flushed and rebuilt on demand.
+
+    Rules using unsupported constructs (backreferences, lookarounds, \\b,
+    case-insensitive flags, huge counted repeats) are listed in
+    `unsupported` and must be matched with `re` by the caller.
+    """
+
+    def __init__(self, patterns: Iterable[str], max_states: int = MAX_DFA_STATES):
+        self.max_states = max_states
+        self.flushes = 0
+        self.supported: List[int] = []
+        self.unsupported: List[int] = []
+        self._nfa = _NFA()
+        for index, pattern in enumerate(patterns):
+            try:
+                self._nfa.add_rule(pattern, index)
+                self.supported.append(index)
+            except (Unsupported, RecursionError, OverflowError):
+                self.unsupported.append(index)
+        self._reset()
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+    def _reset(self):
+        self._ids: Dict[FrozenSet[int], int] = {}
+        self._sets: List[FrozenSet[int]] = []
+        self._table: List[List[int]] = []
+        self._fired: List[Tuple[int, ...]] = []
+        self._fired_at_end: List[Optional[Tuple[int, ...]]] = []
+        self._restart = self._closure([self._nfa.start], at_begin=False)
+        self.initial = self._state_id(self._closure([self._nfa.start], at_begin=True))
+
+    def _closure(self, states: Iterable[int], at_begin: bool, at_end: bool = False) -> FrozenSet[int]:
+        epsilons = self._nfa.epsilons
+        seen = set(states)
+        stack = list(seen)
+        while stack:
+            for kind, target in epsilons[stack.pop()]:
+                if target in seen:
+                    continue
+                if kind == _EPSILON or (kind == _AT_BEGIN and at_begin) or (kind == _AT_END and at_end):
+                    seen.add(target)
+                    stack.append(target)
+        return frozenset(seen)
+
+    def _state_id(self, states: FrozenSet[int]) -> int:
+        state_id = self._ids.get(states)
+        if state_id is None:
+            state_id = self._ids[states] = len(self._sets)
+            self._sets.append(states)
+            self._table.append([-1] * len(HOSTNAME_ALPHABET))
+            accepts = self._nfa.accepts
+            self._fired.append(tuple(sorted(accepts[state] for state in states if state in accepts)))
+            self._fired_at_end.append(None)
+        return state_id
+
+    def _step(self, state_id: int, symbol: int) -> int:
+        """Build the transition of state_id on symbol."""
+        if len(self._sets) >= self.max_states:
+            current = self._sets[state_id]
+            self.flushes += 1
+            self._reset()
+            state_id = self._state_id(current)
+        bit = 1 << symbol
+        targets = [target for state in self._sets[state_id]
+                   for mask, target in self._nfa.edges[state] if mask & bit]
+        # Unanchored search: a match may start at every position
+        following = self._state_id(self._closure(targets, at_begin=False) | self._restart)
+        self._table[state_id][symbol] = following
+        return following
+
+    def _end_matches(self, state_id: int) -> Tuple[int, ...]:
+        fired = self._fired_at_end[state_id]
+        if fired is None:
+            accepts = self._nfa.accepts
+            closure = self._closure(self._sets[state_id], at_begin=False, at_end=True)
+            fired = self._fired_at_end[state_id] = tuple(sorted(accepts[state] for state in closure if state in accepts))
+        return fired
+
+    def search(self, host: str) -> Optional[List[int]]:
+        """
+        Return the indices of the supported rules matching host, in rule order.
+
+        Returns None when host has characters outside the hostname
+        alphabet; the caller then has to use `re`.
+        """
+        try:
+            symbols = [SYMBOLS[char] for char in host]
+        except KeyError:
+            return None
+        if not symbols:
+            accepts = self._nfa.accepts
+            closure = self._closure([self._nfa.start], at_begin=True, at_end=True)
+            return sorted({accepts[state] for state in closure if state in accepts})
+        table = self._table
+        fired = self._fired
+        found = set(fired[self.initial])
+        state_id = self.initial
+        for symbol in symbols:
+            following = table[state_id][symbol]
+            if following < 0:
+                following = self._step(state_id, symbol)
+                table = self._table
+                fired = self._fired
+            state_id = following
+            if fired[state_id]:
+                found.update(fired[state_id])
+        found.update(self._end_matches(state_id))
+        return sorted(found)
+
+    def stats(self) -> Dict:
+        return {
+            "rules": len(self.supported),
+            "fallback_rules": len(self.unsupported),
+            "nfa_states": len(self._nfa.edges),
+            "dfa_states": len(self._sets),
+            "max_states": self.max_states,
+            "flushes": self.flushes,
+        }
@@ -1,9 +1,29 @@
 import json
 import yaml
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 from datetime import datetime
 import re
 
+from cidr import export_networks
+from rulefile import parse_rule_line
+
+
+def _join_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Yield lines joined by newlines, like "\\n".join(lines) but one chunk at a time."""
+    separator = ""
+    for line in lines:
+        yield separator + line
+        separator = "\n"
+
+
+def _export_metadata() -> Dict[str, Any]:
+    return {
+        "version": "2.0",
+        "exported_at": datetime.now().isoformat(),
+        "description": "TLS Bypass Rules Export",
+        "for_authorized_testing_only": True
+    }
+
 
 class Exporter:
     """Class for handling rule exports in various formats."""
@@ -11,101 +31,117 @@ class Exporter:
     def __init__(self, rule_manager):
         self.rule_manager = rule_manager
     
-    def export_to_txt(self, enabled_only: bool = True) -> str:
-        """Export rules to plain text format."""
-        hosts, rules = self.rule_manager.read_rules()
-        
-        content = []
-        content.append("# TLS Bypass Rules Export")
-        content.append(f"# Exported: {datetime.now()}")
-        content.append("# For authorized testing only")
-        content.append("")
-        
-        if hosts:
-            content.append("[BLOCK_HOSTS]")
-            content.extend(hosts)
-            content.append("")
-        
-        if rules:
-            content.append("[BLOCK_RULES]")
-            content.extend(rules)
+    def iter_txt(self, enabled_only: bool = True) -> Iterator[str]:
+        """Stream the plain text export chunk by chunk."""
+        def lines():
+            yield "# TLS Bypass Rules Export"
+            yield f"# Exported: {datetime.now()}"
+            yield "# For authorized testing only"
+            yield ""
+            
+            hosts = self.rule_manager.iter_rules(section="host", enabled=True)
+            first_host = next(hosts, None)
+            if first_host is not None:
+                yield "[BLOCK_HOSTS]"
+                yield first_host["pattern"]
+                for rule in hosts:
+                    yield rule["pattern"]
+                yield ""
+            
+            rules = self.rule_manager.iter_rules(section="regex", enabled=True)
+            first_rule = next(rules, None)
+            if first_rule is not None:
+                yield "[BLOCK_RULES]"
+                yield first_rule["pattern"]
+                for rule in rules:
+                    yield rule["pattern"]
+                yield ""
+            
+            cidrs = self.rule_manager.iter_rules(section="cidr", enabled=True)
+            first_cidr = next(cidrs, None)
+            if first_cidr is not None:
+                yield "[BLOCK_CIDRS]"
+                yield first_cidr["pattern"]
+                for rule in cidrs:
+                    yield rule["pattern"]
         
-        return "\n".join(content)
+        return _join_lines(lines())
     
-    def export_to_burp_format(self) -> str:
-        """Export enabled rules in Burp Suite compatible format."""
-        all_rules = self.rule_manager.get_all_rules()
-        enabled_rules = [rule for rule in all_rules if rule["enabled"]]
-        
-        content = []
-        content.append("# Burp Suite TLS Bypass Rules")
-        content.append(f"# Exported: {datetime.now()}")
-        content.append("# For authorized testing only")
-        content.append("")
-        
-        for rule in enabled_rules:
-            content.append(rule["pattern"])
+    def iter_burp_format(self) -> Iterator[str]:
+        """Stream the Burp Suite export chunk by chunk."""
+        def lines():
+            yield "# Burp Suite TLS Bypass Rules"
+            yield f"# Exported: {datetime.now()}"
+            yield "# For authorized testing only"
+            yield ""
+            
+            # Burp has no CIDR syntax; ranges are collapsed and written last
+            cidrs = []
+            for rule in self.rule_manager.iter_rules(enabled=True):
+                if rule["type"] == "cidr":
+                    cidrs.append(rule["pattern"])
+                else:
+                    yield rule["pattern"]
+            yield from export_networks(cidrs, self.rule_manager.cidr_export)
         
-        return "\n".join(content)
+        return _join_lines(lines())
     
-    def export_to_json(self) -> str:
-        """Export rules to JSON format."""
-        all_rules = self.rule_manager.get_all_rules()
+    def iter_json(self) -> Iterator[str]:
+        """Stream the JSON export; the output is identical to json.dumps(..., indent=2)."""
+        header = json.dumps({"metadata": _export_metadata()}, indent=2)
+        yield header[:-2] + ",\n  \"rules\": ["
         
-        export_data = {
-            "metadata": {
-                "version": "2.0",
-                "exported_at": datetime.now().isoformat(),
-                "description": "TLS Bypass Rules Export",
-                "for_authorized_testing_only": True
-            },
-            "rules": []
-        }
-        
-        for rule in all_rules:
-            export_data["rules"].append({
+        separator = "\n"
+        for rule in self.rule_manager.iter_rules():
+            record = json.dumps({
                 "pattern": rule["pattern"],
                 "type": rule["type"],
                 "enabled": rule["enabled"]
-            })
+            }, indent=2)
+            yield separator + "    " + record.replace("\n", "\n    ")
+            separator = ",\n"
         
-        return json.dumps(export_data, indent=2)
+        yield "]\n}" if separator == "\n" else "\n  ]\n}"
     
-    def export_to_yaml(self) -> str:
-        """Export rules to YAML format."""
-        all_rules = self.rule_manager.get_all_rules()
-        
-        export_data = {
-            "metadata": {
-                "version": "2.0",
-                "exported_at": datetime.now().isoformat(),
-                "description": "TLS Bypass Rules Export",
-                "for_authorized_testing_only": True
-            },
-            "rules": []
-        }
+    def iter_yaml(self) -> Iterator[str]:
+        """Stream the YAML export; the output is identical to yaml.dump(..., default_flow_style=False)."""
+        yield yaml.dump({"metadata": _export_metadata()}, default_flow_style=False)
         
-        for rule in all_rules:
-            export_data["rules"].append({
+        empty = True
+        for rule in self.rule_manager.iter_rules():
+            if empty:
+                yield "rules:\n"
+                empty = False
+            yield yaml.dump([{
                 "pattern": rule["pattern"],
                 "type": rule["type"],
                 "enabled": rule["enabled"]
-            })
+            }], default_flow_style=False)
         
-        return yaml.dump(export_data, default_flow_style=False)
+        if empty:
+            yield "rules: []\n"
+    
+    def export_to_txt(self, enabled_only: bool = True) -> str:
+        """Export rules to plain text format."""
+        return "".join(self.iter_txt(enabled_only))
+    
+    def export_to_burp_format(self) -> str:
+        """Export enabled rules in Burp Suite compatible format."""
+        return "".join(self.iter_burp_format())
+    
+    def export_to_json(self) -> str:
+        """Export rules to JSON format."""
+        return "".join(self.iter_json())
+    
+    def export_to_yaml(self) -> str:
+        """Export rules to YAML format."""
+        return "".join(self.iter_yaml())
     
     def export_to_dict(self) -> Dict[str, Any]:
         """Export rules to a Python dictionary."""
-        all_rules = self.rule_manager.get_all_rules()
-        
         return {
-            "metadata": {
-                "version": "2.0",
-                "exported_at": datetime.now().isoformat(),
-                "description": "TLS Bypass Rules Export",
-                "for_authorized_testing_only": True
-            },
-            "rules": all_rules
+            "metadata": _export_metadata(),
+            "rules": [rule.to_dict() for rule in self.rule_manager.iter_rules()]
         }
 
 
@@ -123,17 +159,8 @@ class Importer:
             if "rules" not in data:
                 return False
             
-            # Clear existing rules and import new ones
-            # For simplicity, we'll append the imported rules
-            for rule in data["rules"]:
-                pattern = rule.get("pattern", "")
-                rule_type = rule.get("type", "regex")
-                enabled = rule.get("enabled", True)
-                
-                if pattern:
-                    self.rule_manager.add_rule(pattern, rule_type, enabled)
-            
-            return True
+            # Existing rules are kept; the imported rules are appended
+            return self.import_from_dict(data)
         except json.JSONDecodeError:
             return False
     
@@ -145,15 +172,7 @@ class Importer:
             if "rules" not in data:
                 return False
             
-            for rule in data["rules"]:
-                pattern = rule.get("pattern", "")
-                rule_type = rule.get("type", "regex")
-                enabled = rule.get("enabled", True)
-                
-                if pattern:
-                    self.rule_manager.add_rule(pattern, rule_type, enabled)
-            
-            return True
+            return self.import_from_dict(data)
         except yaml.YAMLError:
             return False
     
@@ -161,6 +180,7 @@ class Importer:
         """Import rules from plain text format."""
         lines = txt_content.splitlines()
         current_section = None
+        rules = []
         
         for line in lines:
             line = line.strip()
@@ -169,23 +189,17 @@ class Importer:
                 current_section = "host"
             elif "[BLOCK_RULES]" in line:
                 current_section = "regex"
+            elif "[BLOCK_CIDRS]" in line:
+                current_section = "cidr"
             elif line and not line.startswith("#"):
-                # Add rule based on current section
+                # Add rule based on current section; "+ x" / "- x" carry the
+                # enabled flag, bare lines are enabled
                 if current_section:
-                    rule_type = current_section
-                    enabled = True
-                    pattern = line
-                    
-                    # Check if the line is commented out (disabled)
-                    if line.startswith("#DISABLED"):
-                        pattern = line[10:].strip()
-                        enabled = False
-                    elif line.startswith("#"):
-                        pattern = line[1:].strip()
-                        enabled = False
-                    
-                    self.rule_manager.add_rule(pattern, rule_type, enabled)
+                    enabled, pattern, _ = parse_rule_line(line)
+                    rules.append((pattern, current_section, enabled))
         
+        # One backup, one write and one Burp sync for the whole import
+        self.rule_manager.add_rules(rules)
         return True
     
     def import_from_dict(self, data: Dict[str, Any]) -> bool:
@@ -193,14 +207,17 @@ class Importer:
         if "rules" not in data:
             return False
         
+        rules = []
         for rule in data["rules"]:
             pattern = rule.get("pattern", "")
             rule_type = rule.get("type", "regex")
             enabled = rule.get("enabled", True)
             
             if pattern:
-                self.rule_manager.add_rule(pattern, rule_type, enabled)
+                rules.append((pattern, rule_type, enabled))
         
+        # One backup, one write and one Burp sync for the whole import
+        self.rule_manager.add_rules(rules)
         return True
 
 
@@ -227,6 +244,27 @@ class RuleExporterImporter:
         else:
             raise ValueError(f"Unsupported export format: {format_type}")
     
+    def iter_export(self, format_type: str, **kwargs) -> Iterator[str]:
+        """Stream an export in the specified format as text chunks."""
+        format_type = format_type.lower()
+        
+        if format_type == "txt":
+            return self.exporter.iter_txt(**kwargs)
+        elif format_type == "burp":
+            return self.exporter.iter_burp_format()
+        elif format_type == "json":
+            return self.exporter.iter_json()
+        elif format_type == "yaml":
+            return self.exporter.iter_yaml()
+        else:
+            raise ValueError(f"Unsupported export format: {format_type}")
+    
+    def export_to_file(self, format_type: str, filename: str, **kwargs):
+        """Export rules straight to a file without building the whole export in memory."""
+        chunks = self.iter_export(format_type, **kwargs)
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.writelines(chunks)
+    
     def import_rules(self, format_type: str, content: str) -> bool:
         """Import rules from the specified format."""
         format_type = format_type.lower()
@@ -1,13 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
+import queue
 import sys
 from typing import Optional
 
 # Add the project root to the Python path to import our modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-from rules import RuleManager, RuleTemplate
+from rules import RuleTemplate
+from rulestore import open_rule_manager
 from exports import RuleExporterImporter
 
 
@@ -20,12 +22,21 @@ class TLSBypassRuleGUI:
         self.root.geometry("900x700")
         
         # Initialize managers
-        self.rule_manager = RuleManager()
+        self.rule_manager = open_rule_manager()
         self.exporter_importer = RuleExporterImporter(self.rule_manager)
         
+        # Treeview item -> rule id, so edits target exactly the selected rule
+        self.rule_ids = {}
+        
         # Create the GUI
         self.create_widgets()
         self.refresh_rules()
+        
+        # Reload the list when the rule file is edited outside the app. The
+        # watcher runs in its own thread, so updates reach Tk through a queue.
+        self.rule_updates = queue.Queue()
+        self.watcher = self.rule_manager.watch(callback=lambda rules, changed: self.rule_updates.put(rules))
+        self.root.after(500, self.poll_rule_updates)
     
     def create_widgets(self):
         """Create all GUI widgets."""
@@ -107,19 +118,31 @@ class TLSBypassRuleGUI:
         help_button = ttk.Button(main_frame, text="Help", command=self.show_help)
         help_button.grid(row=4, column=0, columnspan=3, pady=(10, 0))
     
-    def refresh_rules(self):
-        """Refresh the rules list."""
+    def poll_rule_updates(self):
+        """Apply the latest rule set pushed by the file watcher."""
+        rules = None
+        while not self.rule_updates.empty():
+            rules = self.rule_updates.get_nowait()
+        if rules is not None:
+            self.refresh_rules(rules)
+        self.root.after(500, self.poll_rule_updates)
+    
+    def refresh_rules(self, all_rules=None):
+        """Refresh the rules list, from the given rules or a fresh read of the rule file."""
         # Clear existing items
         for item in self.rules_tree.get_children():
             self.rules_tree.delete(item)
         
         # Get all rules
-        all_rules = self.rule_manager.get_all_rules()
+        if all_rules is None:
+            all_rules = self.rule_manager.get_all_rules()
         
-        # Insert rules into the treeview
+        # Insert rules into the treeview, remembering each row's rule id
+        self.rule_ids = {}
         for i, rule in enumerate(all_rules, 1):
             status = "ENABLED" if rule["enabled"] else "DISABLED"
-            self.rules_tree.insert("", "end", values=(i, status, rule["type"].upper(), rule["pattern"]))
+            item = self.rules_tree.insert("", "end", values=(i, status, rule["type"].upper(), rule["pattern"]))
+            self.rule_ids[item] = rule.id
         
         # Update stats
         stats = self.rule_manager.get_rule_stats()
@@ -127,14 +150,21 @@ class TLSBypassRuleGUI:
                      f"Enabled: {stats['enabled']} | "
                      f"Disabled: {stats['disabled']} | "
                      f"Hosts: {stats['total_hosts']} | "
-                     f"Regex: {stats['total_rules']}")
+                     f"Regex: {stats['total_rules']} | "
+                     f"CIDR: {stats['total_cidrs']}")
+        hits = self.rule_manager.get_hit_stats()
+        if hits is not None:
+            if hits["hot"]:
+                pattern, count, _ = hits["hot"][0]
+                stats_text += f" | Hottest: {pattern} ({count} hits)"
+            stats_text += f" | Dead: {hits['dead_count']}"
         self.stats_label.config(text=stats_text)
     
     def add_rule_dialog(self):
         """Dialog for adding a new rule."""
         dialog = tk.Toplevel(self.root)
         dialog.title("Add Rule")
-        dialog.geometry("400x300")
+        dialog.geometry("400x330")
         dialog.transient(self.root)
         dialog.grab_set()
         
@@ -146,26 +176,33 @@ class TLSBypassRuleGUI:
         rule_type = tk.StringVar(value="regex")
         ttk.Radiobutton(dialog, text="Host (exact match)", variable=rule_type, value="host").grid(row=1, column=0, sticky=tk.W, padx=20, pady=2)
         ttk.Radiobutton(dialog, text="Regex (pattern match)", variable=rule_type, value="regex").grid(row=2, column=0, sticky=tk.W, padx=20, pady=2)
+        ttk.Radiobutton(dialog, text="CIDR (IP range, e.g. 10.0.0.0/8)", variable=rule_type, value="cidr").grid(row=3, column=0, sticky=tk.W, padx=20, pady=2)
         
         # Pattern
-        ttk.Label(dialog, text="Pattern:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(dialog, text="Pattern:").grid(row=4, column=0, sticky=tk.W, padx=5, pady=5)
         pattern_var = tk.StringVar()
         pattern_entry = ttk.Entry(dialog, textvariable=pattern_var, width=50)
-        pattern_entry.grid(row=4, column=0, sticky=(tk.W, tk.E), padx=5, pady=2)
+        pattern_entry.grid(row=5, column=0, sticky=(tk.W, tk.E), padx=5, pady=2)
         
         # Enabled status
         enabled_var = tk.BooleanVar(value=True)
-        ttk.Checkbutton(dialog, text="Enabled", variable=enabled_var).grid(row=5, column=0, sticky=tk.W, padx=5, pady=5)
+        ttk.Checkbutton(dialog, text="Enabled", variable=enabled_var).grid(row=6, column=0, sticky=tk.W, padx=5, pady=5)
         
         # Validate and test buttons
         button_frame = ttk.Frame(dialog)
-        button_frame.grid(row=6, column=0, pady=10)
+        button_frame.grid(row=7, column=0, pady=10)
         
         def validate_regex():
             pattern = pattern_var.get()
             if rule_type.get() == "regex":
                 is_valid, error_msg = self.rule_manager.validate_regex(pattern)
-                if is_valid:
+                report = self.rule_manager.analyze_regex(pattern)
+                if is_valid and report["issues"]:
+                    messagebox.showwarning("Validation",
+                                           f"Regex is valid but has {report['risk']} backtracking risk:\n"
+                                           + "\n".join(report["issues"])
+                                           + f"\n\nEstimated cost: {report['cost']:.2f} µs per host")
+                elif is_valid:
                     messagebox.showinfo("Validation", "Regex is valid!")
                 else:
                     messagebox.showerror("Validation", f"Invalid regex: {error_msg}")
@@ -198,7 +235,7 @@ class TLSBypassRuleGUI:
                     return
             
             if self.rule_manager.add_rule(pattern, rule_type.get(), enabled_var.get()):
-                messagebox.showinfo("Success", f"Rule added: {pattern}")
+                messagebox.showinfo("Success", f"Rule added: {pattern}" + self.format_rewrites())
                 dialog.destroy()
                 self.refresh_rules()
             else:
@@ -210,6 +247,13 @@ class TLSBypassRuleGUI:
         # Configure column weight
         dialog.columnconfigure(0, weight=1)
     
+    def format_rewrites(self) -> str:
+        """Describe the rewrites the normaliser applied to newly added rules."""
+        changes = [change for rewrite in self.rule_manager.pop_rewrites() for change in rewrite["changes"]]
+        if not changes:
+            return ""
+        return "\n\nNormalized:\n" + "\n".join(changes)
+    
     def toggle_rule(self):
         """Toggle the selected rule's status."""
         selected = self.rules_tree.selection()
@@ -221,7 +265,7 @@ class TLSBypassRuleGUI:
         values = item['values']
         pattern = values[3]  # Pattern is in the 4th column
         
-        if self.rule_manager.toggle_rule(pattern):
+        if self.rule_manager.toggle_rule(pattern, rule_id=self.rule_ids.get(selected[0])):
             messagebox.showinfo("Success", f"Toggled rule: {pattern}")
             self.refresh_rules()
         else:
@@ -239,7 +283,7 @@ class TLSBypassRuleGUI:
         pattern = values[3]  # Pattern is in the 4th column
         
         if messagebox.askyesno("Confirm", f"Are you sure you want to remove rule: {pattern}?"):
-            if self.rule_manager.remove_rule(pattern):
+            if self.rule_manager.remove_rule(pattern, rule_id=self.rule_ids.get(selected[0])):
                 messagebox.showinfo("Success", f"Removed rule: {pattern}")
                 self.refresh_rules()
             else:
@@ -371,7 +415,7 @@ class TLSBypassRuleGUI:
                 return
             
             if self.rule_manager.add_rule(pattern, "regex", True):
-                messagebox.showinfo("Success", f"Rule added: {pattern}")
+                messagebox.showinfo("Success", f"Rule added: {pattern}" + self.format_rewrites())
                 dialog.destroy()
             else:
                 messagebox.showerror("Error", "Failed to add rule")
@@ -524,10 +568,7 @@ class TLSBypassRuleGUI:
             format_type = 'txt'
         
         try:
-            exported_content = self.exporter_importer.export(format_type)
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(exported_content)
+            self.exporter_importer.export_to_file(format_type, filename)
             
             messagebox.showinfo("Success", f"Rules exported to: {filename}")
         except Exception as e:
@@ -563,7 +604,7 @@ class TLSBypassRuleGUI:
                 content = f.read()
             
             if self.exporter_importer.import_rules(format_type, content):
-                messagebox.showinfo("Success", f"Rules imported from: {filename}")
+                messagebox.showinfo("Success", f"Rules imported from: {filename}" + self.format_rewrites())
                 self.refresh_rules()
             else:
                 messagebox.showerror("Error", "Import failed. Invalid format or content.")
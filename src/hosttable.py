@@ -0,0 +1,217 @@
+import hashlib
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Host sections at least this large (in bytes of rule text) are served from
+# the on-disk table instead of being loaded into the matcher tables
+HOST_TABLE_MIN_BYTES = 4 * 1024 * 1024
+
+# Hosts sorted in memory at a time while building; larger sections are
+# merged from sorted runs on disk
+RUN_SIZE = 1000000
+
+# Bloom filter sizing: ~1% false positives at 10 bits and 7 probes per host
+BLOOM_BITS_PER_HOST = 10
+BLOOM_HASHES = 7
+
+# Layout: magic, hex digest of the hosts section, newline, header struct,
+# Bloom filter bits (padded to 8 bytes), count + 1 uint64 offsets, host bytes
+TABLE_MAGIC = b"TLSHOSTS-1\n"
+_HEADER = struct.Struct("<QQQQ")  # count, blob size, bloom bits, bloom hashes
+_DIGEST_LENGTH = 32
+
+
+def _bloom_positions(host: bytes, bits: int, hashes: int) -> Iterator[int]:
+    """Yield the Bloom filter bit positions of host (double hashing over one blake2b)."""
+    digest = hashlib.blake2b(host, digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    step = int.from_bytes(digest[8:], "little") | 1
+    for i in range(hashes):
+        yield (first + i * step) % bits
+
+
+def _read_run(spool) -> Iterator[bytes]:
+    with spool:
+        for line in spool:
+            yield line[:-1]
+
+
+def _spool_run(chunk) -> Iterator[bytes]:
+    """Write chunk, sorted, to a temporary file now and return a reader over it."""
+    spool = tempfile.TemporaryFile()
+    spool.writelines(host + b"\n" for host in sorted(chunk))
+    spool.seek(0)
+    return _read_run(spool)
+
+
+def _sorted_runs(hosts: Iterable[str], run_size: int) -> Tuple[List[Iterator[bytes]], int]:
+    """
+    Split hosts into sorted, de-duplicated runs and count them.
+
+    Every run but a lone one is spooled to a temporary file, so only
+    run_size hosts are held in memory at a time.
+    """
+    runs = []
+    total = 0
+    chunk = set()
+    for host in hosts:
+        chunk.add(host.encode("utf-8"))
+        if len(chunk) >= run_size:
+            runs.append(_spool_run(chunk))
+            total += len(chunk)
+            chunk = set()
+    total += len(chunk)
+    if not runs:
+        return [iter(sorted(chunk))], total
+    if chunk:
+        runs.append(_spool_run(chunk))
+    return runs, total
+
+
+def build_host_table(path: str, hosts: Iterable[str], digest: str, run_size: int = RUN_SIZE) -> int:
+    """
+    Write the sorted host table for hosts to path, keyed by the hosts section digest.
+
+    Hosts are sorted in runs of run_size and merged, so memory use stays
+    bounded by the run size plus the Bloom filter and 8 bytes of offset per
+    host. The file is written next to path and swapped in atomically.
+
+    Returns:
+        int: number of distinct hosts in the table
+    """
+    runs, total = _sorted_runs(hosts, run_size)
+    # Sized for the hosts before cross-run duplicates are dropped
+    bits = max(total * BLOOM_BITS_PER_HOST, 64)
+    bloom = bytearray((bits + 63) // 64 * 8)
+    offsets = array("Q", [0])
+    previous = None
+    temp_path = f"{path}.tmp"
+    with tempfile.TemporaryFile() as blob:
+        for host in heapq.merge(*runs):
+            if host == previous:
+                continue
+            blob.write(host)
+            offsets.append(offsets[-1] + len(host))
+            for position in _bloom_positions(host, bits, BLOOM_HASHES):
+                bloom[position >> 3] |= 1 << (position & 7)
+            previous = host
+        count = len(offsets) - 1
+
+        with open(temp_path, "wb") as f:
+            f.write(TABLE_MAGIC)
+            f.write(digest.encode("ascii") + b"\n")
+            f.write(_HEADER.pack(count, offsets[-1], bits, BLOOM_HASHES))
+            f.write(bloom)
+            f.write(offsets.tobytes())
+            blob.seek(0)
+            shutil.copyfileobj(blob, f)
+    os.replace(temp_path, path)
+    return count
+
+
+class HostTable:
+    """
+    Memory-mapped sorted host table with a Bloom filter in front.
+
+    Hosts are stored sorted and back to back, with a fixed-width offset per
+    host, so a lookup is a binary search that touches about log2(n) pages
+    of the file; the Bloom filter answers most misses without touching the
+    table at all. Nothing is loaded into memory up front, so tables of
+    millions of hosts open instantly.
+    """
+
+    def __init__(self, path: str, digest: Optional[str] = None):
+        """Open the table at path; raises ValueError if it is corrupt or not built from digest."""
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        try:
+            self._parse_header(digest)
+        except (ValueError, struct.error):
+            self.close()
+            raise ValueError(f"{path} is not a host table for this rule file")
+        self.bloom_rejections = 0
+        self.lookups = 0
+
+    def _parse_header(self, digest: Optional[str]):
+        buffer = self._buffer
+        if buffer[:len(TABLE_MAGIC)] != TABLE_MAGIC:
+            raise ValueError("bad magic")
+        position = len(TABLE_MAGIC)
+        self.digest = buffer[position:position + _DIGEST_LENGTH].decode("ascii")
+        if digest is not None and self.digest != digest:
+            raise ValueError("stale table")
+        position += _DIGEST_LENGTH + 1
+        self.count, blob_size, self.bloom_bits, self.bloom_hashes = _HEADER.unpack_from(buffer, position)
+        position += _HEADER.size
+        self._bloom_start = position
+        position += (self.bloom_bits + 63) // 64 * 8
+        self._offsets = memoryview(buffer)[position:position + (self.count + 1) * 8].cast("Q")
+        self._blob_start = position + (self.count + 1) * 8
+        if self._blob_start + blob_size != len(buffer):
+            raise ValueError("truncated table")
+
+    @classmethod
+    def open(cls, path: str, digest: str) -> Optional["HostTable"]:
+        """Return the table at path if it exists and was built from digest, else None."""
+        try:
+            return cls(path, digest)
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        if getattr(self, "_offsets", None) is not None:
+            self._offsets.release()
+            self._offsets = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key(self, index: int) -> bytes:
+        start = self._blob_start + self._offsets[index]
+        return self._buffer[start:self._blob_start + self._offsets[index + 1]]
+
+    def __contains__(self, host: str) -> bool:
+        self.lookups += 1
+        key = host.encode("utf-8")
+        bloom = self._buffer
+        start = self._bloom_start
+        for position in _bloom_positions(key, self.bloom_bits, self.bloom_hashes):
+            if not bloom[start + (position >> 3)] & (1 << (position & 7)):
+                self.bloom_rejections += 1
+                return False
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self._key(low) == key
+
+    def get(self, host: str) -> Optional[str]:
+        """Return host if it is in the table (host rules report themselves), else None."""
+        return host if host in self else None
+
+    def stats(self) -> Dict:
+        return {
+            "hosts": self.count,
+            "bloom_bits": self.bloom_bits,
+            "lookups": self.lookups,
+            "bloom_rejections": self.bloom_rejections,
+        }
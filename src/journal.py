@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from rulefile import MARKER_FOR_TYPE, RULE_TYPES, SECTION_MARKERS, Rule, format_rule_line, parse_rule_line
+
+
+class RuleJournal:
+    """
+    Append-only write-ahead log of rule mutations.
+
+    Each mutation is one JSON line stored next to the rule file:
+
+        {"op": "add", "id": ..., "pattern": ..., "type": ..., "enabled": ...}
+        {"op": "set", "id": ..., "enabled": ...}
+        {"op": "remove", "id": ...}
+
+    Records carry the resulting state rather than a toggle, so replaying a
+    record that has already been folded into the rule file is harmless.
+    The replayed state is kept in memory and only new bytes are read when
+    the journal grows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # Rebind instead of clearing so readers iterating a snapshot are unaffected
+        self.added: Dict[str, Rule] = {}
+        self.enabled: Dict[str, bool] = {}
+        self.removed = set()
+        self.records = 0
+        self._offset = 0
+        self._inode = None
+
+    def __len__(self) -> int:
+        return self.records
+
+    def refresh(self):
+        """Replay records appended since the last refresh (by any writer)."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.records:
+                    self._clear()
+                return
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._clear()
+                self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            # A partially written last record is picked up on a later refresh
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self._offset += end
+
+    def append(self, record: Dict):
+        """Append one mutation record and apply it to the replayed state."""
+        self.extend([record])
+
+    def extend(self, records: Iterable[Dict]):
+        """Append several mutation records with a single write."""
+        with self._lock:
+            data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self.refresh()
+
+    def reset(self):
+        """Discard all records once they have been folded into the rule file."""
+        with self._lock:
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+            self._clear()
+
+    def _apply(self, record: Dict):
+        self.records += 1
+        op = record.get("op")
+        rule_id = record.get("id")
+        if op == "add":
+            self.added[rule_id] = Rule(record["pattern"], record["type"], record["enabled"], rule_id)
+        elif op == "set":
+            rule = self.added.get(rule_id)
+            if rule is not None:
+                self.added[rule_id] = Rule(rule.pattern, rule.type, record["enabled"], rule_id, rule.tags)
+            else:
+                self.enabled[rule_id] = record["enabled"]
+        elif op == "remove":
+            if self.added.pop(rule_id, None) is None:
+                self.removed.add(rule_id)
+            self.enabled.pop(rule_id, None)
+
+    def state(self, rule_id: str) -> Optional[bool]:
+        """
+        Return the journaled enabled state of a rule.
+
+        None means the journal does not override the rule; removed rules
+        raise KeyError.
+        """
+        if rule_id in self.removed:
+            raise KeyError(rule_id)
+        rule = self.added.get(rule_id)
+        if rule is not None:
+            return rule.enabled
+        return self.enabled.get(rule_id)
+
+    def overlay(self, rules: Iterable[Rule], section: Optional[str] = None) -> Iterator[Rule]:
+        """
+        Apply the journal to rules read from the rule file.
+
+        Added rules are yielded after the last rule of their section, which
+        is where compaction will write them.
+        """
+        added, enabled, removed = self.added, self.enabled, self.removed
+        pending = list(added.values())
+        seen = set()
+        flushed = set()
+        current = None
+        for rule in rules:
+            if rule.type != current:
+                if current is not None:
+                    flushed.add(current)
+                    yield from (r for r in pending if r.type == current and r.id not in seen)
+                current = rule.type
+            rule_id = rule.id
+            if rule_id in removed:
+                continue
+            seen.add(rule_id)
+            state = enabled.get(rule_id)
+            if state is not None and state != rule.enabled:
+                rule = Rule(rule.pattern, rule.type, state, rule_id, rule.tags)
+            yield rule
+        for rule_type in RULE_TYPES:
+            if rule_type not in flushed and section in (None, rule_type):
+                yield from (r for r in pending if r.type == rule_type and r.id not in seen)
+
+    def fold(self, lines: List[str], timestamp: str) -> List[str]:
+        """
+        Return the rule file lines with every journaled mutation applied.
+
+        New rules go at the end of their section's first block, like
+        RuleManager.add_rule places them.
+        """
+        output = []
+        insert_at = {}
+        seen = set()
+        section = None
+        block_open = False
+        for raw in lines:
+            stripped = raw.strip()
+            if stripped in SECTION_MARKERS:
+                section = SECTION_MARKERS[stripped]
+                output.append(raw)
+                block_open = section not in insert_at
+                if block_open:
+                    insert_at[section] = len(output)
+                continue
+            if stripped.startswith("# Last Updated:"):
+                output.append(f"# Last Updated: {timestamp}")
+                continue
+            if block_open and not stripped:
+                block_open = False
+
+            parsed = parse_rule_line(stripped) if section else None
+            rule_id = parsed[2].get("id") if parsed else None
+            if rule_id:
+                seen.add(rule_id)
+                if rule_id in self.removed:
+                    continue
+                state = self.enabled.get(rule_id)
+                if state is not None and state != parsed[0]:
+                    tags = parsed[2]["tags"].split(",") if parsed[2].get("tags") else None
+                    raw = format_rule_line(parsed[1], state, rule_id, tags)
+
+            output.append(raw)
+            if block_open:
+                insert_at[section] = len(output)
+
+        additions = {rule_type: [] for rule_type in RULE_TYPES}
+        for rule in self.added.values():
+            if rule.id not in seen:
+                additions[rule.type].append(format_rule_line(rule.pattern, rule.enabled, rule.id))
+
+        for rule_type, position in sorted(insert_at.items(), key=lambda item: item[1], reverse=True):
+            output[position:position] = additions.pop(rule_type)
+        for rule_type, marker in MARKER_FOR_TYPE.items():
+            if additions.get(rule_type):
+                output.extend(["", marker] + additions[rule_type])
+        return output
@@ -0,0 +1,68 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+# Below this many keyword rules, one `in` test per keyword (done in C) is
+# faster than walking the hostname character by character in Python.
+AUTOMATON_MIN_KEYWORDS = 24
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over the literals of keyword-anywhere rules.
+
+    Transitions are fully resolved at build time (failure links folded in),
+    so scanning a hostname is one dict probe per character however many
+    keywords there are. Each state lists the keywords ending there,
+    including those inherited through its failure link.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, str]]):
+        self.keywords: List[Tuple[str, str]] = list(keywords)
+
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for index, (literal, _) in enumerate(self.keywords):
+            state = 0
+            for char in literal:
+                following = goto[state].get(char)
+                if following is None:
+                    following = goto[state][char] = len(goto)
+                    goto.append({})
+                    outputs.append([])
+                state = following
+            outputs[state].append(index)
+
+        # Breadth-first, so a state's failure target is resolved before it
+        self._delta: List[Dict[str, int]] = [dict() for _ in goto]
+        self._delta[0] = dict(goto[0])
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta = self._delta[state] = dict(self._delta[fail[state]])
+            delta.update(goto[state])
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char, following in goto[state].items():
+                fail[following] = self._delta[fail[state]].get(char, 0)
+                queue.append(following)
+        self._outputs: List[Tuple[int, ...]] = [tuple(sorted(set(output))) for output in outputs]
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def search(self, host: str) -> List[int]:
+        """Return the indices of every keyword occurring in host, in rule order."""
+        delta = self._delta
+        outputs = self._outputs
+        found = set()
+        state = 0
+        for char in host:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return sorted(found)
+
+    def matches(self, host: str) -> List[Tuple[str, str]]:
+        """Return the (keyword, rule pattern) pairs occurring in host, in rule order."""
+        return [self.keywords[index] for index in self.search(host)]
@@ -0,0 +1,409 @@
+import hashlib
+import marshal
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional
+
+from cidr import CIDRTable, build_ranges
+from dfa import HostDFA
+from keywords import AUTOMATON_MIN_KEYWORDS, KeywordAutomaton
+from normalize import normalize_rule
+from regex_safety import estimate_static_cost, measure_cost, sre_constants, sre_parse
+
+
+# Table layout version; bump when the structure of build_tables() changes.
+TABLES_VERSION = 3
+
+# Compiled artifact layout: magic, hex SHA-256 of the rule text, newline,
+# then the marshalled tables.
+ARTIFACT_MAGIC = b"TLSRULES-COMPILED-%d\n" % TABLES_VERSION
+_DIGEST_LENGTH = 64
+
+# Engines for the rules left in the regex table: Python's backtracking re,
+# or one lazily built DFA over the hostname alphabet (re for the rest)
+REGEX_ENGINES = ("re", "dfa")
+
+# Pseudo-hits given to every regex rule when ordering by observed traffic,
+# so rules never seen keep their cheapest-first order
+PROFILE_PRIOR_HITS = 1
+
+# Floor for measured regex costs (microseconds per search)
+MIN_REGEX_COST = 0.01
+
+
+def _literal_shape(pattern: str):
+    """
+    Classify a regex by its literal shape.
+
+    Returns (kind, literal) where kind is "exact" (^lit$), "prefix" (^lit),
+    "suffix" (lit$), "substring" (lit) or None when the pattern is not a pure
+    literal with optional anchors.
+    """
+    try:
+        items = list(sre_parse.parse(pattern).data)
+    except (re.error, RecursionError):
+        return None, None
+    begin = bool(items) and items[0] == (sre_constants.AT, sre_constants.AT_BEGINNING)
+    end = bool(items) and items[-1] == (sre_constants.AT, sre_constants.AT_END)
+    body = items[int(begin):len(items) - int(end)]
+    if not body or any(op != sre_constants.LITERAL for op, _ in body):
+        return None, None
+    literal = "".join(chr(av) for _, av in body)
+    if begin and end:
+        return "exact", literal
+    if begin:
+        return "prefix", literal
+    if end:
+        return "suffix", literal
+    return "substring", literal
+
+
+def build_tables(rules: Iterable[Dict], host_table: Optional[str] = None) -> Dict:
+    """
+    Turn enabled rules into plain lookup tables.
+
+    The result only holds builtin types so it can be marshalled into the
+    compiled rule artifact:
+
+    - hosts: exact hostname -> rule pattern
+    - cidrs: disjoint [ip version, first, last, rule pattern] address ranges
+    - suffixes: label-aligned suffix (".example.com") -> rule pattern
+    - prefixes / substrings / tails: [literal, rule pattern] pairs
+    - regexes: remaining patterns, cheapest first
+    - host_table: digest of the hosts section when the host rules live in
+      an on-disk HostTable instead (rules then holds no host rules)
+    """
+    hosts = {}
+    suffixes = {}
+    prefixes = []
+    substrings = []
+    tails = []
+    regexes = []
+    networks = []
+
+    for rule in rules:
+        if not rule["enabled"]:
+            continue
+        pattern = rule["pattern"]
+        if rule["type"] == "host":
+            hosts.setdefault(pattern, pattern)
+            continue
+        if rule["type"] == "cidr":
+            networks.append((pattern, pattern))
+            continue
+
+        # Match on the canonical form but always report the rule as written
+        canonical, canonical_type, _ = normalize_rule(pattern, "regex")
+        if canonical_type == "host":
+            hosts.setdefault(canonical, pattern)
+            continue
+
+        kind, literal = _literal_shape(canonical)
+        if kind == "exact":
+            hosts.setdefault(literal, pattern)
+        elif kind == "suffix" and literal.startswith("."):
+            suffixes.setdefault(literal, pattern)
+        elif kind == "suffix":
+            tails.append([literal, pattern])
+        elif kind == "prefix":
+            prefixes.append([literal, pattern])
+        elif kind == "substring":
+            substrings.append([literal, pattern])
+        else:
+            regexes.append([canonical, pattern, estimate_static_cost(canonical)])
+
+    regexes.sort(key=lambda entry: entry[2])
+
+    return {
+        "version": TABLES_VERSION,
+        "hosts": hosts,
+        "cidrs": build_ranges(networks),
+        "suffixes": suffixes,
+        "prefixes": prefixes,
+        "substrings": substrings,
+        "tails": tails,
+        "regexes": [[canonical, pattern] for canonical, pattern, _ in regexes],
+        "host_table": host_table,
+    }
+
+
+def plan_regex_order(costs: List[Optional[float]], hits: List[int]) -> List[int]:
+    """
+    Return the regex table indices in the order they should be tried.
+
+    For first-match classification the expected work is smallest when rules
+    are tried by decreasing hit probability per unit of cost, so rules are
+    ranked by (hits + PROFILE_PRIOR_HITS) / cost; ties keep table order.
+    Rules without a measured cost (None) are costed like the cheapest one.
+    """
+    cheapest = regex_cost_floor(costs)
+    return sorted(range(len(costs)), key=lambda index: (
+        -(hits[index] + PROFILE_PRIOR_HITS) / (cheapest if costs[index] is None else max(costs[index], MIN_REGEX_COST)),
+        index))
+
+
+def regex_cost_floor(costs: Iterable[Optional[float]]) -> float:
+    """Return the cost assumed for rules that were never measured: the cheapest measured cost."""
+    return max(min((cost for cost in costs if cost is not None), default=MIN_REGEX_COST), MIN_REGEX_COST)
+
+
+class RuleMatcher:
+    """
+    Classifies hostnames against the enabled rules.
+
+    Exact hosts and label-aligned suffix rules are resolved with dict probes,
+    IP addresses with a bisect over the CIDR ranges, pure-literal regexes with string operations, and only the remaining
+    patterns fall back to re.search (compiled lazily, cheapest first).
+    Large sets of keyword-anywhere rules share one Aho-Corasick automaton.
+    Host rules of very large rule files can come from an on-disk HostTable.
+    With regex_engine="dfa" the remaining regexes are matched together by
+    a HostDFA in one pass over the host, falling back to re per rule for
+    constructs it does not support and for hosts outside its alphabet.
+
+    Regexes are tried in regex_order, cheapest first until reorder_regexes()
+    installs a profile-guided order; regex_hits counts the hosts each regex
+    matched so the order can be adapted to live traffic.
+    """
+
+    def __init__(self, tables: Dict, regex_engine: str = "re", host_table=None):
+        if regex_engine not in REGEX_ENGINES:
+            raise ValueError(f"regex_engine must be one of {', '.join(REGEX_ENGINES)}")
+        self.hosts: Dict[str, str] = tables["hosts"]
+        # Optional hosttable.HostTable holding the host rules of large rule files
+        self.host_table = host_table
+        self.cidrs = CIDRTable(tables["cidrs"])
+        self.suffixes: Dict[str, str] = tables["suffixes"]
+        self.prefixes = [tuple(entry) for entry in tables["prefixes"]]
+        self.substrings = [tuple(entry) for entry in tables["substrings"]]
+        self.keywords: Optional[KeywordAutomaton] = None
+        if len(self.substrings) >= AUTOMATON_MIN_KEYWORDS:
+            self.keywords = KeywordAutomaton(self.substrings)
+        self.tails = [tuple(entry) for entry in tables["tails"]]
+        self.regexes = [tuple(entry) for entry in tables["regexes"]]
+        self._compiled: List[Optional[re.Pattern]] = [None] * len(self.regexes)
+        self._costs: List[Optional[float]] = [None] * len(self.regexes)
+        self.regex_order: List[int] = list(range(len(self.regexes)))
+        self._regex_rank: List[int] = list(range(len(self.regexes)))
+        # Per-regex match counts, hosts that reached the regexes, and re searches run
+        self.regex_hits: List[int] = [0] * len(self.regexes)
+        self.regex_scans = 0
+        self.regex_searches = 0
+        self.regex_engine = regex_engine
+        self.dfa: Optional[HostDFA] = None
+        if regex_engine == "dfa":
+            self.dfa = HostDFA(canonical for canonical, _ in self.regexes)
+
+    @classmethod
+    def from_rules(cls, rules: Iterable[Dict], regex_engine: str = "re") -> "RuleMatcher":
+        """Build a matcher directly from rule records."""
+        return cls(build_tables(rules), regex_engine)
+
+    def __len__(self) -> int:
+        return (len(self.hosts) + len(self.host_table or ()) + len(self.cidrs) + len(self.suffixes) + len(self.prefixes)
+                + len(self.substrings) + len(self.tails) + len(self.regexes))
+
+    def _regex(self, index: int) -> re.Pattern:
+        compiled = self._compiled[index]
+        if compiled is None:
+            compiled = self._compiled[index] = re.compile(self.regexes[index][0])
+        return compiled
+
+    def regex_cost(self, index: int) -> float:
+        """Return the measured cost of regex index in microseconds per search (measured once)."""
+        cost = self._costs[index]
+        if cost is None:
+            cost = self._costs[index] = measure_cost(self._regex(index), repeat=5)
+        return cost
+
+    def reorder_regexes(self, order: List[int]):
+        """Try the regexes in order (a permutation of the regex table indices) from now on."""
+        if sorted(order) != list(range(len(self.regexes))):
+            raise ValueError("order must be a permutation of the regex table indices")
+        rank = [0] * len(order)
+        for position, index in enumerate(order):
+            rank[index] = position
+        # Swapped in one assignment each so concurrent scans see a consistent order
+        self._regex_rank = rank
+        self.regex_order = list(order)
+
+    def regex_stats(self) -> Dict:
+        """Return the number of regex rules and the mean re searches per host that reached them."""
+        return {
+            "rules": len(self.regexes),
+            "scans": self.regex_scans,
+            "searches": self.regex_searches,
+            "searches_per_scan": self.regex_searches / self.regex_scans if self.regex_scans else 0.0,
+        }
+
+    def _iter_matches(self, host: str):
+        """Yield the pattern of every rule matching host, cheapest lookups first."""
+        pattern = self.hosts.get(host)
+        if pattern is None and self.host_table is not None:
+            pattern = self.host_table.get(host)
+        if pattern is not None:
+            yield pattern
+
+        pattern = self.cidrs.match(host)
+        if pattern is not None:
+            yield pattern
+
+        # Walk the label boundaries: a.b.example.com -> .b.example.com, .example.com, .com
+        index = host.find(".")
+        while index != -1:
+            pattern = self.suffixes.get(host[index:])
+            if pattern is not None:
+                yield pattern
+            index = host.find(".", index + 1)
+
+        yield from self._iter_scan_matches(host)
+
+    def _iter_scan_matches(self, host: str):
+        """Yield matches from the rules that need a scan of host: literals, keywords and regexes."""
+        for literal, pattern in self.prefixes:
+            if host.startswith(literal):
+                yield pattern
+        for literal, pattern in self.tails:
+            if host.endswith(literal):
+                yield pattern
+        yield from self.match_keywords(host)
+
+        if not self.regexes:
+            return
+        self.regex_scans += 1
+        fired = self.dfa.search(host) if self.dfa is not None else None
+        if fired is None:
+            for index in self.regex_order:
+                self.regex_searches += 1
+                if self._regex(index).search(host):
+                    self.regex_hits[index] += 1
+                    yield self.regexes[index][1]
+            return
+        # DFA matches and re fallbacks, merged back into regex_order
+        matched = set(fired)
+        for index in sorted(fired + self.dfa.unsupported, key=self._regex_rank.__getitem__):
+            if index not in matched:
+                self.regex_searches += 1
+                if not self._regex(index).search(host):
+                    continue
+            self.regex_hits[index] += 1
+            yield self.regexes[index][1]
+
+    def match_keywords(self, host: str) -> List[str]:
+        """Return the patterns of the keyword-anywhere rules occurring in host, in rule order."""
+        if self.keywords is not None:
+            return [pattern for _, pattern in self.keywords.matches(host)]
+        return [pattern for literal, pattern in self.substrings if literal in host]
+
+    def match(self, host: str) -> Optional[str]:
+        """Return the pattern of the first rule matching host, or None."""
+        return next(self._iter_matches(host), None)
+
+    def match_all(self, host: str) -> List[str]:
+        """Return the patterns of all rules matching host."""
+        return list(dict.fromkeys(self._iter_matches(host)))
+
+
+class MatchCache:
+    """
+    Bounded LRU cache of host classification results.
+
+    Traffic is heavily skewed towards a few hundred hostnames, so caching
+    the outcome (including "no match") turns repeated lookups into a single
+    dict probe. Hits, misses and evictions are counted for tuning maxsize.
+    """
+
+    # Returned by get() for uncached hosts, since None is a valid result
+    MISSING = object()
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """Return the cached result for key, or MatchCache.MISSING when absent."""
+        with self._lock:
+            try:
+                result = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return self.MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Hashable, result: Optional[str]):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def file_digest(path: str) -> str:
+    """Return the hex SHA-256 of a file, hashed through a memory map."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+    return digest.hexdigest()
+
+
+def write_compiled(path: str, content_hash: str, tables: Dict):
+    """Write the compiled artifact atomically so readers never see a partial file."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(ARTIFACT_MAGIC)
+        f.write(content_hash.encode("ascii") + b"\n")
+        f.write(marshal.dumps(tables))
+    os.replace(temp_path, path)
+
+
+def read_compiled(path: str, content_hash: str) -> Optional[Dict]:
+    """
+    Load the tables from a compiled artifact.
+
+    Returns None when the artifact is missing, corrupt, or was built from a
+    different version of the rule text.
+    """
+    header_length = len(ARTIFACT_MAGIC) + _DIGEST_LENGTH + 1
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= header_length:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(ARTIFACT_MAGIC)] != ARTIFACT_MAGIC:
+                    return None
+                if mm[len(ARTIFACT_MAGIC):header_length - 1].decode("ascii") != content_hash:
+                    return None
+                with memoryview(mm) as view:
+                    return marshal.loads(view[header_length:])
+    except (OSError, ValueError, EOFError, TypeError, UnicodeDecodeError):
+        return None
@@ -0,0 +1,200 @@
+import ipaddress
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from cidr import CIDRTable, build_ranges, canonical_network
+from matcher import RuleMatcher, _literal_shape
+from normalize import normalize_rule
+from scope import suffix_regex
+
+
+# Default number of sibling hosts under one parent before a suffix rule is suggested
+SIBLING_THRESHOLD = 5
+
+
+class SuffixTrie:
+    """
+    Label-wise trie of wildcard suffix rules.
+
+    Domains are stored reversed (com -> google), so the rules covering a
+    host are found by walking its labels from the right.
+    """
+
+    _TERMINAL = ""
+
+    def __init__(self):
+        self.root: Dict = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, domain: str, pattern: str):
+        """Register pattern as matching every subdomain of domain; the first one wins."""
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        if self._TERMINAL not in node:
+            node[self._TERMINAL] = pattern
+            self.size += 1
+
+    def covering(self, name: str) -> Optional[str]:
+        """Return the pattern of the broadest suffix rule covering a strict subdomain name, or None."""
+        labels = name.split(".")
+        node = self.root
+        for depth, label in enumerate(reversed(labels), 1):
+            node = node.get(label)
+            if node is None or depth == len(labels):
+                return None
+            pattern = node.get(self._TERMINAL)
+            if pattern is not None:
+                return pattern
+        return None
+
+
+def _shape(rule) -> tuple:
+    """
+    Return the literal shape of a rule.
+
+    kind is "host" (exact match), "suffix" (label-aligned suffix, name is
+    the parent domain), "tail", "prefix", "substring", "cidr" (name is the
+    canonical network) or None for a general regex.
+    """
+    if rule["type"] == "host":
+        return "host", rule["pattern"]
+    if rule["type"] == "cidr":
+        return "cidr", canonical_network(rule["pattern"])
+    canonical, canonical_type, _ = normalize_rule(rule["pattern"], "regex")
+    if canonical_type == "host":
+        return "host", canonical
+    kind, literal = _literal_shape(canonical)
+    if kind == "exact":
+        return "host", literal
+    if kind == "suffix" and literal.startswith(".") and len(literal) > 1:
+        return "suffix", literal[1:]
+    if kind == "suffix":
+        return "tail", literal
+    return kind, literal
+
+
+def _covering_literal(kind: str, name: str, prefixes: List, tails: List, substrings: List) -> Optional[str]:
+    """
+    Return the pattern of a strictly broader pure-literal rule, or None.
+
+    A substring rule covers any literal containing it, a prefix rule any
+    exact or prefix literal starting with it, and a suffix rule any exact
+    or suffix literal ending with it.
+    """
+    literal = "." + name if kind == "suffix" else name
+    for other, pattern in substrings:
+        if other in literal and (other != literal or kind != "substring"):
+            return pattern
+    if kind in ("host", "prefix"):
+        for other, pattern in prefixes:
+            if literal.startswith(other) and (other != literal or kind == "host"):
+                return pattern
+    if kind in ("host", "suffix", "tail"):
+        for other, pattern in tails:
+            if literal.endswith(other) and (other != literal or kind == "host"):
+                return pattern
+    return None
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def minimize_rules(rules: Iterable, sibling_threshold: int = SIBLING_THRESHOLD) -> Dict:
+    """
+    Compute the minimal rule set matching the same hosts as the enabled rules.
+
+    Rules under a broader wildcard suffix are found with a suffix trie,
+    other pure-literal rules by literal containment, CIDRs nested in
+    another CIDR with a range lookup, and host rules are also checked
+    against a matcher compiled from the other enabled rules.
+    Duplicates keep their first occurrence. Disabled rules are left alone.
+
+    Returns:
+        Dict: "removable" (rules with the pattern that covers them), counts
+        before and after, and "suggestions": parents with at least
+        sibling_threshold host rules that one suffix rule could replace.
+        Suggestions widen the rule set, so they are never applied.
+    """
+    enabled = [rule for rule in rules if rule["enabled"]]
+
+    trie = SuffixTrie()
+    prefixes, tails, substrings = [], [], []
+    networks = []
+    shapes = []
+    for rule in enabled:
+        kind, name = _shape(rule)
+        shapes.append((kind, name))
+        if kind == "cidr":
+            networks.append((name, rule["pattern"]))
+        elif kind == "suffix":
+            trie.add(name, rule["pattern"])
+        elif kind == "tail":
+            tails.append((name, rule["pattern"]))
+        elif kind == "prefix":
+            prefixes.append((name, rule["pattern"]))
+        elif kind == "substring":
+            substrings.append((name, rule["pattern"]))
+    # Exact-match regexes are hosts; they only cover their own duplicates
+    matcher = RuleMatcher.from_rules(rule for rule, (kind, _) in zip(enabled, shapes)
+                                     if rule["type"] != "host" and kind != "host")
+    # Outermost networks only; a CIDR rule inside another one is redundant
+    outer_networks = CIDRTable(build_ranges(networks))
+
+    removable = []
+    kept_hosts = []
+    first = {}
+    for rule, (kind, name) in zip(enabled, shapes):
+        # Rules with the same shape are duplicates; the first one is kept
+        key = (kind, name) if kind is not None else (None, rule["pattern"])
+        covered_by = first.get(key)
+        if covered_by is None:
+            first[key] = rule["pattern"]
+        if covered_by is None and kind == "cidr":
+            network = ipaddress.ip_network(name)
+            outer = outer_networks.match_address(network.network_address)
+            if outer is not None and canonical_network(outer) != name:
+                covered_by = outer
+        if covered_by is None and kind in ("host", "suffix", "tail"):
+            covered_by = trie.covering(name)
+        if covered_by is None and kind not in (None, "cidr"):
+            covered_by = _covering_literal(kind, name, prefixes, tails, substrings)
+        if covered_by is None and kind == "host":
+            covered_by = matcher.match(name)
+
+        if covered_by is not None:
+            removable.append({
+                "id": rule.id,
+                "pattern": rule["pattern"],
+                "type": rule["type"],
+                "covered_by": covered_by,
+            })
+        elif kind == "host" and not _is_ip(name):
+            kept_hosts.append(name)
+
+    siblings = defaultdict(list)
+    for host in kept_hosts:
+        parent = host.partition(".")[2]
+        if "." in parent:
+            siblings[parent].append(host)
+    suggestions = [
+        {"suffix": parent, "pattern": suffix_regex(parent), "hosts": hosts}
+        for parent, hosts in siblings.items()
+        if len(hosts) >= sibling_threshold
+    ]
+    suggestions.sort(key=lambda suggestion: len(suggestion["hosts"]), reverse=True)
+
+    return {
+        "enabled": len(enabled),
+        "removable": removable,
+        "minimal": len(enabled) - len(removable),
+        "suggestions": suggestions,
+    }
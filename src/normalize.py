@@ -0,0 +1,276 @@
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from cidr import canonical_network
+from regex_safety import sre_constants, sre_parse
+
+
+_ANY_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_BACKSLASH = ord("\\")
+
+# Textual forms of an unbounded "any character" repeat, longest first so the
+# lazy variants are stripped whole.
+_LEADING_WILDCARDS = ("^.*?", "^.*", ".*?", ".*")
+_TRAILING_WILDCARDS = (".*?$", ".*$", ".*?", ".*")
+
+# ^literal$ where the literal only has hostname characters and escaped punctuation
+_ESCAPED_LITERAL = re.compile(r"\^((?:[A-Za-z0-9_-]|\\[^A-Za-z0-9])*)\$")
+_UNESCAPE = re.compile(r"\\(.)")
+
+_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://")
+
+# Distinct hostnames whose canonical form is remembered
+HOST_CACHE_SIZE = 65536
+
+
+def _freeze(value):
+    """Turn a parsed pattern into nested tuples so two parses can be compared."""
+    if isinstance(value, sre_parse.SubPattern):
+        return tuple(_freeze(item) for item in value.data)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _is_any_repeat(item) -> bool:
+    op, av = item
+    return (op in _ANY_REPEATS and av[0] == 0 and av[1] == sre_constants.MAXREPEAT
+            and _freeze(av[2]) == ((sre_constants.ANY, None),))
+
+
+def _is_at(item, where) -> bool:
+    return item == (sre_constants.AT, where)
+
+
+def _parse(pattern: str):
+    try:
+        return list(sre_parse.parse(pattern).data)
+    except (re.error, RecursionError):
+        return None
+
+
+def _consumes(items) -> bool:
+    """Return True if the parsed items contain anything besides anchors."""
+    return any(op != sre_constants.AT for op, _ in items)
+
+
+def _is_escaped(pattern: str, index: int) -> bool:
+    """Return True if the character at index is preceded by an odd number of backslashes."""
+    count = 0
+    while index > 0 and pattern[index - 1] == "\\":
+        count += 1
+        index -= 1
+    return count % 2 == 1
+
+
+def _strip_leading(pattern: str) -> Optional[str]:
+    """Drop a leading .* (or ^.*) that is a no-op under re.search semantics."""
+    for prefix in _LEADING_WILDCARDS:
+        if not pattern.startswith(prefix) or len(pattern) == len(prefix):
+            continue
+        candidate = pattern[len(prefix):]
+        old, new = _parse(pattern), _parse(candidate)
+        if old is None or new is None or not _consumes(new):
+            return None
+        if _is_at(old[0], sre_constants.AT_BEGINNING):
+            old = old[1:]
+        if old and _is_any_repeat(old[0]) and _freeze(old[1:]) == _freeze(new):
+            return candidate
+        return None
+    return None
+
+
+def _strip_trailing(pattern: str) -> Optional[str]:
+    """Drop a trailing .* (or .*$) that is a no-op under re.search semantics."""
+    for suffix in _TRAILING_WILDCARDS:
+        if not pattern.endswith(suffix) or len(pattern) == len(suffix):
+            continue
+        if _is_escaped(pattern, len(pattern) - len(suffix)):
+            return None
+        candidate = pattern[:-len(suffix)]
+        old, new = _parse(pattern), _parse(candidate)
+        if old is None or new is None or not _consumes(new):
+            return None
+        if _is_at(old[-1], sre_constants.AT_END):
+            old = old[:-1]
+        if old and _is_any_repeat(old[-1]) and _freeze(old[:-1]) == _freeze(new):
+            return candidate
+        return None
+    return None
+
+
+def _collapse_double_escapes(pattern: str) -> Optional[str]:
+    """
+    Rewrite double-escaped patterns such as ``.*\\\\.mozilla\\\\.org``.
+
+    A literal backslash can never occur in a hostname, so a rule containing
+    one never matches; collapsing ``\\\\`` to ``\\`` restores the intent.
+    """
+    parsed = _parse(pattern)
+    if parsed is None or not _contains(_freeze(parsed), (sre_constants.LITERAL, _BACKSLASH)):
+        return None
+    candidate = pattern.replace("\\\\", "\\")
+    if _parse(candidate) is None:
+        return None
+    return candidate
+
+
+def _contains(frozen, needle) -> bool:
+    if frozen == needle:
+        return True
+    return isinstance(frozen, tuple) and any(_contains(item, needle) for item in frozen)
+
+
+def regex_to_host(pattern: str) -> Optional[str]:
+    """
+    Inverse of RuleManager.convert_host_to_rule.
+
+    Returns the hostname for an exact-match pattern of the form ``^literal$``
+    and None for anything that is not a pure anchored literal.
+    """
+    # Fast paths: no anchors at all, or a plainly escaped anchored literal
+    if "^" not in pattern or "$" not in pattern:
+        return None
+    simple = _ESCAPED_LITERAL.fullmatch(pattern)
+    if simple is not None:
+        return _UNESCAPE.sub(r"\1", simple.group(1)) or None
+
+    parsed = _parse(pattern)
+    if not parsed or len(parsed) < 3:
+        return None
+    if not (_is_at(parsed[0], sre_constants.AT_BEGINNING) and _is_at(parsed[-1], sre_constants.AT_END)):
+        return None
+    body = parsed[1:-1]
+    if not all(op == sre_constants.LITERAL for op, _ in body):
+        return None
+    return "".join(chr(av) for _, av in body)
+
+
+def normalize_rule(pattern: str, rule_type: str) -> Tuple[str, str, List[str]]:
+    """
+    Canonicalise a rule into its cheapest equivalent form.
+
+    Regex rules are evaluated with re.search, so leading and trailing ``.*``
+    are redundant and only add backtracking; exact-match ``^literal$`` rules
+    become host entries. Existing anchors are kept, and no anchor is ever
+    added because that would change what the rule matches. CIDR rules are
+    written in canonical notation, with the host bits cleared.
+
+    Returns (pattern, rule_type, changes) where changes describes each rewrite.
+    """
+    pattern = pattern.strip()
+    changes: List[str] = []
+    if rule_type == "cidr":
+        network = canonical_network(pattern)
+        if network is not None and network != pattern:
+            changes.append(f"canonicalised network: {pattern} -> {network}")
+            pattern = network
+        return pattern, rule_type, changes
+    if rule_type == "host":
+        host = normalize_host(pattern)
+        if host != pattern:
+            changes.append(f"canonicalised host: {pattern} -> {host}")
+        return host, rule_type, changes
+    if rule_type != "regex":
+        return pattern, rule_type, changes
+
+    # Hosts are stored and looked up lowercase, so uppercase literals could never match
+    lowered = _lowercase_literals(pattern)
+    if lowered != pattern and _parse(lowered) is not None:
+        changes.append(f"lowercased pattern: {pattern} -> {lowered}")
+        pattern = lowered
+
+    collapsed = _collapse_double_escapes(pattern)
+    if collapsed is not None:
+        changes.append(f"collapsed double-escaped backslashes: {pattern} -> {collapsed}")
+        pattern = collapsed
+
+    stripped = _strip_leading(pattern)
+    if stripped is not None:
+        changes.append(f"dropped redundant leading wildcard: {pattern} -> {stripped}")
+        pattern = stripped
+
+    stripped = _strip_trailing(pattern)
+    if stripped is not None:
+        changes.append(f"dropped redundant trailing wildcard: {pattern} -> {stripped}")
+        pattern = stripped
+
+    host = regex_to_host(pattern)
+    if host is not None:
+        host = normalize_host(host)
+        changes.append(f"converted exact-match regex to host entry: {pattern} -> {host}")
+        return host, "host", changes
+
+    return pattern, rule_type, changes
+
+
+def _idna_labels(host: str) -> str:
+    """Punycode-encode the Unicode labels of host; labels IDNA rejects are kept as they are."""
+    labels = []
+    for label in host.split("."):
+        if not label.isascii():
+            try:
+                label = label.encode("idna").decode("ascii")
+            except UnicodeError:
+                pass
+        labels.append(label)
+    return ".".join(labels)
+
+
+@lru_cache(maxsize=HOST_CACHE_SIZE)
+def normalize_host(host: str) -> str:
+    """
+    Return the canonical form of a hostname, as rules and lookups store it.
+
+    A scheme, user info, path and port are dropped (so a pasted URL works),
+    then the trailing root dot, and the name is lowercased with Unicode
+    labels punycode-encoded: Mail.Google.com. and mail.google.com are the
+    same host. Memoised, since the same hosts are looked up over and over.
+    """
+    host = _SCHEME.sub("", host.strip())
+    host = host.split("/", 1)[0].rsplit("@", 1)[-1]
+    if host.startswith("["):
+        # [v6addr]:port
+        host = host[1:].split("]", 1)[0]
+    elif host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    host = host.rstrip(".").lower()
+    return host if host.isascii() else _idna_labels(host)
+
+
+def _lowercase_literals(pattern: str) -> str:
+    """
+    Lowercase the letters of a regex outside escape sequences and character classes.
+
+    \\D, \\W, \\S, ... keep their meaning, and a class is copied as written,
+    since lowercasing [^A-Z] into [^a-z] would change what it matches.
+    """
+    out = []
+    index = 0
+    in_class = False
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            out.append(pattern[index:index + 2])
+            index += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+            out.append(char)
+            index += 1
+            continue
+        if char == "[":
+            # A "]" right after "[" or "[^" is a literal member, not the end
+            start = index + 1
+            if pattern.startswith("^", start):
+                start += 1
+            if pattern.startswith("]", start):
+                start += 1
+            out.append(pattern[index:start])
+            index = start
+            in_class = True
+            continue
+        out.append(char.lower())
+        index += 1
+    return "".join(out)
@@ -0,0 +1,391 @@
+import math
+import re
+import time
+from typing import Dict, List, Optional, Set
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse
+    import sre_constants
+
+
+# Hostnames are at most 253 characters, so that is the longest input a rule
+# ever has to survive.
+MAX_HOSTNAME_LENGTH = 253
+
+# A single search slower than this on a hostname-sized input is reported as
+# slow. It depends on machine load, so it is advice and never the verdict.
+SAMPLE_BUDGET = 0.05
+
+# Upper bound on the total time spent fuzzing a single pattern.
+FUZZ_BUDGET = 0.5
+
+# Growth of search time with input length, as a polynomial degree, above
+# which a pattern is treated as exponential. Measured on one machine as the
+# ratio between two input lengths, so load cancels out.
+MAX_GROWTH_DEGREE = 6
+
+# Searches faster than this are too close to timer noise to estimate growth.
+GROWTH_FLOOR = 0.001
+
+# Each sample is timed this many times and the fastest run kept.
+TIMING_RUNS = 3
+
+HOSTNAME_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789.-"
+
+# Realistic hostnames used to measure the typical cost of a pattern.
+PROBE_HOSTS = [
+    "example.com",
+    "api.staging.example.co.uk",
+    "cdn-01.assets.static.example-cloud.net",
+    "10.0.0.1",
+    "a" * 63 + ".b" * 20 + ".example.com",
+]
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+_UNBOUNDED = sre_constants.MAXREPEAT
+_NOT_A_REPEAT = object()
+
+
+def _char_set(op, av) -> Optional[Set[str]]:
+    """Return the set of characters a single-character node can match, or None for 'anything'."""
+    if op == sre_constants.LITERAL:
+        return {chr(av)}
+    if op == sre_constants.IN:
+        chars = set()
+        for item_op, item_av in av:
+            if item_op == sre_constants.NEGATE:
+                return None
+            if item_op == sre_constants.LITERAL:
+                chars.add(chr(item_av))
+            elif item_op == sre_constants.RANGE:
+                low, high = item_av
+                if high - low > 255:
+                    return None
+                chars.update(chr(c) for c in range(low, high + 1))
+            elif item_op == sre_constants.CATEGORY and item_av == sre_constants.CATEGORY_DIGIT:
+                chars.update("0123456789")
+            else:
+                return None
+        return chars
+    return None
+
+
+def _first_chars(subpattern) -> Optional[Set[str]]:
+    """Approximate the set of characters a subpattern can start with (None means any)."""
+    chars: Set[str] = set()
+    for op, av in subpattern:
+        if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            continue
+        if op == sre_constants.SUBPATTERN:
+            first = _first_chars(av[-1])
+            optional = _min_length(av[-1]) == 0
+        elif op == sre_constants.BRANCH:
+            first = set()
+            optional = False
+            for branch in av[1]:
+                branch_first = _first_chars(branch)
+                if branch_first is None:
+                    return None
+                first |= branch_first
+                optional = optional or _min_length(branch) == 0
+        elif op in _REPEATS:
+            first = _first_chars(av[2])
+            optional = av[0] == 0
+        else:
+            first = _char_set(op, av)
+            optional = False
+        if first is None:
+            return None
+        chars |= first
+        if not optional:
+            return chars
+    return chars
+
+
+def _min_length(subpattern) -> int:
+    """Return the minimum number of characters a subpattern consumes."""
+    low, _ = subpattern.getwidth()
+    return low
+
+
+def _is_variable(subpattern) -> bool:
+    low, high = subpattern.getwidth()
+    return low != high
+
+
+def _overlaps(first: Optional[Set[str]], second: Optional[Set[str]]) -> bool:
+    if first is None or second is None:
+        return True
+    return bool(first & second)
+
+
+def _follow_chars(rest, enclosing: Optional[Set[str]]) -> Optional[Set[str]]:
+    """Approximate the characters that can come right after a node followed by rest, inside a repeat."""
+    first = _first_chars(rest)
+    if first is not None and _min_length(rest) == 0:
+        first = None if enclosing is None else first | enclosing
+    return first
+
+
+def _walk(subpattern, issues: List[str], state: Dict, enclosing: Optional[Set[str]] = None,
+          inside_repeat: bool = False, repeat_count: Optional[int] = None):
+    """
+    Walk a parsed pattern collecting backtracking hazards and structural cost.
+
+    repeat_count is the upper bound of the enclosing repeat when it is a
+    bounded one such as {12}, and None when it is unbounded.
+    """
+    previous_repeat = _NOT_A_REPEAT
+    for index, (op, av) in enumerate(subpattern):
+        state["nodes"] += 1
+        if op in _REPEATS:
+            low, high, body = av
+            unbounded = high == _UNBOUNDED
+            body_first = _first_chars(body)
+            if unbounded:
+                state["unbounded"] += 1
+            # An unbounded repeat nested in another one is only dangerous when
+            # the inner repeat can also consume the start of the next outer
+            # iteration, e.g. (a+)+ but not (\.[a-z]+)+.
+            if unbounded and inside_repeat and repeat_count is None and _overlaps(body_first, enclosing):
+                issues.append("nested quantifier: an unbounded repeat inside another repeat can match the same characters")
+                state["risk"] = max(state["risk"], 2)
+            # Inside a bounded repeat such as (.*a){12}, each iteration can
+            # split the input differently when the inner repeat can also
+            # match what follows it: polynomial, of degree the repeat count
+            if (unbounded and repeat_count is not None
+                    and _overlaps(body_first, _follow_chars(subpattern[index + 1:], enclosing))):
+                issues.append(f"unbounded repeat inside a group repeated {repeat_count} times: "
+                              f"backtracking grows polynomially with the repeat count")
+                state["risk"] = max(state["risk"], 2 if repeat_count > 2 else 1)
+            if unbounded and previous_repeat is not _NOT_A_REPEAT and _overlaps(previous_repeat, body_first):
+                issues.append("adjacent quantifiers can match the same characters")
+                state["risk"] = max(state["risk"], 1)
+            if unbounded:
+                _walk(body, issues, state, body_first, True)
+            elif high > 1 and not (inside_repeat and repeat_count is None):
+                _walk(body, issues, state, body_first, True, high)
+            else:
+                _walk(body, issues, state, enclosing, inside_repeat, repeat_count)
+            previous_repeat = body_first if unbounded else _NOT_A_REPEAT
+            continue
+        previous_repeat = _NOT_A_REPEAT
+        if op == sre_constants.BRANCH:
+            branches = av[1]
+            if inside_repeat:
+                # The parser factors a shared prefix out of the branches, so
+                # (a|a) arrives as a(?:|); an empty branch starts with whatever
+                # follows it, which inside a repeat is the next iteration.
+                firsts = []
+                for branch in branches:
+                    first = _first_chars(branch)
+                    if first is not None and _min_length(branch) == 0:
+                        first = None if enclosing is None else first | enclosing
+                    firsts.append(first)
+                for i in range(len(firsts)):
+                    others = range(i + 1, len(firsts))
+                    if any(branches[i].data == branches[j].data or
+                           _min_length(branches[i]) == _min_length(branches[j]) == 0 for j in others):
+                        issues.append("overlapping alternation inside a repeat: branches can match the same text")
+                        state["risk"] = max(state["risk"], 2)
+                        break
+                    if any(_overlaps(firsts[i], firsts[j]) for j in others):
+                        issues.append("ambiguous alternation inside a repeat: branches can start with the same character")
+                        state["risk"] = max(state["risk"], 1)
+                        break
+            for branch in branches:
+                _walk(branch, issues, state, enclosing, inside_repeat, repeat_count)
+        elif op == sre_constants.SUBPATTERN:
+            _walk(av[-1], issues, state, enclosing, inside_repeat, repeat_count)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], issues, state, enclosing, inside_repeat, repeat_count)
+        elif op == sre_constants.GROUPREF:
+            issues.append("backreference forces backtracking")
+            state["risk"] = max(state["risk"], 1)
+
+
+def static_analysis(pattern: str) -> Dict:
+    """
+    Inspect a regex without running it.
+
+    Returns a dict with the detected issues, a risk level ("low", "medium" or
+    "high") and a structural cost estimate that grows with the number of
+    unbounded and nested repeats.
+    """
+    parsed = sre_parse.parse(pattern)
+    issues: List[str] = []
+    state = {"nodes": 0, "unbounded": 0, "risk": 0}
+    _walk(parsed, issues, state)
+
+    # An unanchored pattern starting with an unbounded repeat is retried at
+    # every offset by re.search, which makes it quadratic in the host length.
+    anchored = bool(parsed.data) and parsed.data[0] == (sre_constants.AT, sre_constants.AT_BEGINNING)
+    leading_repeat = bool(parsed.data) and parsed.data[0][0] in _REPEATS and parsed.data[0][1][1] == _UNBOUNDED
+
+    cost = 1.0 + state["nodes"] * 0.1 + state["unbounded"]
+    if leading_repeat and not anchored:
+        cost *= 2
+    cost *= (1, 4, 16)[state["risk"]]
+
+    return {
+        "issues": list(dict.fromkeys(issues)),
+        "risk": ("low", "medium", "high")[state["risk"]],
+        "static_cost": round(cost, 2),
+    }
+
+
+def estimate_static_cost(pattern: str) -> float:
+    """Cheap cost estimate used to order rules when no measurement is available."""
+    try:
+        return static_analysis(pattern)["static_cost"]
+    except (re.error, RecursionError):
+        return float("inf")
+
+
+def _pump_chars(pattern: str) -> List[str]:
+    """Pick characters likely to drive the pattern's repeats."""
+    candidates = []
+    for char in re.sub(r"\\.", "", pattern) + "a0.-":
+        if char in HOSTNAME_ALPHABET and char not in candidates:
+            candidates.append(char)
+    return candidates[:6]
+
+
+def _fuzz_inputs(pattern: str):
+    """Yield adversarial hostnames of growing length for each pump string."""
+    pumps = _pump_chars(pattern)
+    pumps += [a + b for a, b in zip(pumps, pumps[1:])]
+    lengths = list(range(4, 33)) + list(range(48, MAX_HOSTNAME_LENGTH + 1, 16))
+    for pump in pumps:
+        yield [(pump * (length // len(pump) + 1))[:length] + "!" for length in lengths]
+
+
+def _time_search(compiled, text: str, sample_budget: float) -> float:
+    """Return the fastest of TIMING_RUNS searches, stopping early on a slow one."""
+    fastest = float("inf")
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        compiled.search(text)
+        fastest = min(fastest, time.perf_counter() - start)
+        if fastest > sample_budget:
+            break
+    return fastest
+
+
+def _growth_degree(times: Dict[int, float], length: int) -> float:
+    """
+    Estimate how fast search time grows with input length, as a polynomial degree.
+
+    Compares the time at length with the time at the longest input of at
+    most half that length: a quadratic pattern gives about 2, an
+    exponential one grows with the length itself.
+    """
+    elapsed = times[length]
+    half = max((shorter for shorter in times if shorter <= length // 2), default=None)
+    if elapsed < GROWTH_FLOOR or half is None:
+        return 0.0
+    return math.log(elapsed / max(times[half], 1e-9)) / math.log(length / half)
+
+
+def fuzz_regex(compiled, budget: float = FUZZ_BUDGET, sample_budget: float = SAMPLE_BUDGET) -> Dict:
+    """
+    Fuzz a compiled pattern against adversarial hostnames of growing length.
+
+    ``catastrophic`` comes from how search time grows with input length
+    (``growth``, a polynomial degree), not from absolute timings, so the
+    verdict does not depend on machine load. Inputs grow slowly and a
+    series stops at its first sample slower than ``sample_budget``, so an
+    exponential pattern is caught on a short input instead of hanging on
+    a long one; ``worst_time`` is reported for information only.
+    """
+    started = time.perf_counter()
+    worst = 0.0
+    worst_input = ""
+    growth = 0.0
+    completed = True
+    for series in _fuzz_inputs(compiled.pattern):
+        times: Dict[int, float] = {}
+        for text in series:
+            elapsed = times[len(text)] = _time_search(compiled, text, sample_budget)
+            growth = max(growth, _growth_degree(times, len(text)))
+            if elapsed > worst:
+                worst, worst_input = elapsed, text
+            if elapsed > sample_budget:
+                break
+            if time.perf_counter() - started > budget:
+                completed = False
+                break
+        if growth > MAX_GROWTH_DEGREE or not completed:
+            break
+    return {"catastrophic": growth > MAX_GROWTH_DEGREE, "growth": round(growth, 1), "worst_time": worst,
+            "worst_input": worst_input, "completed": completed}
+
+
+def measure_cost(compiled, repeat: int = 20) -> float:
+    """Return the mean time of one search over PROBE_HOSTS, in microseconds."""
+    search = compiled.search
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for host in PROBE_HOSTS:
+            search(host)
+    elapsed = time.perf_counter() - start
+    return round(elapsed / (repeat * len(PROBE_HOSTS)) * 1e6, 3)
+
+
+def analyze_regex(pattern: str, fuzz: bool = True) -> Dict:
+    """
+    Full safety report for a regex rule.
+
+    Combines static ReDoS analysis (nested/overlapping quantifiers, ambiguous
+    alternation), time-boxed fuzzing of the patterns it flags and a
+    measured per-search cost. ``valid`` is False for patterns that do not
+    compile, or that have a static hazard and whose search time grows
+    faster than MAX_GROWTH_DEGREE with hostname length under fuzzing.
+    """
+    report = {
+        "pattern": pattern,
+        "valid": True,
+        "error": "",
+        "issues": [],
+        "risk": "low",
+        "static_cost": 0.0,
+        "cost": 0.0,
+    }
+
+    try:
+        compiled = re.compile(pattern)
+        report.update(static_analysis(pattern))
+    except (re.error, RecursionError) as e:
+        report.update(valid=False, error=str(e), risk="high", cost=float("inf"))
+        return report
+
+    # Rejection needs a static hazard, so patterns without one (literals,
+    # escaped-dot suffixes and most other rules) skip the fuzzing cost
+    if fuzz and report["risk"] != "low":
+        result = fuzz_regex(compiled)
+        # Rejection needs both a static hazard and exponential growth, neither
+        # of which depends on how busy the machine is
+        if result["catastrophic"]:
+            report.update(
+                valid=False,
+                risk="high",
+                cost=float("inf"),
+                error=(f"catastrophic backtracking: {report['issues'][0]}; search time grows like length^{result['growth']:g} "
+                       f"or faster (a {len(result['worst_input'])}-character hostname "
+                       f"took {result['worst_time'] * 1000:.1f} ms)"),
+            )
+            return report
+        if result["worst_time"] > SAMPLE_BUDGET:
+            report["issues"].append(f"a {len(result['worst_input'])}-character hostname took "
+                                    f"{result['worst_time'] * 1000:.1f} ms")
+        if not result["completed"]:
+            report["issues"].append("fuzzing did not finish within its time budget")
+            report["risk"] = "high"
+
+    report["cost"] = measure_cost(compiled)
+    return report
@@ -0,0 +1,575 @@
+import hashlib
+import mmap
+import os
+import re
+import sys
+import uuid
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cidr import canonical_network
+
+
+HOSTS_MARKER = b"[BLOCK_HOSTS]"
+RULES_MARKER = b"[BLOCK_RULES]"
+CIDRS_MARKER = b"[BLOCK_CIDRS]"
+
+SECTION_TYPES = {
+    HOSTS_MARKER: "host",
+    RULES_MARKER: "regex",
+    CIDRS_MARKER: "cidr",
+}
+
+# Rule types in file order, and the section marker line of each
+RULE_TYPES = tuple(SECTION_TYPES.values())
+SECTION_MARKERS = {marker.decode("ascii"): rule_type for marker, rule_type in SECTION_TYPES.items()}
+MARKER_FOR_TYPE = {rule_type: marker for marker, rule_type in SECTION_MARKERS.items()}
+
+# Rule file format written by this version. v3 encodes the section and
+# enabled flag of every rule explicitly:
+#
+#   + pattern [id=<id>] [tags=<a,b>]   enabled rule
+#   - pattern [id=<id>] [tags=<a,b>]   disabled rule
+#   pattern                            enabled rule (hand-written)
+#   # anything                         comment
+#
+# The rule type is always the section the line is in, and patterns never
+# contain whitespace, so the first space ends the pattern.
+FORMAT_VERSION = 3
+LEGACY_FORMAT_VERSION = 2
+
+ENABLED_FLAG = "+"
+DISABLED_FLAG = "-"
+
+_VERSION_HEADER = b"# Version:"
+TIMESTAMP_HEADER = b"# Last Updated: "
+# Width of format_timestamp(); a fixed width lets edits rewrite the header in place
+TIMESTAMP_WIDTH = 26
+_HEADER_SCAN_LIMIT = 4096
+_DISABLED_PREFIX = b"#DISABLED"
+_WHITESPACE = b" \t\r\n\x0b\x0c"
+# Characters that made the v2 reader treat a disabled rule as a regex
+_REGEX_HINTS = (b".", b"*", b"^", b"$", b"\\")
+_HOSTNAME_CHARS = re.compile(r"^[A-Za-z0-9._*-]+$")
+
+
+def format_timestamp(moment: Optional[datetime] = None) -> str:
+    """Return a "Last Updated" value that is always TIMESTAMP_WIDTH characters wide."""
+    return (moment or datetime.now()).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def timestamp_span(buffer) -> Optional[Tuple[int, int]]:
+    """Return the byte range of the "Last Updated" value in the file header, if any."""
+    index = buffer.find(TIMESTAMP_HEADER, 0, _HEADER_SCAN_LIMIT)
+    if index == -1:
+        return None
+    start = index + len(TIMESTAMP_HEADER)
+    end = buffer.find(b"\n", start)
+    if end == -1:
+        end = len(buffer)
+    if end > start and buffer[end - 1] == 0x0D:  # "\r"
+        end -= 1
+    return start, end
+
+
+def new_rule_id() -> str:
+    """Return a fresh stable rule id (8 hex characters)."""
+    return uuid.uuid4().hex[:8]
+
+
+def escape_whitespace(pattern: str) -> str:
+    """Replace literal whitespace in a pattern with regex escapes, as v3 lines cannot contain it."""
+    return pattern.replace(" ", "\\x20").replace("\t", "\\t")
+
+
+def format_rule_line(pattern: str, enabled: bool = True, rule_id: Optional[str] = None,
+                     tags: Optional[List[str]] = None) -> str:
+    """Render a rule as a v3 line."""
+    parts = [ENABLED_FLAG if enabled else DISABLED_FLAG, escape_whitespace(pattern)]
+    if rule_id:
+        parts.append(f"id={rule_id}")
+    if tags:
+        parts.append("tags=" + ",".join(tags))
+    return " ".join(parts)
+
+
+def parse_metadata(text: str) -> Dict[str, str]:
+    """Parse the key=value fields that follow the pattern on a v3 line."""
+    metadata = {}
+    for field in text.split():
+        key, separator, value = field.partition("=")
+        if separator:
+            metadata[key] = value
+    return metadata
+
+
+def parse_rule_line(line: str) -> Optional[Tuple[bool, str, Dict[str, str]]]:
+    """
+    Parse one v3 line.
+
+    Returns (enabled, pattern, metadata), or None for blank lines, comments
+    and section markers.
+    """
+    line = line.strip()
+    if not line or line.startswith("#") or line in SECTION_MARKERS:
+        return None
+    enabled = True
+    if line[:2] in (ENABLED_FLAG + " ", DISABLED_FLAG + " "):
+        enabled = line[0] == ENABLED_FLAG
+        line = line[2:].lstrip()
+    pattern, _, rest = line.partition(" ")
+    if "\t" in pattern:
+        pattern, _, tail = pattern.partition("\t")
+        rest = f"{tail} {rest}"
+    return enabled, pattern, parse_metadata(rest)
+
+
+def detect_format_version(buffer) -> int:
+    """Read the format version from the "# Version:" header; files without one are v2."""
+    index = buffer.find(_VERSION_HEADER, 0, _HEADER_SCAN_LIMIT)
+    if index == -1:
+        return LEGACY_FORMAT_VERSION
+    end = buffer.find(b"\n", index)
+    if end == -1:
+        end = len(buffer)
+    value = bytes(buffer[index + len(_VERSION_HEADER):end]).strip()
+    try:
+        return int(float(value.decode("ascii")))
+    except (UnicodeDecodeError, ValueError):
+        return LEGACY_FORMAT_VERSION
+
+
+def _is_plausible_rule(pattern: str, rule_type: str) -> bool:
+    if rule_type == "host":
+        return bool(_HOSTNAME_CHARS.match(pattern))
+    if rule_type == "cidr":
+        return canonical_network(pattern) is not None
+    try:
+        re.compile(pattern)
+        return True
+    except re.error:
+        return False
+
+
+def migrate_v2_lines(lines: Iterable[str], timestamp: str) -> Iterator[str]:
+    """
+    One-pass v2 -> v3 migration of rule file lines (without line endings).
+
+    Every rule gets an explicit flag and stays in the section it was found
+    in, so disabled hosts are no longer re-typed as regexes. "#DISABLED x"
+    becomes "- x"; "#x" inside a section becomes "- x" only when x is a
+    plausible rule for that section, and is otherwise kept as a comment.
+    Disabled rules found before the first section are moved into the
+    section the v2 reader would have shown them in.
+    """
+    current_section = None
+    pending = {rule_type: [] for rule_type in RULE_TYPES}
+    for raw in lines:
+        line = raw.strip()
+        if line in SECTION_MARKERS:
+            current_section = SECTION_MARKERS[line]
+            yield raw
+            yield from pending[current_section]
+            pending[current_section] = []
+            continue
+        if line.startswith("# Version:"):
+            yield f"# Version: {FORMAT_VERSION}.0"
+            continue
+        if line.startswith("# Last Updated:"):
+            yield f"# Last Updated: {timestamp}"
+            continue
+        if not line or line.startswith("# ") or line == "#":
+            yield raw
+            continue
+        if not line.startswith("#"):
+            yield format_rule_line(line, True, new_rule_id()) if current_section else raw
+            continue
+
+        if line.startswith("#DISABLED"):
+            pattern = line[10:].strip()
+        else:
+            pattern = line[1:].strip()
+        rule_type = current_section
+        if rule_type is None:
+            rule_type = "regex" if any(hint.decode() in pattern for hint in _REGEX_HINTS) else "host"
+        if not pattern or (not line.startswith("#DISABLED") and not _is_plausible_rule(pattern, rule_type)):
+            yield raw
+            continue
+        rule_line = format_rule_line(pattern, False, new_rule_id())
+        if current_section is None:
+            pending[rule_type].append(rule_line)
+        else:
+            yield rule_line
+
+    # Sections that never appeared still need their pending rules
+    for rule_type, marker in MARKER_FOR_TYPE.items():
+        if pending[rule_type]:
+            yield ""
+            yield marker
+            yield from pending[rule_type]
+
+
+def assign_rule_ids(lines: Iterable[str], timestamp: str) -> Iterator[str]:
+    """
+    Rewrite v3 lines so every rule has an explicit flag and a unique id.
+
+    Existing ids are kept; rules without one, or whose id repeats an earlier
+    rule's, get a fresh id. The "Last Updated" header is rewritten with the
+    fixed-width timestamp so later edits can update it in place.
+    """
+    seen = set()
+    current_section = None
+    for raw in lines:
+        line = raw.strip()
+        if line in SECTION_MARKERS:
+            current_section = SECTION_MARKERS[line]
+            yield raw
+            continue
+        if line.startswith("# Last Updated:"):
+            yield f"# Last Updated: {timestamp}"
+            continue
+        parsed = parse_rule_line(line) if current_section else None
+        if parsed is None:
+            yield raw
+            continue
+        enabled, pattern, metadata = parsed
+        rule_id = metadata.get("id")
+        if not rule_id or rule_id in seen:
+            rule_id = new_rule_id()
+            while rule_id in seen:
+                rule_id = new_rule_id()
+        seen.add(rule_id)
+        tags = metadata["tags"].split(",") if metadata.get("tags") else None
+        yield format_rule_line(pattern, enabled, rule_id, tags)
+
+
+class Rule(Mapping):
+    """
+    Compact rule record.
+
+    Uses __slots__ instead of a per-rule dict (about 56 bytes plus the
+    pattern text instead of a few hundred) while still behaving as a
+    read-only mapping, so rule["pattern"], rule.get("type") and dict(rule)
+    keep working for existing callers. The optional id and tags from the
+    v3 file format are attributes only, so they do not leak into exports.
+    """
+
+    __slots__ = ("pattern", "type", "enabled", "id", "tags")
+
+    _KEYS = ("pattern", "type", "enabled")
+
+    def __init__(self, pattern: str, rule_type: str, enabled: bool, rule_id: Optional[str] = None,
+                 tags: Tuple[str, ...] = ()):
+        self.pattern = pattern
+        self.type = rule_type
+        self.enabled = enabled
+        self.id = rule_id
+        self.tags = tags
+
+    def __getitem__(self, key: str):
+        if key in Rule._KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(Rule._KEYS)
+
+    def __len__(self) -> int:
+        return len(Rule._KEYS)
+
+    def __repr__(self) -> str:
+        return f"Rule(pattern={self.pattern!r}, type={self.type!r}, enabled={self.enabled!r})"
+
+    def to_dict(self) -> Dict:
+        """Return a plain dict copy, e.g. for JSON/YAML serialisation."""
+        return {
+            "pattern": self.pattern,
+            "type": self.type,
+            "enabled": self.enabled
+        }
+
+
+class RuleTable:
+    """
+    Columnar store for a whole rule set.
+
+    Patterns are interned strings in one list, type and enabled flags are
+    packed into a bytearray, and source line numbers live in an unsigned
+    int array: under 50 bytes per rule plus the pattern text, interning
+    included. Indexing or iterating yields short-lived Rule views.
+    """
+
+    _ENABLED = 0x01
+    _REGEX = 0x02
+    _CIDR = 0x04
+    _TYPE_FLAGS = {"host": 0, "regex": _REGEX, "cidr": _CIDR}
+
+    def __init__(self, rules: Iterable = ()):
+        self.patterns = []
+        self.flags = bytearray()
+        self.line_numbers = array("L")
+        for rule in rules:
+            self.append(rule["pattern"], rule["type"], rule["enabled"])
+
+    def append(self, pattern: str, rule_type: str, enabled: bool, line_number: int = 0):
+        self.patterns.append(sys.intern(pattern))
+        self.flags.append((self._ENABLED if enabled else 0) | self._TYPE_FLAGS[rule_type])
+        self.line_numbers.append(line_number)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def __getitem__(self, index: int) -> Rule:
+        flags = self.flags[index]
+        rule_type = "regex" if flags & self._REGEX else "cidr" if flags & self._CIDR else "host"
+        return Rule(self.patterns[index], rule_type, bool(flags & self._ENABLED))
+
+    def __iter__(self) -> Iterator[Rule]:
+        for index in range(len(self.patterns)):
+            yield self[index]
+
+    def line_number(self, index: int) -> int:
+        """Return the line of the rule file the rule was read from."""
+        return self.line_numbers[index]
+
+
+class RuleView:
+    """
+    A rule located in a memory-mapped rule file.
+
+    Only byte offsets are kept; the pattern string is decoded on first
+    access, so scanning a huge file does not copy lines nobody reads.
+    """
+
+    __slots__ = ("_buffer", "start", "end", "line_number", "type", "enabled", "_pattern",
+                 "meta_start", "meta_end", "_metadata", "flag_offset")
+
+    def __init__(self, buffer, start: int, end: int, line_number: int, rule_type: str, enabled: bool,
+                 meta_start: int = 0, meta_end: int = 0, flag_offset: int = -1):
+        self._buffer = buffer
+        self.start = start
+        self.end = end
+        self.line_number = line_number
+        self.type = rule_type
+        self.enabled = enabled
+        self._pattern = None
+        self.meta_start = meta_start
+        self.meta_end = meta_end
+        self._metadata = None
+        # Byte offset of the "+"/"-" flag, or -1 when the line has none
+        self.flag_offset = flag_offset
+
+    @property
+    def pattern(self) -> str:
+        if self._pattern is None:
+            self._pattern = self._buffer[self.start:self.end].decode("utf-8")
+        return self._pattern
+
+    @property
+    def metadata(self) -> Dict[str, str]:
+        """The key=value fields stored after the pattern (v3 only)."""
+        if self._metadata is None:
+            if self.meta_end > self.meta_start:
+                self._metadata = parse_metadata(self._buffer[self.meta_start:self.meta_end].decode("utf-8"))
+            else:
+                self._metadata = {}
+        return self._metadata
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.metadata.get("id")
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        tags = self.metadata.get("tags")
+        return tuple(tags.split(",")) if tags else ()
+
+    def to_rule(self) -> Rule:
+        """Materialise the view as a compact Rule record."""
+        if self.meta_end > self.meta_start:
+            return Rule(self.pattern, self.type, self.enabled, self.id, self.tags)
+        return Rule(self.pattern, self.type, self.enabled)
+
+
+class RuleFileReader:
+    """
+    Zero-copy parser for rule files.
+
+    The file is memory-mapped and scanned for line boundaries and section
+    markers in place; rules are yielded lazily as RuleView objects. Use it as
+    a context manager, and do not read a view's pattern after the reader has
+    been closed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self.buffer = None
+        self.format_version = FORMAT_VERSION
+
+    def __enter__(self) -> "RuleFileReader":
+        self._file = open(self.path, "rb")
+        if os.fstat(self._file.fileno()).st_size:
+            self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.format_version = detect_format_version(self.buffer)
+        else:
+            self.buffer = b""
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def iter_lines(self, position: int = 0, size: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (line_number, start, end) byte offsets of each line with surrounding whitespace trimmed.
+
+        position and size limit the scan to a byte range; line numbers then
+        count from the start of that range.
+        """
+        buffer = self.buffer
+        if size is None:
+            size = len(buffer)
+        line_number = 0
+        while position < size:
+            newline = buffer.find(b"\n", position)
+            if newline == -1:
+                newline = size
+            start, end = position, newline
+            while start < end and buffer[start] in _WHITESPACE:
+                start += 1
+            while end > start and buffer[end - 1] in _WHITESPACE:
+                end -= 1
+            line_number += 1
+            yield line_number, start, end
+            position = newline + 1
+
+    def _section_marker(self, start: int, end: int) -> Optional[bytes]:
+        for marker in SECTION_TYPES:
+            if self.buffer.find(marker, start, end) != -1:
+                return marker
+        return None
+
+    def section_ranges(self) -> Dict[str, Tuple[int, int]]:
+        """Return the byte range of each section body, keyed by rule type."""
+        markers = []
+        for marker, rule_type in SECTION_TYPES.items():
+            index = self.buffer.find(marker)
+            if index != -1:
+                markers.append((index, len(marker), rule_type))
+        markers.sort()
+        ranges = {}
+        for i, (index, length, rule_type) in enumerate(markers):
+            end = markers[i + 1][0] if i + 1 < len(markers) else len(self.buffer)
+            ranges[rule_type] = (index + length, end)
+        return ranges
+
+    def section_digest(self, start: int, end: int) -> str:
+        """Hash a byte range of the file without copying it."""
+        digest = hashlib.blake2b(digest_size=16)
+        with memoryview(self.buffer) as view, view[start:end] as part:
+            digest.update(part)
+        return digest.hexdigest()
+
+    def iter_section(self, rule_type: str) -> Iterator[RuleView]:
+        """Yield the rules of one section of a v3 file, scanning only that section's bytes."""
+        span = self.section_ranges().get(rule_type)
+        if span is None:
+            return iter(())
+        return self._iter_v3_views(None, None, span, rule_type)
+
+    def iter_views(self, section: Optional[str] = None, enabled: Optional[bool] = None) -> Iterator[RuleView]:
+        """
+        Yield rules in file order.
+
+        section ("host", "regex" or "cidr") and enabled restrict the output; lines
+        that do not pass the filters are skipped before any view is built.
+        """
+        if self.format_version < FORMAT_VERSION:
+            return self._iter_legacy_views(section, enabled)
+        return self._iter_v3_views(section, enabled)
+
+    def _iter_v3_views(self, section: Optional[str], enabled: Optional[bool],
+                       span: Tuple[int, Optional[int]] = (0, None),
+                       current_section: Optional[str] = None) -> Iterator[RuleView]:
+        """Single deterministic pass: no content heuristics, no regex probing."""
+        buffer = self.buffer
+        for line_number, start, end in self.iter_lines(*span):
+            if start == end:
+                continue
+            first = buffer[start]
+            if first == 0x23:  # "#"
+                continue
+            if first == 0x5B:  # "["
+                marker = self._section_marker(start, end)
+                if marker is not None:
+                    current_section = SECTION_TYPES[marker]
+                    continue
+            if current_section is None or section not in (None, current_section):
+                continue
+            rule_enabled = True
+            pattern_start = start
+            flag_offset = -1
+            if end - start > 1 and buffer[start + 1] in _WHITESPACE and first in (0x2B, 0x2D):  # "+", "-"
+                rule_enabled = first == 0x2B
+                flag_offset = start
+                pattern_start = start + 2
+                while pattern_start < end and buffer[pattern_start] in _WHITESPACE:
+                    pattern_start += 1
+            if enabled is not None and rule_enabled != enabled:
+                continue
+            pattern_end = end
+            for separator in (b" ", b"\t"):
+                index = buffer.find(separator, pattern_start, pattern_end)
+                if index != -1:
+                    pattern_end = index
+            yield RuleView(buffer, pattern_start, pattern_end, line_number, current_section, rule_enabled,
+                           pattern_end, end, flag_offset)
+
+    def _iter_legacy_views(self, section: Optional[str], enabled: Optional[bool]) -> Iterator[RuleView]:
+        """Parse a v2 file, including its content-based guess for disabled rules."""
+        buffer = self.buffer
+        current_section = None
+        for line_number, start, end in self.iter_lines():
+            if start == end:
+                continue
+            first = buffer[start]
+            if first == 0x5B:  # "["
+                marker = self._section_marker(start, end)
+                if marker is not None:
+                    current_section = SECTION_TYPES[marker]
+                    continue
+            if first != 0x23:  # "#"
+                if current_section and enabled is not False and section in (None, current_section):
+                    yield RuleView(buffer, start, end, line_number, current_section, True)
+                continue
+            if enabled:
+                continue
+            if buffer[start:start + len(_DISABLED_PREFIX)] == _DISABLED_PREFIX:
+                pattern_start = start + len(_DISABLED_PREFIX) + 1
+            elif end - start > 1 and buffer[start + 1] != 0x20:  # "#pattern", not "# comment"
+                pattern_start = start + 1
+            elif end - start == 1:
+                pattern_start = end
+            else:
+                continue
+            while pattern_start < end and buffer[pattern_start] in _WHITESPACE:
+                pattern_start += 1
+            pattern_start = min(pattern_start, end)
+            # v2 files do not record the section of a disabled rule reliably,
+            # so guess from its content like the original reader did.
+            rule_type = "host"
+            if any(buffer.find(hint, pattern_start, end) != -1 for hint in _REGEX_HINTS):
+                rule_type = "regex"
+            if section not in (None, rule_type):
+                continue
+            yield RuleView(buffer, pattern_start, end, line_number, rule_type, False)
@@ -1,12 +1,33 @@
 import os
 import re
 import json
+import hashlib
+import threading
 import yaml
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Iterable, Iterator, Tuple, Optional
 import shutil
 from pathlib import Path
 
+from regex_safety import analyze_regex, estimate_static_cost
+from normalize import normalize_host, normalize_rule, regex_to_host
+from convert import convert_rule_file, host_to_regex
+from journal import RuleJournal
+from watcher import RuleFileWatcher
+from scope import iter_scope_targets, plan_scope_rules
+from minimize import SIBLING_THRESHOLD, minimize_rules
+from matcher import (MIN_REGEX_COST, PROFILE_PRIOR_HITS, MatchCache, RuleMatcher, build_tables, file_digest,
+                     plan_regex_order, read_compiled, regex_cost_floor, write_compiled)
+from rulefile import (FORMAT_VERSION, MARKER_FOR_TYPE, RULE_TYPES, TIMESTAMP_WIDTH, Rule, RuleFileReader,
+                      RuleTable, assign_rule_ids, detect_format_version, escape_whitespace, format_rule_line,
+                      format_timestamp, migrate_v2_lines, new_rule_id, timestamp_span)
+from batch import classify_hosts
+from hosttable import HOST_TABLE_MIN_BYTES, HostTable, build_host_table
+from traffic import REPORTED_RULES, iter_traffic, load_hits, now_iso, record_hit, save_hits
+from audit import audit_rules
+from suggest import MIN_SUBDOMAINS, SuffixSketch, covering_rule, parent_domains
+from cidr import canonical_network, collapse_networks, export_networks
+
 
 class RuleManager:
     """
@@ -14,35 +35,136 @@ class RuleManager:
     Manages both host rules and regex rules with backup functionality.
     """
     
-    def __init__(self, rule_file: str = "tls_bypass_rule.txt", backup_dir: str = "backups"):
+    def __init__(self, rule_file: str = "tls_bypass_rule.txt", backup_dir: str = "backups",
+                 journaled: bool = False, compact_interval: float = 60.0):
         self.rule_file = rule_file
         self.backup_dir = backup_dir
         self.burp_sync_file = "burp_tls_autosync.txt"
-        self.version = "2.0"
+        # How CIDR rules are written to the Burp sync file: "regex" or "hosts"
+        self.cidr_export = "regex"
+        # Engine for non-literal regex rules: "re" or "dfa" (see matcher.REGEX_ENGINES)
+        self.regex_engine = "re"
+        sidecar_base = self._sidecar_base()
+        self.compiled_file = sidecar_base + ".compiled"
+        # Sorted on-disk table of the host rules, used once the hosts section
+        # passes HOST_TABLE_MIN_BYTES
+        self.host_table_file = sidecar_base + ".hosts"
+        # Per-rule hit counters from ingested traffic (see ingest_traffic)
+        self.hits_file = sidecar_base + ".hits.json"
+        self.version = f"{FORMAT_VERSION}.0"
+        
+        # Journaled mode appends edits to a write-ahead log instead of
+        # rewriting the rule file; a background compactor folds it back in
+        self.journaled = journaled
+        self.compact_interval = compact_interval
+        self.journal = RuleJournal(sidecar_base + ".journal")
+        self._journal_lock = threading.RLock()
+        self._compactor: Optional[threading.Timer] = None
+        
+        # Seconds between background re-rankings of the regex rules (see start_profiler)
+        self.profile_interval = 300.0
+        self._profiler: Optional[threading.Timer] = None
+        
+        # Safety reports from validate_regex, keyed by pattern
+        self.regex_reports: Dict[str, Dict] = {}
+        
+        # Rewrites applied by the normaliser since the last pop_rewrites()
+        self.rewrites: List[Dict] = []
+        
+        # Columnar copy of the rule set, keyed by the file's mtime and size
+        self._rule_table: Optional[RuleTable] = None
+        self._rule_table_key: Optional[Tuple[int, ...]] = None
+        
+        # Rule id -> (flag offset, line end offset), keyed like the rule table
+        self._rule_index: Optional[Dict[str, Tuple[int, int]]] = None
+        self._rule_index_key: Optional[Tuple[int, int]] = None
+        
+        # Matcher for the current rule text, keyed by its content hash
+        self._matcher: Optional[RuleMatcher] = None
+        self._matcher_hash: Optional[str] = None
+        
+        # content_digest(), keyed by watch_key() so lookups do not rehash the file
+        self._content_hash: Optional[str] = None
+        self._content_hash_key = None
+        
+        # Bounded LRU of match_host results for the rule set with this content hash
+        self._match_cache = MatchCache()
+        self._match_cache_hash: Optional[str] = None
         
         # Ensure backup directory exists
         os.makedirs(backup_dir, exist_ok=True)
         
-        # Initialize the rule file if it doesn't exist
-        if not os.path.exists(self.rule_file):
-            self._create_default_file()
+        self._open_store()
         
         # Create Burp sync file if it doesn't exist
         if not os.path.exists(self.burp_sync_file):
             self._update_burp_sync_file()
     
+    def _open_store(self):
+        """Create or upgrade the rule file; storage backends override this."""
+        # Initialize the rule file if it doesn't exist
+        if not os.path.exists(self.rule_file):
+            self._create_default_file()
+        else:
+            self.migrate_rule_file()
+        
+        if self.journaled:
+            self.start_compactor()
+        else:
+            # Fold edits left behind by a journaled session
+            self.compact_journal()
+    
     def _create_default_file(self):
         """Create a default rule file with headers and sections."""
         with open(self.rule_file, "w", encoding="utf-8") as f:
             f.write(
                 f"# TLS BYPASS RULE FILE\n"
                 f"# Version: {self.version}\n"
-                f"# Last Updated: {datetime.now()}\n"
+                f"# Last Updated: {format_timestamp()}\n"
                 f"# For authorized security testing only\n\n"
                 f"[BLOCK_HOSTS]\n\n"
-                f"[BLOCK_RULES]\n"
+                f"[BLOCK_RULES]\n\n"
+                f"[BLOCK_CIDRS]\n"
             )
     
+    def get_format_version(self) -> int:
+        """Return the format version declared in the rule file header (2 when missing)."""
+        with open(self.rule_file, "rb") as f:
+            return detect_format_version(f.read(4096))
+    
+    def migrate_rule_file(self) -> bool:
+        """
+        Upgrade a v2 rule file to the current format in a single pass.
+        
+        v2 marks disabled rules by commenting them out, so their section had
+        to be guessed from their content. The migration records every rule
+        with an explicit enabled flag in its section; a backup of the v2
+        file is taken first.
+        
+        Returns:
+            bool: True if the file was migrated, False if it was already current
+        """
+        if self.get_format_version() >= FORMAT_VERSION:
+            return False
+        
+        self.create_backup()
+        
+        with open(self.rule_file, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        
+        migrated = list(migrate_v2_lines(lines, format_timestamp()))
+        if not any(line.startswith("# Version:") for line in migrated):
+            migrated.insert(0, f"# Version: {self.version}")
+        
+        with open(self.rule_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(migrated))
+        
+        return True
+    
+    def _sidecar_base(self) -> str:
+        """Return the path prefix of the compiled artifact, host table, hits and journal files."""
+        return os.path.splitext(self.rule_file)[0]
+    
     def create_backup(self) -> str:
         """Create a backup of the current rule file."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -53,33 +175,16 @@ class RuleManager:
         return backup_path
     
     def read_rules(self) -> Tuple[List[str], List[str]]:
-        """Read the rule file and return separate lists of hosts and rules."""
+        """Read the rule file and return separate lists of enabled hosts and rules."""
         hosts = []
         rules = []
         
         try:
-            with open(self.rule_file, "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            # Split content by sections
-            sections = content.split("[")
-            
-            for section in sections:
-                if section.startswith("BLOCK_HOSTS]"):
-                    # Extract hosts from this section
-                    host_content = section[len("BLOCK_HOSTS]"):].strip()
-                    for line in host_content.splitlines():
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            hosts.append(line)
-                
-                elif section.startswith("BLOCK_RULES]"):
-                    # Extract rules from this section
-                    rule_content = section[len("BLOCK_RULES]"):].strip()
-                    for line in rule_content.splitlines():
-                        line = line.strip()
-                        if line and not line.startswith("#"):
-                            rules.append(line)
+            for rule in self.iter_rules(enabled=True):
+                if rule["type"] == "host":
+                    hosts.append(rule["pattern"])
+                elif rule["type"] == "regex":
+                    rules.append(rule["pattern"])
         
         except FileNotFoundError:
             self._create_default_file()
@@ -87,58 +192,252 @@ class RuleManager:
         
         return hosts, rules
     
-    def get_all_rules(self) -> List[Dict]:
-        """Get all rules with metadata (enabled/disabled, type)."""
-        all_rules = []
-        
-        # Read the raw file content to preserve comments and disabled rules
-        with open(self.rule_file, "r", encoding="utf-8") as f:
-            content = f.read()
+    def iter_rules(self, section: Optional[str] = None, enabled: Optional[bool] = None) -> Iterator[Rule]:
+        """
+        Stream rule records straight from the rule file.
         
-        lines = content.splitlines()
-        current_section = None
+        Args:
+            section (Optional[str]): Only yield rules of this type ("host", "regex" or "cidr")
+            enabled (Optional[bool]): Only yield enabled (True) or disabled (False) rules
         
-        for line in lines:
-            line = line.strip()
+        Filtering happens inside the parser, and only one record is alive at
+        a time, so memory use does not grow with the number of rules.
+        Pending journal records are replayed over the file.
+        """
+        self.journal.refresh()
+        with RuleFileReader(self.rule_file) as reader:
+            if not self.journal:
+                for view in reader.iter_views(section, enabled):
+                    yield view.to_rule()
+                return
             
-            if "[BLOCK_HOSTS]" in line:
-                current_section = "host"
-            elif "[BLOCK_RULES]" in line:
-                current_section = "regex"
-            elif line and not line.startswith("#") and current_section:
-                all_rules.append({
-                    "pattern": line,
-                    "type": current_section,
-                    "enabled": True
-                })
-            elif line.startswith("#DISABLED") or (line.startswith("#") and not line.startswith("# ")):
-                # Handle disabled rules
-                if line.startswith("#DISABLED"):
-                    actual_rule = line[10:].strip()  # Remove "#DISABLED" prefix
-                else:
-                    actual_rule = line[1:].strip()  # Remove "#" prefix
-                
-                # Determine if it's a host or regex rule based on content
-                rule_type = "host"  # Default to host
-                if any(char in actual_rule for char in [".", "*", "^", "$", "\\"]):
-                    rule_type = "regex"
-                
-                all_rules.append({
-                    "pattern": actual_rule,
-                    "type": rule_type,
-                    "enabled": False
-                })
+            rules = (view.to_rule() for view in reader.iter_views(section))
+            for rule in self.journal.overlay(rules, section):
+                if enabled is None or rule.enabled == enabled:
+                    yield rule
+    
+    def get_all_rules(self) -> List[Rule]:
+        """
+        Get all rules with metadata (enabled/disabled, type).
+        
+        Rules are compact read-only mappings; use rule.to_dict() for a
+        plain dict.
+        """
+        return list(self.iter_rules())
+    
+    def _file_key(self) -> Tuple[int, int]:
+        stat = os.stat(self.rule_file)
+        return stat.st_mtime_ns, stat.st_size
+    
+    def get_rule_table(self) -> RuleTable:
+        """
+        Return the whole rule set as a columnar RuleTable.
         
-        return all_rules
+        The table is cached until the rule file changes on disk, which makes
+        it the cheap way to keep a very large rule set in memory.
+        """
+        self.journal.refresh()
+        key = self._file_key() + (len(self.journal),)
+        if self._rule_table is None or self._rule_table_key != key:
+            table = RuleTable()
+            if self.journal:
+                for rule in self.iter_rules():
+                    table.append(rule.pattern, rule.type, rule.enabled)
+            else:
+                with RuleFileReader(self.rule_file) as reader:
+                    for view in reader.iter_views():
+                        table.append(view.pattern, view.type, view.enabled, view.line_number)
+            self._rule_table, self._rule_table_key = table, key
+        return self._rule_table
+    
+    def get_rule_index(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Return a map of rule id -> (flag offset, line end offset) in the rule file.
+        
+        The index lets edits find a rule without scanning the file. It is
+        cached until the file changes on disk. Rules without an id (e.g.
+        written by hand) get one first, via assign_rule_ids.
+        """
+        key = self._file_key()
+        if self._rule_index is not None and self._rule_index_key == key:
+            return self._rule_index
+        
+        index = self._build_rule_index()
+        if index is None:
+            self.assign_rule_ids()
+            index = self._build_rule_index() or {}
+        self._rule_index, self._rule_index_key = index, self._file_key()
+        return index
+    
+    def _build_rule_index(self) -> Optional[Dict[str, Tuple[int, int]]]:
+        """Scan the file once; return None if any rule cannot be edited in place."""
+        index = {}
+        with RuleFileReader(self.rule_file) as reader:
+            if reader.format_version < FORMAT_VERSION:
+                return None
+            buffer = reader.buffer
+            span = timestamp_span(buffer)
+            if span is not None and span[1] - span[0] != TIMESTAMP_WIDTH:
+                return None
+            for view in reader.iter_views():
+                rule_id = view.id
+                if view.flag_offset < 0 or not rule_id or rule_id in index:
+                    return None
+                line_end = buffer.find(b"\n", view.end)
+                index[rule_id] = (view.flag_offset, len(buffer) if line_end == -1 else line_end + 1)
+        return index
     
-    def add_rule(self, pattern: str, rule_type: str = "regex", enabled: bool = True) -> bool:
-        """Add a new rule to the appropriate section."""
+    def assign_rule_ids(self):
+        """Give every rule an explicit flag and a unique id, keeping existing ids."""
+        self.migrate_rule_file()
+        self.compact_journal()
+        self.create_backup()
+        
+        with open(self.rule_file, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        
+        with open(self.rule_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(assign_rule_ids(lines, format_timestamp())))
+    
+    def find_rule_id(self, pattern: str) -> Optional[str]:
+        """Return the id of the first rule (in file order) with this pattern."""
+        self.get_rule_index()
+        for rule in self.iter_rules():
+            if rule.pattern == pattern:
+                return rule.id
+        return None
+    
+    def _rule_enabled(self, rule_id: str) -> Optional[bool]:
+        """Return the current enabled state of a rule, or None if it does not exist."""
+        self.journal.refresh()
+        try:
+            state = self.journal.state(rule_id)
+        except KeyError:
+            return None
+        if state is not None:
+            return state
+        location = self.get_rule_index().get(rule_id)
+        if location is None:
+            return None
+        with open(self.rule_file, "rb") as f:
+            f.seek(location[0])
+            return f.read(1) == b"+"
+    
+    def _touch_timestamp(self, f):
+        """Overwrite the fixed-width "Last Updated" value in place."""
+        f.seek(0)
+        span = timestamp_span(f.read(4096))
+        if span is not None and span[1] - span[0] == TIMESTAMP_WIDTH:
+            f.seek(span[0])
+            f.write(format_timestamp().encode("ascii"))
+    
+    def add_rule(self, pattern: str, rule_type: str = "regex", enabled: bool = True,
+                 normalize: bool = True) -> bool:
+        """
+        Add a new rule to the appropriate section.
+        
+        Unless normalize is False the rule is first canonicalised into its
+        cheapest equivalent form; rewrites are recorded in self.rewrites.
+        """
+        if normalize:
+            pattern, rule_type = self.normalize_rule(pattern, rule_type)
+        
+        if rule_type not in RULE_TYPES:
+            return False
+        
         # Validate the regex if it's a regex rule
         if rule_type == "regex":
-            try:
-                re.compile(pattern)
-            except re.error:
-                return False  # Invalid regex
+            is_valid, _ = self.validate_regex(pattern)
+            if not is_valid:
+                return False  # Invalid or catastrophically slow regex
+        elif rule_type == "cidr" and canonical_network(pattern) is None:
+            return False
+        
+        return self._insert_rule(pattern, rule_type, enabled)
+    
+    def add_rules(self, rules: Iterable[Tuple[str, str, bool]], normalize: bool = True) -> Dict:
+        """
+        Add many rules in one batch.
+        
+        Args:
+            rules (Iterable[Tuple[str, str, bool]]): (pattern, rule_type, enabled) tuples
+            normalize (bool): Canonicalise each rule first, as add_rule does
+        
+        Returns:
+            Dict: {"added": count, "invalid": [patterns of unknown type or rejected by validation]}
+        
+        Every rule is validated like add_rule, but the store is written once,
+        with a single backup and a single Burp sync update.
+        """
+        accepted = []
+        invalid = []
+        for pattern, rule_type, enabled in rules:
+            if normalize:
+                pattern, rule_type = self.normalize_rule(pattern, rule_type)
+            if rule_type not in RULE_TYPES:
+                invalid.append(pattern)
+                continue
+            if rule_type == "regex" and not self.validate_regex(pattern)[0]:
+                invalid.append(pattern)
+                continue
+            if rule_type == "cidr" and canonical_network(pattern) is None:
+                invalid.append(pattern)
+                continue
+            accepted.append((pattern, rule_type, enabled))
+        
+        added = self._insert_rules(accepted) if accepted else 0
+        return {"added": added, "invalid": invalid}
+    
+    def ingest_scope(self, scope_file: str, dry_run: bool = False) -> Dict:
+        """
+        Import a bug-bounty program scope list.
+        
+        Args:
+            scope_file (str): Text, CSV, JSON or JSON Lines scope export
+            dry_run (bool): Only report what would be added
+        
+        Returns:
+            Dict: Summary of the classified entries, plus "added" and "rejected"
+        
+        Entries are streamed from the file, classified into host, suffix and
+        regex rules, and entries already covered by a wildcard (in the scope
+        list or an existing enabled rule) are dropped. The remaining rules
+        are stored in one batch.
+        """
+        existing = (rule.pattern for rule in self.iter_rules())
+        rules, summary = plan_scope_rules(iter_scope_targets(scope_file), self.load_matcher(), existing)
+        summary["rules"] = rules
+        if dry_run:
+            summary["added"] = 0
+            summary["rejected"] = []
+            return summary
+        
+        result = self.add_rules(rules)
+        summary["added"] = result["added"]
+        summary["rejected"] = result["invalid"]
+        return summary
+    
+    def _insert_rule(self, pattern: str, rule_type: str, enabled: bool) -> bool:
+        """Store an already validated rule."""
+        return self._insert_rules([(pattern, rule_type, enabled)]) == 1
+    
+    def _insert_rules(self, rules: List[Tuple[str, str, bool]]) -> int:
+        """
+        Store already validated rules and return how many were stored;
+        storage backends override this.
+        """
+        if self.journaled:
+            self.journal.extend({
+                "op": "add",
+                "id": new_rule_id(),
+                "pattern": escape_whitespace(pattern),
+                "type": rule_type,
+                "enabled": enabled
+            } for pattern, rule_type, enabled in rules)
+            return len(rules)
+        
+        self.migrate_rule_file()
+        self.compact_journal()
         
         # Create backup before modification
         self.create_backup()
@@ -149,39 +448,40 @@ class RuleManager:
         
         lines = content.splitlines()
         
-        # Find the appropriate section
-        if rule_type == "host":
-            section_marker = "[BLOCK_HOSTS]"
-        else:
-            section_marker = "[BLOCK_RULES]"
-        
-        # Find the section index
-        section_idx = -1
-        for i, line in enumerate(lines):
-            if section_marker in line:
-                section_idx = i
-                break
-        
-        if section_idx == -1:
-            return False
-        
-        # Insert the rule after the section header
-        insert_pos = section_idx + 1
-        while insert_pos < len(lines) and lines[insert_pos].strip() != "":
-            insert_pos += 1
+        # Every rule line carries its enabled flag and a stable id
+        new_lines = {rule_type: [] for rule_type in RULE_TYPES}
+        for pattern, rule_type, enabled in rules:
+            new_lines[rule_type].append(format_rule_line(pattern, enabled, new_rule_id()))
         
-        # Format the rule based on enabled status
-        if enabled:
-            new_rule = pattern
-        else:
-            new_rule = f"#DISABLED {pattern}"
+        # Find the end of each section's first block; insert the later one first
+        positions = []
+        missing = []
+        for rule_type, section_marker in MARKER_FOR_TYPE.items():
+            if not new_lines[rule_type]:
+                continue
+            section_idx = -1
+            for i, line in enumerate(lines):
+                if section_marker in line:
+                    section_idx = i
+                    break
+            if section_idx == -1:
+                # Files written before the section existed
+                missing.append(rule_type)
+                continue
+            insert_pos = section_idx + 1
+            while insert_pos < len(lines) and lines[insert_pos].strip() != "":
+                insert_pos += 1
+            positions.append((insert_pos, rule_type))
         
-        lines.insert(insert_pos, new_rule)
+        for insert_pos, rule_type in sorted(positions, reverse=True):
+            lines[insert_pos:insert_pos] = new_lines[rule_type]
+        for rule_type in missing:
+            lines.extend(["", MARKER_FOR_TYPE[rule_type]] + new_lines[rule_type])
         
         # Update the last updated timestamp
         for i, line in enumerate(lines):
             if line.startswith("# Last Updated:"):
-                lines[i] = f"# Last Updated: {datetime.now()}"
+                lines[i] = f"# Last Updated: {format_timestamp()}"
                 break
         
         # Write back to file
@@ -191,80 +491,187 @@ class RuleManager:
         # Update Burp sync file
         self.update_burp_sync()
         
-        return True
+        return len(rules)
     
-    def remove_rule(self, pattern: str) -> bool:
-        """Remove a rule by pattern."""
+    def normalize_rule(self, pattern: str, rule_type: str) -> Tuple[str, str]:
+        """
+        Canonicalise a rule and return (pattern, rule_type).
+        
+        Any rewrite (dropped redundant wildcards, collapsed double escapes,
+        exact-match regex turned into a host entry) is appended to
+        self.rewrites so callers can report it.
+        """
+        new_pattern, new_type, changes = normalize_rule(pattern, rule_type)
+        if changes:
+            self.rewrites.append({
+                "original": pattern,
+                "pattern": new_pattern,
+                "type": new_type,
+                "changes": changes
+            })
+        return new_pattern, new_type
+    
+    def pop_rewrites(self) -> List[Dict]:
+        """Return and clear the rewrites recorded since the last call."""
+        rewrites, self.rewrites = self.rewrites, []
+        return rewrites
+    
+    def remove_rule(self, pattern: Optional[str] = None, rule_id: Optional[str] = None) -> bool:
+        """
+        Remove a single rule.
+        
+        Args:
+            pattern (Optional[str]): Remove the first rule (in file order) with this pattern
+            rule_id (Optional[str]): Remove the rule with this id; takes precedence over pattern
+        
+        Returns:
+            bool: True if a rule was removed
+        
+        Only the bytes after the removed line are rewritten.
+        """
+        if rule_id is None and pattern is not None:
+            rule_id = self.find_rule_id(pattern)
+        
+        return rule_id is not None and self.remove_rules([rule_id]) == 1
+    
+    def remove_rules(self, rule_ids: Iterable[str]) -> int:
+        """
+        Remove several rules in one batch.
+        
+        Args:
+            rule_ids (Iterable[str]): Ids of the rules to remove; unknown ids are ignored
+        
+        Returns:
+            int: Number of rules removed
+        
+        The file is backed up and rewritten once, from the first removed
+        line onwards.
+        """
+        rule_ids = set(rule_ids)
+        
+        if self.journaled:
+            with self._journal_lock:
+                rule_ids = [rule_id for rule_id in rule_ids if self._rule_enabled(rule_id) is not None]
+                if rule_ids:
+                    self.journal.extend({"op": "remove", "id": rule_id} for rule_id in rule_ids)
+            return len(rule_ids)
+        
+        self.compact_journal()
+        index = self.get_rule_index()
+        locations = sorted(index[rule_id] for rule_id in rule_ids if rule_id in index)
+        if not locations:
+            return 0
+        
         # Create backup before modification
         self.create_backup()
         
-        with open(self.rule_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        
-        # Find and remove the rule
-        new_lines = []
-        for line in lines:
-            line_stripped = line.strip()
-            if line_stripped == pattern or line_stripped == f"#DISABLED {pattern}":
-                continue  # Skip this line (remove it)
-            new_lines.append(line)
+        start = locations[0][0]
+        with open(self.rule_file, "r+b") as f:
+            self._touch_timestamp(f)
+            f.seek(start)
+            data = f.read()
+            # Keep the bytes between removed lines
+            kept = []
+            position = start
+            for flag_offset, line_end in locations:
+                kept.append(data[position - start:flag_offset - start])
+                position = line_end
+            kept.append(data[position - start:])
+            f.seek(start)
+            f.write(b"".join(kept))
+            f.truncate()
         
-        # Write back to file
-        with open(self.rule_file, "w", encoding="utf-8") as f:
-            f.writelines(new_lines)
+        # Offsets after the removed lines have moved
+        self._rule_index = None
         
         # Update Burp sync file
         self.update_burp_sync()
         
-        return True
+        return len(locations)
     
-    def toggle_rule(self, pattern: str) -> bool:
-        """Toggle a rule between enabled and disabled."""
-        # Create backup before modification
-        self.create_backup()
+    def toggle_rule(self, pattern: Optional[str] = None, rule_id: Optional[str] = None) -> bool:
+        """
+        Toggle a single rule between enabled and disabled.
         
-        with open(self.rule_file, "r", encoding="utf-8") as f:
-            content = f.read()
+        Args:
+            pattern (Optional[str]): Toggle the first rule (in file order) with this pattern
+            rule_id (Optional[str]): Toggle the rule with this id; takes precedence over pattern
         
-        lines = content.splitlines()
-        updated = False
+        Returns:
+            bool: True if a rule was toggled
         
-        for i, line in enumerate(lines):
-            line_stripped = line.strip()
-            
-            if line_stripped == pattern:
-                # Enable is disabled
-                lines[i] = f"#DISABLED {pattern}"
-                updated = True
-                break
-            elif line_stripped == f"#DISABLED {pattern}":
-                # Disable if enabled
-                lines[i] = pattern
-                updated = True
-                break
+        The rule's one-byte flag and the fixed-width timestamp are
+        overwritten in place; nothing else in the file is rewritten.
+        """
+        if rule_id is None and pattern is not None:
+            rule_id = self.find_rule_id(pattern)
         
-        if updated:
-            # Update timestamp
-            for i, line in enumerate(lines):
-                if line.startswith("# Last Updated:"):
-                    lines[i] = f"# Last Updated: {datetime.now()}"
-                    break
-            
-            with open(self.rule_file, "w", encoding="utf-8") as f:
-                f.write("\n".join(lines))
+        if self.journaled:
+            with self._journal_lock:
+                current = self._rule_enabled(rule_id) if rule_id else None
+                if current is None:
+                    return False
+                self.journal.append({"op": "set", "id": rule_id, "enabled": not current})
+            return True
+        
+        self.compact_journal()
+        location = self.get_rule_index().get(rule_id) if rule_id else None
+        if location is None:
+            return False
+        
+        # Create backup before modification
+        self.create_backup()
+        
+        flag_offset, _ = location
+        with open(self.rule_file, "r+b") as f:
+            f.seek(flag_offset)
+            flag = f.read(1)
+            f.seek(flag_offset)
+            f.write(b"-" if flag == b"+" else b"+")
+            self._touch_timestamp(f)
+        
+        # Offsets are unchanged, so the index stays valid
+        self._rule_index_key = self._file_key()
         
         # Update Burp sync file
         self.update_burp_sync()
         
-        return updated
+        return True
     
     def validate_regex(self, pattern: str) -> Tuple[bool, str]:
-        """Validate a regex pattern and return (is_valid, error_message)."""
-        try:
-            re.compile(pattern)
-            return True, ""
-        except re.error as e:
-            return False, str(e)
+        """
+        Validate a regex pattern and return (is_valid, error_message).
+        
+        Besides compiling the pattern, this runs the ReDoS analysis from
+        analyze_regex and rejects patterns that backtrack catastrophically
+        on hostname-sized input.
+        """
+        report = self.analyze_regex(pattern)
+        return report["valid"], report["error"]
+    
+    def analyze_regex(self, pattern: str) -> Dict:
+        """
+        Return the safety report for a regex pattern.
+        
+        The report lists static ReDoS findings (nested/overlapping quantifiers,
+        ambiguous alternation), the fuzzing verdict and the measured cost in
+        microseconds per search. Reports are cached per pattern.
+        """
+        if pattern not in self.regex_reports:
+            self.regex_reports[pattern] = analyze_regex(pattern)
+        return self.regex_reports[pattern]
+    
+    def get_rule_cost(self, pattern: str) -> float:
+        """
+        Estimated cost of evaluating a regex rule, used to order cheap rules first.
+        
+        Uses the measured cost when the pattern has been analyzed and falls
+        back to a static estimate otherwise.
+        """
+        report = self.regex_reports.get(pattern)
+        if report is not None:
+            return report["cost"]
+        return estimate_static_cost(pattern)
     
     def test_regex(self, pattern: str, test_string: str) -> bool:
         """Test if a regex pattern matches a test string."""
@@ -275,21 +682,89 @@ class RuleManager:
     
     def get_rule_stats(self) -> Dict:
         """Get statistics about the current rules."""
-        hosts, rules = self.read_rules()
-        all_rules = self.get_all_rules()
+        total_hosts = 0
+        total_rules = 0
+        total_cidrs = 0
+        disabled_count = 0
         
-        enabled_count = sum(1 for rule in all_rules if rule["enabled"])
-        disabled_count = len(all_rules) - enabled_count
+        # Count in a single streaming pass instead of materialising the rules
+        for rule in self.iter_rules():
+            if not rule["enabled"]:
+                disabled_count += 1
+            elif rule["type"] == "host":
+                total_hosts += 1
+            elif rule["type"] == "cidr":
+                total_cidrs += 1
+            else:
+                total_rules += 1
+        
+        enabled_count = total_hosts + total_rules + total_cidrs
         
         return {
-            "total_hosts": len(hosts),
-            "total_rules": len(rules),
-            "total_all": len(all_rules),
+            "total_hosts": total_hosts,
+            "total_rules": total_rules,
+            "total_cidrs": total_cidrs,
+            "total_all": enabled_count + disabled_count,
             "enabled": enabled_count,
             "disabled": disabled_count,
             "file_path": self.rule_file
         }
     
+    def minimize_rules(self, apply: bool = False, sibling_threshold: int = SIBLING_THRESHOLD) -> Dict:
+        """
+        Find enabled rules that are redundant given the other enabled rules.
+        
+        Args:
+            apply (bool): Remove the redundant rules in one batch
+            sibling_threshold (int): Suggest a suffix rule for parents with this many host rules
+        
+        Returns:
+            Dict: The minimize_rules() report, plus "removed" (0 unless applied)
+        """
+        report = minimize_rules(self.iter_rules(), sibling_threshold)
+        if apply and any(rule["id"] is None for rule in report["removable"]):
+            # Hand-written rules have no id to remove them by yet
+            self.get_rule_index()
+            report = minimize_rules(self.iter_rules(), sibling_threshold)
+        report["removed"] = 0
+        if apply and report["removable"]:
+            report["removed"] = self.remove_rules(rule["id"] for rule in report["removable"])
+        return report
+    
+    def collapse_cidr_rules(self) -> Dict:
+        """
+        Merge overlapping and adjacent enabled CIDR rules.
+        
+        Returns:
+            Dict: {"removed": count, "added": [new CIDRs]}; nothing changes
+            when the enabled CIDR rules are already minimal
+        """
+        rules = list(self.iter_rules(section="cidr", enabled=True))
+        if any(rule.id is None for rule in rules):
+            # Hand-written rules have no id to remove them by yet
+            self.get_rule_index()
+            rules = list(self.iter_rules(section="cidr", enabled=True))
+        
+        collapsed = collapse_networks(rule.pattern for rule in rules)
+        current = {canonical_network(rule.pattern) for rule in rules}
+        if len(collapsed) == len(rules) and current == set(collapsed):
+            return {"removed": 0, "added": []}
+        
+        keep = set(collapsed) & current
+        kept = set()
+        obsolete = []
+        for rule in rules:
+            network = canonical_network(rule.pattern)
+            if network in keep and network not in kept:
+                kept.add(network)
+            else:
+                obsolete.append(rule.id)
+        added = [network for network in collapsed if network not in keep]
+        
+        removed = self.remove_rules(obsolete)
+        self.add_rules([(network, "cidr", True) for network in added], normalize=False)
+        return {"removed": removed, "added": added}
+    
     def find_rule_conflicts(self) -> List[Dict]:
         """Find potential conflicts between rules."""
         all_rules = self.get_all_rules()
@@ -330,10 +805,531 @@ class RuleManager:
         
         return conflicts
     
-    def _update_burp_sync_file(self):
-        """Update the Burp Suite auto-sync file with enabled rules only."""
-        all_rules = self.get_all_rules()
-        enabled_rules = [rule for rule in all_rules if rule["enabled"]]
+    def compact_journal(self) -> bool:
+        """
+        Fold pending journal records into the rule file and regenerate the
+        Burp sync file.
+        
+        The new rule file is written next to the old one and swapped in
+        atomically before the journal is cleared; replaying a record twice
+        is harmless, so a crash in between loses nothing.
+        
+        Returns:
+            bool: True if any records were folded
+        """
+        with self._journal_lock:
+            self.journal.refresh()
+            if not self.journal:
+                return False
+            
+            self.create_backup()
+            
+            with open(self.rule_file, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            
+            temp_path = f"{self.rule_file}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(self.journal.fold(lines, format_timestamp())))
+            os.replace(temp_path, self.rule_file)
+            self.journal.reset()
+        
+        self.update_burp_sync()
+        return True
+    
+    def start_compactor(self, interval: Optional[float] = None):
+        """Start compacting the journal in the background every interval seconds."""
+        self.stop_compactor(compact=False)
+        if interval is not None:
+            self.compact_interval = interval
+        self._compactor = threading.Timer(self.compact_interval, self._run_compactor)
+        self._compactor.daemon = True
+        self._compactor.start()
+    
+    def _run_compactor(self):
+        try:
+            self.compact_journal()
+        except OSError as e:
+            print(f"Error compacting rule journal: {e}")
+        if self._compactor is not None:
+            self.start_compactor()
+    
+    def stop_compactor(self, compact: bool = True):
+        """Stop the background compactor, folding any pending records first."""
+        compactor, self._compactor = self._compactor, None
+        if compactor is not None:
+            compactor.cancel()
+        if compact:
+            self.compact_journal()
+    
+    def content_digest(self) -> str:
+        """Hash of the rule text plus any pending journal records."""
+        content_hash = file_digest(self.rule_file)
+        self.journal.refresh()
+        if not self.journal:
+            return content_hash
+        return hashlib.sha256((content_hash + file_digest(self.journal.path)).encode("ascii")).hexdigest()
+    
+    def watch_key(self) -> Optional[Tuple]:
+        """
+        Return a cheap fingerprint of the rule store for change polling.
+        
+        None means the file is missing, e.g. while an editor replaces it.
+        """
+        try:
+            stat = os.stat(self.rule_file)
+        except FileNotFoundError:
+            return None
+        try:
+            journal_size = os.stat(self.journal.path).st_size
+        except FileNotFoundError:
+            journal_size = 0
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size, journal_size
+    
+    def load_sections(self, previous: Optional[Dict[str, Dict]] = None) -> Tuple[Dict[str, Dict], List[str]]:
+        """
+        Read the rules section by section, re-parsing only sections that changed.
+        
+        Args:
+            previous (Optional[Dict[str, Dict]]): The sections from an earlier call
+        
+        Returns:
+            Tuple[Dict[str, Dict], List[str]]: Sections in file order, mapping rule
+            type to {"digest", "rules"}, and the types whose rules changed
+        """
+        previous = previous or {}
+        sections = {}
+        changed = []
+        
+        self.journal.refresh()
+        with RuleFileReader(self.rule_file) as reader:
+            incremental = not self.journal and reader.format_version >= FORMAT_VERSION
+            if incremental:
+                ranges = sorted(reader.section_ranges().items(), key=lambda item: item[1][0])
+                for rule_type, (start, end) in ranges:
+                    digest = reader.section_digest(start, end)
+                    old = previous.get(rule_type)
+                    if old is not None and old["digest"] == digest:
+                        sections[rule_type] = old
+                        continue
+                    rules = [view.to_rule() for view in reader.iter_section(rule_type)]
+                    sections[rule_type] = {"digest": digest, "rules": rules}
+                    changed.append(rule_type)
+        
+        if not incremental:
+            # Journal replay or a legacy file: re-read everything
+            for rule in self.iter_rules():
+                sections.setdefault(rule.type, {"digest": None, "rules": []})["rules"].append(rule)
+            changed = list(sections)
+        
+        changed.extend(rule_type for rule_type in previous if rule_type not in sections)
+        return sections, changed
+    
+    def watch(self, callback: Optional[Callable[[List[Rule], List[str]], None]] = None,
+              interval: float = 0.5, debounce: float = 0.3) -> RuleFileWatcher:
+        """
+        Start watching the rule store for external edits.
+        
+        On every change the Burp sync file is regenerated and callback, if
+        given, is called from the watcher thread with (rules, changed_sections).
+        Call stop() on the returned watcher to end it.
+        """
+        watcher = RuleFileWatcher(self, callback, interval, debounce)
+        watcher.start()
+        return watcher
+    
+    def compile_rules(self, content_hash: Optional[str] = None) -> Dict:
+        """
+        Build the lookup tables for the enabled rules and write them to the
+        compiled artifact next to the rule file.
+        
+        The artifact is keyed by the SHA-256 of the rule text, so it is only
+        trusted while the text file is unchanged.
+        """
+        if content_hash is None:
+            content_hash = self.content_digest()
+        host_digest = self.host_section_digest()
+        if host_digest is None:
+            tables = build_tables(self.iter_rules(enabled=True))
+        else:
+            # Host rules are served from the on-disk host table
+            rules = (rule for rule_type in RULE_TYPES if rule_type != "host"
+                     for rule in self.iter_rules(rule_type, enabled=True))
+            tables = build_tables(rules, host_table=host_digest)
+        write_compiled(self.compiled_file, content_hash, tables)
+        return tables
+    
+    def host_section_digest(self) -> Optional[str]:
+        """
+        Return the digest of the hosts section if it is large enough to be
+        served from the on-disk host table, or None.
+        
+        Only v3 files without pending journal records qualify, since the
+        table is built straight from the section's bytes.
+        """
+        self.journal.refresh()
+        if self.journal:
+            return None
+        with RuleFileReader(self.rule_file) as reader:
+            if reader.format_version < FORMAT_VERSION:
+                return None
+            span = reader.section_ranges().get("host")
+            if span is None or span[1] - span[0] < HOST_TABLE_MIN_BYTES:
+                return None
+            return reader.section_digest(*span)
+    
+    def _release_host_table(self):
+        """Close the host table of the current matcher, if any, and drop the matcher."""
+        if self._matcher is not None and self._matcher.host_table is not None:
+            self._matcher.host_table.close()
+            self._matcher = None
+    
+    def load_host_table(self, digest: str) -> HostTable:
+        """
+        Return the on-disk host table for the hosts section with this digest.
+        
+        The table is reused while the hosts section is unchanged and rebuilt
+        from the rule file otherwise, so edits to other sections never
+        trigger a rebuild.
+        """
+        current = self._matcher.host_table if self._matcher is not None else None
+        if current is not None and current.digest == digest:
+            return current
+        # Release the old mapping first; the file cannot be replaced while mapped on Windows
+        self._release_host_table()
+        table = HostTable.open(self.host_table_file, digest)
+        if table is None:
+            with RuleFileReader(self.rule_file) as reader:
+                hosts = (view.pattern for view in reader.iter_section("host") if view.enabled)
+                build_host_table(self.host_table_file, hosts, digest)
+            table = HostTable(self.host_table_file, digest)
+        return table
+    
+    def load_matcher(self) -> RuleMatcher:
+        """
+        Return a matcher for the current rules.
+        
+        Loads the memory-mapped compiled artifact when its hash matches the
+        rule file, skipping parsing entirely, and rebuilds it otherwise.
+        """
+        content_hash = self.current_content_hash()
+        if (self._matcher is not None and self._matcher_hash == content_hash
+                and self._matcher.regex_engine == self.regex_engine):
+            return self._matcher
+        
+        tables, host_table = self._load_tables(content_hash)
+        matcher = RuleMatcher(tables, self.regex_engine, host_table)
+        if matcher.regexes and os.path.exists(self.hits_file):
+            # Stored costs only: loading never times the rules
+            matcher.reorder_regexes(plan_regex_order(*self._regex_profile(matcher, load_hits(self.hits_file))))
+        self._matcher = matcher
+        self._matcher_hash = content_hash
+        return self._matcher
+    
+    def _load_tables(self, content_hash: str) -> Tuple[Dict, Optional[HostTable]]:
+        """Return the compiled tables for content_hash (rebuilt if stale) and their host table, if any."""
+        tables = read_compiled(self.compiled_file, content_hash)
+        if tables is None:
+            tables = self.compile_rules(content_hash)
+        if tables.get("host_table"):
+            return tables, self.load_host_table(tables["host_table"])
+        # The hosts section shrank below the threshold: the old table is no longer used
+        self._release_host_table()
+        return tables, None
+    
+    def _regex_profile(self, matcher: RuleMatcher, profile: Dict,
+                       measure: bool = False) -> Tuple[List[Optional[float]], List[int]]:
+        """
+        Return the cost and observed hits of every entry in the matcher's regex table.
+        
+        Args:
+            matcher (RuleMatcher): Matcher whose regex table is profiled
+            profile (Dict): Hits file contents (see traffic.load_hits)
+            measure (bool): Time rules with no stored cost and store it in profile["costs"]
+        
+        Returns:
+            Tuple[List[Optional[float]], List[int]]: Costs (None if never
+            measured) and hits (ingested traffic plus the matcher's live counts)
+        
+        A rule is measured by reusing the cost in its regex safety report
+        when it has been analyzed, and by timing it otherwise.
+        """
+        counters = profile["rules"]
+        stored = profile["costs"]
+        costs = []
+        hits = []
+        for index, (_, pattern) in enumerate(matcher.regexes):
+            cost = stored.get(pattern)
+            if cost is None and measure:
+                report = self.regex_reports.get(pattern)
+                cost = stored[pattern] = report["cost"] if report is not None else matcher.regex_cost(index)
+            costs.append(cost)
+            hits.append(counters.get(pattern, {}).get("hits", 0) + matcher.regex_hits[index])
+        return costs, hits
+    
+    def reorder_regexes(self) -> bool:
+        """
+        Re-rank the regex rules by observed hit probability per unit of cost.
+        
+        Rules that match often and search cheaply are tried first, so
+        first-match classification of real traffic runs a few searches per
+        host instead of all of them. Rules without a stored cost are timed
+        once and their cost kept in the hits file, so later loads apply the
+        same order without timing anything. The Burp sync file is rewritten
+        in the new order.
+        
+        Returns:
+            bool: True if the order changed
+        """
+        matcher = self.load_matcher()
+        profile = load_hits(self.hits_file)
+        measured = len(profile["costs"])
+        order = plan_regex_order(*self._regex_profile(matcher, profile, measure=True))
+        if len(profile["costs"]) != measured:
+            save_hits(self.hits_file, profile)
+        if order == matcher.regex_order:
+            return False
+        matcher.reorder_regexes(order)
+        # Another regex may now be reported first for cached hosts
+        self._match_cache.clear()
+        self.update_burp_sync()
+        return True
+    
+    def start_profiler(self, interval: Optional[float] = None):
+        """Start re-ranking the regex rules in the background every interval seconds."""
+        self.stop_profiler()
+        if interval is not None:
+            self.profile_interval = interval
+        self._profiler = threading.Timer(self.profile_interval, self._run_profiler)
+        self._profiler.daemon = True
+        self._profiler.start()
+    
+    def _run_profiler(self):
+        try:
+            self.reorder_regexes()
+        except OSError as e:
+            print(f"Error reordering regex rules: {e}")
+        if self._profiler is not None:
+            self.start_profiler()
+    
+    def stop_profiler(self):
+        """Stop the background re-ranking of the regex rules."""
+        profiler, self._profiler = self._profiler, None
+        if profiler is not None:
+            profiler.cancel()
+    
+    def current_content_hash(self) -> str:
+        """
+        Return content_digest(), rehashing the store only when watch_key() changes.
+        
+        Keeps per-lookup work to a stat call for hot paths like match_host.
+        """
+        key = self.watch_key()
+        if self._content_hash is None or self._content_hash_key != key or key is None:
+            self._content_hash = self.content_digest()
+            self._content_hash_key = key
+        return self._content_hash
+    
+    def match_host(self, host: str) -> Optional[str]:
+        """
+        Return the pattern of the enabled rule matching host, or None.
+        
+        Results are cached per (rule set content hash, normalized host), so
+        repeated lookups of hot hosts cost one dict probe; the cache is
+        emptied whenever the rules change.
+        """
+        content_hash = self.current_content_hash()
+        if content_hash != self._match_cache_hash:
+            self._match_cache.clear()
+            self._match_cache_hash = content_hash
+        
+        host = normalize_host(host)
+        key = (content_hash, host)
+        result = self._match_cache.get(key)
+        if result is MatchCache.MISSING:
+            result = self.load_matcher().match(host)
+            self._match_cache.put(key, result)
+        return result
+    
+    def classify_hosts(self, hosts: Iterable[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Classify a large host corpus, yielding (normalized host, matching pattern or None).
+        
+        Exact and suffix rules are resolved in vectorised batches when numpy
+        is installed (see batch.BatchMatcher); the match cache is bypassed.
+        """
+        hosts = (normalize_host(host) for host in hosts)
+        return classify_hosts(self.load_matcher(), (host for host in hosts if host))
+    
+    def match_keywords(self, host: str) -> List[str]:
+        """Return the patterns of every keyword-anywhere rule occurring in host."""
+        return self.load_matcher().match_keywords(normalize_host(host))
+    
+    def ingest_traffic(self, path: str) -> Dict:
+        """
+        Count the requests in a traffic capture that each enabled rule matches.
+        
+        Args:
+            path (str): HAR file, Burp XML export, or proxy access log / URL list
+        
+        Returns:
+            Dict: Counts of requests, matched, unmatched and unparsed requests, and rules hit
+        
+        The capture is streamed (see traffic.iter_traffic), so multi-GB files
+        are never held in memory. Hit counts and last-seen timestamps are
+        added to those already in the hits sidecar file, which is rewritten
+        once at the end, and the regex rules are then re-ranked with the new
+        counts (see reorder_regexes).
+        """
+        matcher = self.load_matcher()
+        live_hits = list(matcher.regex_hits)
+        cache = MatchCache()
+        hits = load_hits(self.hits_file)
+        summary = {"requests": 0, "matched": 0, "unmatched": 0, "unparsed": 0}
+        rules_hit = set()
+        
+        for raw_host, timestamp in iter_traffic(path):
+            summary["requests"] += 1
+            host = normalize_host(raw_host) if raw_host else ""
+            if not host:
+                summary["unparsed"] += 1
+                continue
+            pattern = cache.get(host)
+            if pattern is MatchCache.MISSING:
+                pattern = matcher.match(host)
+                cache.put(host, pattern)
+            if pattern is None:
+                summary["unmatched"] += 1
+                continue
+            summary["matched"] += 1
+            rules_hit.add(pattern)
+            record_hit(hits, pattern, timestamp)
+        
+        hits["requests"] += summary["requests"]
+        hits["unmatched"] += summary["unmatched"]
+        hits["updated"] = now_iso()
+        save_hits(self.hits_file, hits)
+        # These hits are in the hits file now; keep only the live ones in the matcher
+        matcher.regex_hits[:] = live_hits
+        self.reorder_regexes()
+        summary["rules_hit"] = len(rules_hit)
+        return summary
+    
+    def get_hit_stats(self, top: int = REPORTED_RULES) -> Optional[Dict]:
+        """
+        Summarise the hits sidecar against the current enabled rules.
+        
+        Args:
+            top (int): Number of hot and dead rules to list by name
+        
+        Returns:
+            Optional[Dict]: None if no traffic has been ingested; otherwise the
+            hottest rules as (pattern, hits, last seen), the enabled rules that
+            never matched ("dead", with a total count) and the request totals
+        """
+        hits = load_hits(self.hits_file)
+        if not hits["requests"]:
+            return None
+        counters = hits["rules"]
+        hot = []
+        dead = []
+        dead_count = 0
+        for rule in self.iter_rules(enabled=True):
+            entry = counters.get(rule["pattern"])
+            if entry is None:
+                dead_count += 1
+                if len(dead) < top:
+                    dead.append(rule["pattern"])
+            else:
+                hot.append((rule["pattern"], entry["hits"], entry["last_seen"]))
+        hot.sort(key=lambda item: -item[1])
+        return {
+            "requests": hits["requests"],
+            "unmatched": hits["unmatched"],
+            "updated": hits["updated"],
+            "hot": hot[:top],
+            "dead": dead,
+            "dead_count": dead_count,
+        }
+    
+    def suggest_suffix_rules(self, path: str, min_subdomains: int = MIN_SUBDOMAINS) -> Dict:
+        """
+        Propose "Match all subdomains" rules from the hostnames seen in traffic.
+        
+        Args:
+            path (str): Host list, proxy log, HAR file or Burp XML export
+            min_subdomains (int): Distinct observed hosts a suffix needs to be proposed
+        
+        Returns:
+            Dict: "hosts" and "distinct" (hostnames read, and distinct ones), and
+            "suggestions": {"suffix", "pattern", "observed", "replaces"} dicts,
+            where replaces counts the enabled host rules the new rule covers
+        
+        Hostnames are streamed into a SuffixSketch, so memory stays bounded
+        for tens of millions of names. Suffixes an enabled rule already
+        covers are skipped. Suggestions are ranked by how much they shrink
+        the rule set (host rules replaced, then observed hosts that would
+        otherwise each need a rule); none are applied.
+        """
+        sketch = SuffixSketch(min_subdomains)
+        for raw_host, _ in iter_traffic(path):
+            host = normalize_host(raw_host) if raw_host else ""
+            if host:
+                sketch.add(host)
+        
+        matcher = self.load_matcher()
+        suggestions = {}
+        for cluster in sketch.clusters():
+            if covering_rule(matcher, cluster["suffix"]) is None:
+                cluster["pattern"] = RuleTemplate.generate_pattern("Match all subdomains", cluster["suffix"])
+                cluster["replaces"] = 0
+                suggestions[cluster["suffix"]] = cluster
+        if suggestions:
+            # Suggested suffixes never nest, so each host rule counts towards one at most
+            for rule in self.iter_rules("host", enabled=True):
+                for parent in parent_domains(rule["pattern"]):
+                    if parent in suggestions:
+                        suggestions[parent]["replaces"] += 1
+                        break
+        
+        ranked = sorted(suggestions.values(),
+                        key=lambda suggestion: (-suggestion["replaces"], -suggestion["observed"], suggestion["suffix"]))
+        return {"hosts": sketch.hosts, "distinct": sketch.distinct, "suggestions": ranked}
+    
+    def audit_rules(self, path: str) -> Dict:
+        """
+        Report how the enabled rules cover a reference host corpus and overlap on it.
+        
+        Args:
+            path (str): Host list, proxy log, HAR file or Burp XML export
+        
+        Returns:
+            Dict: The audit.audit_rules() report: coverage per rule, unused rules,
+            the most overlapping rule pairs, rules subsumed by others on the
+            corpus, and unmatched hosts
+        
+        The empirical counterpart to find_rule_conflicts. Hosts are streamed
+        and each one is matched once against all rules together, with the
+        regex rules compiled into one DFA, rather than once per rule.
+        """
+        tables, host_table = self._load_tables(self.current_content_hash())
+        matcher = RuleMatcher(tables, "dfa", host_table)
+        hosts = (normalize_host(raw_host) if raw_host else "" for raw_host, _ in iter_traffic(path))
+        rules = [(rule["pattern"], rule["type"]) for rule in self.iter_rules(enabled=True)]
+        return audit_rules(matcher, rules, (host for host in hosts if host))
+    
+    def match_cache_stats(self) -> Dict:
+        """Return the size, hit/miss/eviction counters and hit ratio of the match cache."""
+        return self._match_cache.stats()
+    
+    def _update_burp_sync_file(self, rules: Optional[Iterable[Rule]] = None):
+        """
+        Update the Burp Suite auto-sync file with enabled rules only.
+        
+        Args:
+            rules (Optional[Iterable[Rule]]): Rules already in memory; read from the store when omitted
+        """
+        if rules is None:
+            rules = self.iter_rules(enabled=True)
         
         with open(self.burp_sync_file, "w", encoding="utf-8") as f:
             f.write("# Burp Suite TLS Bypass Rules - Auto-sync File\n")
@@ -341,13 +1337,48 @@ class RuleManager:
             f.write("# This file is auto-generated. Do not edit manually.\n")
             f.write("# For authorized testing only\n\n")
             
-            for rule in enabled_rules:
-                f.write(f"{rule['pattern']}\n")
+            # Burp has no CIDR syntax; ranges are collapsed and written last
+            cidrs = []
+            # Once traffic has been profiled, lines are written in profile order
+            profiled = [] if os.path.exists(self.hits_file) else None
+            for rule in rules:
+                if not rule["enabled"]:
+                    continue
+                if rule["type"] == "cidr":
+                    cidrs.append(rule["pattern"])
+                elif profiled is not None:
+                    profiled.append(rule["pattern"])
+                else:
+                    f.write(f"{rule['pattern']}\n")
+            if profiled:
+                f.writelines(f"{pattern}\n" for pattern in self._profiled_sync_order(profiled))
+            for entry in export_networks(cidrs, self.cidr_export):
+                f.write(f"{entry}\n")
     
-    def update_burp_sync(self):
+    def _profiled_sync_order(self, patterns: List[str]) -> List[str]:
+        """
+        Order sync file lines by hit probability per unit of cost, as the matcher orders its regexes.
+        
+        Only the hits file is read, so no matcher is loaded or timed. Rules
+        without a stored cost (hosts, literals, regexes not measured yet) are
+        costed like the cheapest measured regex; ties keep the store order.
+        """
+        profile = load_hits(self.hits_file)
+        counters = profile["rules"]
+        costs = profile["costs"]
+        cheapest = regex_cost_floor(costs.values())
+        
+        def key(pattern: str) -> float:
+            cost = costs.get(pattern)
+            cost = cheapest if cost is None else max(cost, MIN_REGEX_COST)
+            return -(counters.get(pattern, {}).get("hits", 0) + PROFILE_PRIOR_HITS) / cost
+        
+        return sorted(patterns, key=key)
+    
+    def update_burp_sync(self, rules: Optional[Iterable[Rule]] = None):
         """Public method to update the Burp sync file after rule changes."""
         try:
-            self._update_burp_sync_file()
+            self._update_burp_sync_file(rules)
             return True
         except Exception:
             return False
@@ -359,17 +1390,26 @@ class RuleManager:
         
         for domain in domains:
             # Check if it's a simple domain (like google.com)
-            if re.match(r'^[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9]*\.[a-zA-Z]{2,}$', domain):
+            host = normalize_host(domain)
+            if re.match(r'^[a-z0-9][a-z0-9-]{1,61}[a-z0-9]*\.[a-z]{2,}$', host):
                 # Add common subdomains as static hosts
                 common_subdomains = ['www', 'mail', 'api', 'cdn', 'static', 'assets', 'media', 'img', 'video', 'download']
                 for subdomain in common_subdomains:
-                    static_hosts.append(f"{subdomain}.{domain}")
+                    static_hosts.append(f"{subdomain}.{host}")
                 # Add the base domain as well
-                static_hosts.append(domain)
+                static_hosts.append(host)
+                continue
+            if re.match(r'^[\w.-]+$', domain.strip()):
+                # Any other hostname
+                static_hosts.append(host)
+                continue
+            # Anything else is a pattern; normalize_host would cut it at "/", "@" or ":"
+            pattern, rule_type, _ = normalize_rule(domain, "regex")
+            lowered = domain.strip().lower()
             # Check if it's a wildcard pattern that should be more specific
-            elif '*.' in domain or '.*' in domain:
+            if '*.' in lowered or '.*' in lowered:
                 # Convert overly broad patterns to more specific ones
-                if '.*\\.google\\.com' in domain:
+                if '.*\\.google\\.com' in lowered:
                     # More specific Google patterns
                     regex_rules.extend([
                         r'.*\.google\.com',
@@ -382,17 +1422,19 @@ class RuleManager:
                         r'.*\.googleusercontent\.com',
                         r'.*\.doubleclick\.net'
                     ])
-                elif '.*\\.mozilla\\.org' in domain or '.*\\.mozilla\\.com' in domain:
+                elif '.*\\.mozilla\\.org' in lowered or '.*\\.mozilla\\.com' in lowered:
                     # More specific Mozilla patterns
                     regex_rules.extend([
-                        r'.*\\.mozilla\\.(com|net|org)',
-                        r'.*\\.firefox\\.com',
-                        r'.*\\.addons\\.mozilla\\.org'
+                        r'.*\.mozilla\.(com|net|org)',
+                        r'.*\.firefox\.com',
+                        r'.*\.addons\.mozilla\.org'
                     ])
                 else:
-                    regex_rules.append(domain)
+                    regex_rules.append(pattern)
+            elif rule_type == "host":
+                static_hosts.append(pattern)
             else:
-                static_hosts.append(domain)
+                regex_rules.append(pattern)
         
         return {
             "hosts": static_hosts,
@@ -411,16 +1453,26 @@ class RuleManager:
             str: Converted host in the requested format
         """
         if conversion_type == "regex":
-            # Convert host to a regex pattern that matches the specific host
-            # Escape special regex characters in the host
-            escaped_host = re.escape(host)
-            return f"^{escaped_host}$"  # Exact match pattern
+            # Exact-match pattern with special regex characters escaped
+            return host_to_regex(host)
         elif conversion_type == "static":
             # Return as-is for static host (already in correct format)
             return host
         else:
             raise ValueError("conversion_type must be either 'regex' or 'static'")
     
+    def convert_rule_to_host(self, pattern: str) -> Optional[str]:
+        """
+        Inverse of convert_host_to_rule.
+        
+        Args:
+            pattern (str): An exact-match regex such as ^api\\.example\\.com$
+        
+        Returns:
+            Optional[str]: The hostname, or None if the pattern is not a pure anchored literal
+        """
+        return regex_to_host(pattern)
+    
     def convert_hosts_list(self, hosts: List[str], conversion_type: str = "regex") -> List[str]:
         """
         Convert a list of hosts to either rule patterns or static hosts.
@@ -438,7 +1490,7 @@ class RuleManager:
         return converted
     
     def batch_convert_file(self, input_file: str = "tls_bypass_rule.txt", output_file: str = "converted_rules.txt", 
-                          target_section: str = "both", conversion_type: str = "regex"):
+                          target_section: str = "both", conversion_type: str = "regex", processes: int = 1):
         """
         Batch convert hosts in a rule file to either static hosts or rule patterns.
         
@@ -447,64 +1499,16 @@ class RuleManager:
             output_file (str): Path to output file
             target_section (str): Which section to convert - "hosts", "rules", or "both"
             conversion_type (str): Either "regex" or "static"
+            processes (int): Worker processes to shard the conversion across
         
         Returns:
-            bool: True if successful, False otherwise
+            Dict: Summary of converted, moved and unconvertible rules, or False on error
+        
+        The file is streamed with bounded memory, and converted rules are
+        moved into the section that matches their new type.
         """
         try:
-            # Read the current rule file
-            with open(input_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            lines = content.splitlines()
-            new_lines = []
-            current_section = None
-            
-            for line in lines:
-                stripped_line = line.strip()
-                
-                if '[BLOCK_HOSTS]' in stripped_line:
-                    current_section = 'hosts'
-                    new_lines.append(line)
-                elif '[BLOCK_RULES]' in stripped_line:
-                    current_section = 'rules'
-                    new_lines.append(line)
-                elif stripped_line and not stripped_line.startswith('#'):
-                    # Process the line if it's in the targeted section
-                    if target_section == 'both' or current_section == target_section:
-                        if conversion_type == 'regex' and current_section == 'hosts':
-                            # Convert static host to exact-match regex pattern
-                            converted = self.convert_host_to_rule(stripped_line, 'regex')
-                            # Add to rules section instead
-                            # We'll handle this differently - add to the same line for now
-                            new_lines.append(converted)
-                        elif conversion_type == 'static' and current_section == 'rules':
-                            # If we want to convert regex rules to static hosts, we need to 
-                            # convert regex back to a possible host form (if it's a simple pattern)
-                            if stripped_line.startswith('^') and stripped_line.endswith('$'):
-                                # Remove ^ and $ for exact match patterns
-                                host = stripped_line[1:-1]
-                                # Unescape regex characters
-                                unescaped_host = re.sub(r'\\(.)', r'\1', host)
-                                new_lines.append(unescaped_host)
-                            else:
-                                # For complex regex, we can't reliably convert to host
-                                new_lines.append(line)  # Keep as is
-                        else:
-                            # No conversion needed
-                            new_lines.append(line)
-                    else:
-                        # Not in targeted section, keep as is
-                        new_lines.append(line)
-                else:
-                    # Keep comments and empty lines as they are
-                    new_lines.append(line)
-            
-            # Write the converted content to output file
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(new_lines))
-            
-            return True
+            return convert_rule_file(input_file, output_file, target_section, conversion_type, processes)
         except Exception as e:
             print(f"Error during batch conversion: {e}")
             return False
@@ -0,0 +1,372 @@
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from matcher import _literal_shape
+from normalize import normalize_rule
+from rules import RuleManager
+from rulefile import (FORMAT_VERSION, SECTION_MARKERS, Rule, RuleFileReader, RuleTable, escape_whitespace,
+                      format_rule_line, format_timestamp, new_rule_id)
+
+
+# Files with one of these extensions are opened with the SQLite backend
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# Environment variable that selects the rule store for the CLI and GUI
+STORE_ENV_VAR = "TLS_RULE_STORE"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    pattern TEXT NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('host', 'regex', 'cidr')),
+    enabled INTEGER NOT NULL DEFAULT 1,
+    tags TEXT NOT NULL DEFAULT '',
+    reversed_host TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rules_pattern ON rules (pattern);
+CREATE INDEX IF NOT EXISTS idx_rules_type_enabled ON rules (type, enabled, position);
+CREATE INDEX IF NOT EXISTS idx_rules_enabled ON rules (enabled);
+CREATE INDEX IF NOT EXISTS idx_rules_reversed_host ON rules (reversed_host);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Sections in file order (hosts, regex rules, CIDRs), each in insertion order
+_ORDER = " ORDER BY CASE type WHEN 'host' THEN 0 WHEN 'regex' THEN 1 ELSE 2 END, position"
+
+# CHECK constraint of databases created before the cidr rule type
+_LEGACY_TYPE_CHECK = "CHECK (type IN ('host', 'regex'))"
+
+
+def reverse_host(host: str) -> str:
+    """Reverse the labels of a hostname: api.example.com -> com.example.api."""
+    return ".".join(reversed(host.strip(".").split(".")))
+
+
+def reversed_host_key(pattern: str, rule_type: str) -> Optional[str]:
+    """
+    Return the reversed-host column value for a rule.
+
+    Host rules and label-aligned suffix regexes get their reversed domain so
+    suffix queries become index range scans. Suffix regexes are recognised
+    in their canonical form, so \\.example\\.com$, \\.example\\.com (what the
+    "Match all subdomains" template normalises to) and .*\\.example\\.com all
+    get com.example.
+    """
+    if rule_type == "host":
+        return reverse_host(pattern.lower())
+    if rule_type != "regex":
+        return None
+    canonical, canonical_type, _ = normalize_rule(pattern, rule_type)
+    if canonical_type == "host":
+        return reverse_host(canonical)
+    kind, literal = _literal_shape(canonical)
+    if kind in ("suffix", "substring") and literal.startswith("."):
+        return reverse_host(literal.lower())
+    return None
+
+
+class SQLiteRuleManager(RuleManager):
+    """
+    RuleManager backed by an SQLite database instead of a text file.
+
+    Meant for very large rule sets: rules live in an indexed table (pattern,
+    type/enabled, reversed host), edits are single-row statements, and the
+    database runs in WAL mode so readers are not blocked by a writer. It
+    exposes the same interface as RuleManager, so the CLI, GUI and
+    RuleExporterImporter work with either backend, and it still writes the
+    Burp sync file.
+    """
+
+    def __init__(self, db_file: str = "tls_bypass_rule.db", backup_dir: str = "backups",
+                 import_from: Optional[str] = None):
+        self.import_from = import_from
+        self.conn: Optional[sqlite3.Connection] = None
+        super().__init__(db_file, backup_dir)
+
+    def _open_store(self):
+        """Open the database, creating the schema and importing import_from when it is new."""
+        self.conn = sqlite3.connect(self.rule_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._upgrade_schema()
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', ?)", (self.version,))
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', '0')")
+
+        self._backfill_reversed_hosts()
+
+        if self.import_from and os.path.exists(self.import_from) and not self.count_rules():
+            self.import_text(self.import_from)
+
+    def _upgrade_schema(self):
+        """Rebuild a rules table whose type constraint predates the cidr rule type."""
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'rules'").fetchone()
+        if row is None or _LEGACY_TYPE_CHECK not in row[0]:
+            return
+        # SQLite cannot alter a constraint, so copy the rows into a new table
+        with self.conn:
+            self.conn.execute("ALTER TABLE rules RENAME TO rules_legacy")
+            for index in ("idx_rules_pattern", "idx_rules_type_enabled", "idx_rules_enabled",
+                          "idx_rules_reversed_host"):
+                self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            self.conn.execute("INSERT INTO rules SELECT * FROM rules_legacy")
+            self.conn.execute("DROP TABLE rules_legacy")
+
+    def _backfill_reversed_hosts(self):
+        """Key the regex rules stored before unanchored suffix regexes were indexed; runs once per database."""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'reversed_host_keys'").fetchone():
+            return
+        rows = self.conn.execute("SELECT id, pattern FROM rules WHERE type = 'regex' AND reversed_host IS NULL")
+        updates = [(key, rule_id) for rule_id, pattern in rows
+                   for key in (reversed_host_key(pattern, "regex"),) if key is not None]
+        with self.conn:
+            self.conn.executemany("UPDATE rules SET reversed_host = ? WHERE id = ?", updates)
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('reversed_host_keys', '2')")
+
+    def close(self):
+        """Close the database connection."""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _bump_revision(self):
+        """Record a change; must be called inside the modifying transaction."""
+        self.conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)",
+                          (format_timestamp(),))
+
+    def revision(self) -> int:
+        """Return the change counter, which increases with every modification."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def count_rules(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM rules").fetchone()[0]
+
+    def _sidecar_base(self) -> str:
+        """Keep the extension, so tls_bypass_rule.db never shares files with tls_bypass_rule.txt."""
+        return self.rule_file
+
+    def create_backup(self) -> str:
+        """Copy the database to the backup directory with the SQLite online backup API."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join(self.backup_dir, f"tls_bypass_rule_backup_{timestamp}.db")
+        target = sqlite3.connect(backup_path)
+        try:
+            self.conn.backup(target)
+        finally:
+            target.close()
+        return backup_path
+
+    def migrate_rule_file(self) -> bool:
+        return False
+
+    def compact_journal(self) -> bool:
+        return False
+
+    def content_digest(self) -> str:
+        """Identify the current rule set by database path and revision."""
+        key = f"{os.path.abspath(self.rule_file)}:{self.revision()}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def host_section_digest(self) -> Optional[str]:
+        """Host rules are looked up through the database index; no host table is built."""
+        return None
+
+    def watch_key(self) -> Optional[Tuple]:
+        """The revision counter changes with every write, from any process."""
+        return (self.revision(),)
+
+    def load_sections(self, previous: Optional[Dict[str, Dict]] = None) -> Tuple[Dict[str, Dict], List[str]]:
+        """Reload the rules grouped by type; a section counts as changed when its rules differ."""
+        previous = previous or {}
+        sections = {}
+        for rule in self.iter_rules():
+            sections.setdefault(rule.type, {"digest": None, "rules": []})["rules"].append(rule)
+        changed = []
+        for rule_type in dict.fromkeys(list(sections) + list(previous)):
+            new = [(r.id, r.pattern, r.enabled) for r in sections.get(rule_type, {"rules": []})["rules"]]
+            old = [(r.id, r.pattern, r.enabled) for r in previous.get(rule_type, {"rules": []})["rules"]]
+            if new != old:
+                changed.append(rule_type)
+        return sections, changed
+
+    def iter_rules(self, section: Optional[str] = None, enabled: Optional[bool] = None) -> Iterator[Rule]:
+        """Stream rule records from the database, filtered through its indexes."""
+        clauses = []
+        params: List = []
+        if section is not None:
+            clauses.append("type = ?")
+            params.append(section)
+        if enabled is not None:
+            clauses.append("enabled = ?")
+            params.append(int(enabled))
+        query = "SELECT pattern, type, enabled, id, tags FROM rules"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        for pattern, rule_type, rule_enabled, rule_id, tags in self.conn.execute(query + _ORDER, params):
+            yield Rule(pattern, rule_type, bool(rule_enabled), rule_id, tuple(tags.split(",")) if tags else ())
+
+    def get_rule_table(self) -> RuleTable:
+        """Return the rule set as a RuleTable, cached until the next modification."""
+        key = (self.revision(),)
+        if self._rule_table is None or self._rule_table_key != key:
+            table = RuleTable()
+            for rule in self.iter_rules():
+                table.append(rule.pattern, rule.type, rule.enabled)
+            self._rule_table, self._rule_table_key = table, key
+        return self._rule_table
+
+    def get_rule_stats(self) -> Dict:
+        """Get statistics about the rules with a single aggregate query."""
+        counts = {(rule_type, bool(enabled)): count for rule_type, enabled, count in self.conn.execute(
+            "SELECT type, enabled, COUNT(*) FROM rules GROUP BY type, enabled")}
+        total_hosts = counts.get(("host", True), 0)
+        total_rules = counts.get(("regex", True), 0)
+        total_cidrs = counts.get(("cidr", True), 0)
+        disabled_count = sum(count for (_, enabled), count in counts.items() if not enabled)
+        enabled_count = total_hosts + total_rules + total_cidrs
+
+        return {
+            "total_hosts": total_hosts,
+            "total_rules": total_rules,
+            "total_cidrs": total_cidrs,
+            "total_all": enabled_count + disabled_count,
+            "enabled": enabled_count,
+            "disabled": disabled_count,
+            "file_path": self.rule_file
+        }
+
+    def find_rule_id(self, pattern: str) -> Optional[str]:
+        """Return the id of the first rule (in file order) with this pattern."""
+        row = self.conn.execute("SELECT id FROM rules WHERE pattern = ?" + _ORDER + " LIMIT 1",
+                                (pattern,)).fetchone()
+        return row[0] if row else None
+
+    def find_hosts_under(self, domain: str) -> List[Rule]:
+        """
+        Return the rules covering domain or any of its subdomains.
+
+        Uses a range scan on the reversed-host index, so it stays fast on
+        very large rule sets.
+        """
+        key = reverse_host(domain.lower())
+        rows = self.conn.execute(
+            "SELECT pattern, type, enabled, id, tags FROM rules "
+            "WHERE reversed_host = ? OR (reversed_host >= ? AND reversed_host < ?)" + _ORDER,
+            (key, key + ".", key + "/"))
+        return [Rule(pattern, rule_type, bool(enabled), rule_id, tuple(tags.split(",")) if tags else ())
+                for pattern, rule_type, enabled, rule_id, tags in rows]
+
+    def _insert_rules(self, rules: List[Tuple[str, str, bool]]) -> int:
+        rows = []
+        for pattern, rule_type, enabled in rules:
+            pattern = escape_whitespace(pattern)
+            rows.append((new_rule_id(), pattern, rule_type, int(enabled), reversed_host_key(pattern, rule_type)))
+        with self._journal_lock, self.conn:
+            self.create_backup()
+            self.conn.executemany(
+                "INSERT INTO rules (id, pattern, type, enabled, reversed_host) VALUES (?, ?, ?, ?, ?)", rows)
+            self._bump_revision()
+        self.update_burp_sync()
+        return len(rows)
+
+    def remove_rules(self, rule_ids: Iterable[str]) -> int:
+        with self._journal_lock, self.conn:
+            rule_ids = [rule_id for rule_id in set(rule_ids)
+                        if self.conn.execute("SELECT 1 FROM rules WHERE id = ?", (rule_id,)).fetchone()]
+            if not rule_ids:
+                return 0
+            self.create_backup()
+            removed = self.conn.executemany("DELETE FROM rules WHERE id = ?",
+                                            [(rule_id,) for rule_id in rule_ids]).rowcount
+            self._bump_revision()
+        self.update_burp_sync()
+        return removed
+
+    def toggle_rule(self, pattern: Optional[str] = None, rule_id: Optional[str] = None) -> bool:
+        """Toggle a single rule by id, or the first rule with the given pattern."""
+        if rule_id is None and pattern is not None:
+            rule_id = self.find_rule_id(pattern)
+        if rule_id is None:
+            return False
+        with self._journal_lock, self.conn:
+            if not self.conn.execute("SELECT 1 FROM rules WHERE id = ?", (rule_id,)).fetchone():
+                return False
+            self.create_backup()
+            self.conn.execute("UPDATE rules SET enabled = 1 - enabled WHERE id = ?", (rule_id,))
+            self._bump_revision()
+        self.update_burp_sync()
+        return True
+
+    def import_text(self, path: str) -> int:
+        """
+        Bulk-load a text rule file (v2 or v3) in one transaction.
+
+        Rule ids from the file are kept when they are unique, and every rule
+        is canonicalised as add_rule does. Returns the number of rules
+        imported.
+        """
+        rows = []
+        with self._journal_lock:
+            seen = {row[0] for row in self.conn.execute("SELECT id FROM rules")}
+            with RuleFileReader(path) as reader:
+                for view in reader.iter_views():
+                    rule = view.to_rule()
+                    rule_id = rule.id
+                    while not rule_id or rule_id in seen:
+                        rule_id = new_rule_id()
+                    seen.add(rule_id)
+                    pattern, rule_type = self.normalize_rule(rule.pattern, rule.type)
+                    rows.append((rule_id, pattern, rule_type, int(rule.enabled), ",".join(rule.tags),
+                                 reversed_host_key(pattern, rule_type)))
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT INTO rules (id, pattern, type, enabled, tags, reversed_host) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows)
+                self._bump_revision()
+        self.update_burp_sync()
+        return len(rows)
+
+    def export_text(self, path: str) -> int:
+        """Write the rules as a v3 text rule file. Returns the number of rules written."""
+        count = 0
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(
+                f"# TLS BYPASS RULE FILE\n"
+                f"# Version: {FORMAT_VERSION}.0\n"
+                f"# Last Updated: {format_timestamp()}\n"
+                f"# For authorized security testing only\n"
+            )
+            for marker, section in SECTION_MARKERS.items():
+                f.write(f"\n{marker}\n")
+                for rule in self.iter_rules(section=section):
+                    f.write(format_rule_line(rule.pattern, rule.enabled, rule.id, list(rule.tags)) + "\n")
+                    count += 1
+        os.replace(temp_path, path)
+        return count
+
+
+def open_rule_manager(path: Optional[str] = None, backup_dir: str = "backups") -> RuleManager:
+    """
+    Open the rule store at path, or at $TLS_RULE_STORE when path is None.
+
+    Paths ending in .db, .sqlite or .sqlite3 use the SQLite backend (seeded
+    from tls_bypass_rule.txt when the database is new); anything else is a
+    text rule file.
+    """
+    path = path or os.environ.get(STORE_ENV_VAR) or "tls_bypass_rule.txt"
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SQLiteRuleManager(path, backup_dir, import_from="tls_bypass_rule.txt")
+    return RuleManager(path, backup_dir)
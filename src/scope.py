@@ -0,0 +1,346 @@
+import csv
+import ipaddress
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from cidr import CIDRTable, build_ranges, collapse_networks
+from normalize import normalize_host
+
+
+# Column / key names that carry the scope target in program exports
+# (HackerOne "asset_identifier", Bugcrowd "target", plain lists, ...)
+IDENTIFIER_KEYS = ("asset_identifier", "identifier", "target", "endpoint", "uri", "url", "domain", "host", "name")
+
+# Keys whose false value marks an entry as out of scope
+ELIGIBILITY_KEYS = ("eligible_for_submission", "in_scope", "eligible_for_bounty")
+
+# Number of invalid entries listed in the summary
+MAX_SAMPLES = 20
+
+# Characters read at a time from JSON scope files
+READ_SIZE = 1 << 20
+
+# Characters of a normalised (punycode) host, plus glob wildcards
+_HOST_CHARS = re.compile(r"^[a-z0-9_*.-]+$")
+
+
+class ScopeEntry(NamedTuple):
+    """
+    One classified scope entry.
+
+    kind is "host" (exact hostname or IP), "suffix" (every subdomain of
+    value), "regex" (other wildcard shapes, value is the pattern) or
+    "network" (an IP network, value is its canonical CIDR notation).
+    """
+    kind: str
+    value: str
+    source: str
+
+
+def _iter_json_targets(data) -> Iterator[Optional[str]]:
+    """Walk a JSON document and yield scope targets; None marks out-of-scope entries."""
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, list):
+        for item in data:
+            yield from _iter_json_targets(item)
+    elif isinstance(data, dict):
+        key = next((k for k in IDENTIFIER_KEYS if isinstance(data.get(k), str)), None)
+        if key is not None:
+            if any(data.get(k) is False for k in ELIGIBILITY_KEYS):
+                yield None
+            else:
+                yield data[key]
+            return
+        for value in data.values():
+            if isinstance(value, (list, dict)):
+                yield from _iter_json_targets(value)
+
+
+def _iter_json_values(f) -> Iterator:
+    """
+    Decode the JSON documents in f one value at a time.
+
+    The elements of a top-level array are decoded one by one, so a large
+    program export is never held in memory whole; several documents in a
+    row (one per line) are decoded in turn.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    read_size = READ_SIZE
+    exhausted = False
+    in_array = False
+    while True:
+        while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ",")):
+            position += 1
+        if position < len(buffer) and buffer[position] == "[" and not in_array:
+            in_array = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == "]" and in_array:
+            in_array = False
+            position += 1
+            continue
+        if position < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # A number ending the buffer may continue in the next read
+                if end < len(buffer) or exhausted:
+                    position = end
+                    read_size = READ_SIZE
+                    yield value
+                    continue
+        elif exhausted:
+            if in_array:
+                raise json.JSONDecodeError("Unterminated array", buffer, position)
+            return
+        chunk = f.read(read_size)
+        exhausted = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+        # Grow reads for huge values so decoding stays linear
+        read_size = max(read_size, len(buffer))
+
+
+def _iter_csv_targets(f) -> Iterator[Optional[str]]:
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [name.strip().lower() for name in header]
+    column = next((columns.index(k) for k in IDENTIFIER_KEYS if k in columns), None)
+    eligibility = [columns.index(k) for k in ELIGIBILITY_KEYS if k in columns]
+    if column is None:
+        # No header row; the first column is the target
+        column = 0
+        yield header[0] if header else None
+    for row in reader:
+        if len(row) <= column:
+            continue
+        if any(i < len(row) and row[i].strip().lower() in ("false", "no", "0") for i in eligibility):
+            yield None
+        else:
+            yield row[column]
+
+
+def _iter_text_targets(f) -> Iterator[Optional[str]]:
+    for line in f:
+        line = line.split("#", 1)[0]
+        for token in line.replace(",", " ").split():
+            yield token
+
+
+def iter_scope_targets(path: str) -> Iterator[Optional[str]]:
+    """
+    Yield the raw targets of a scope file, one at a time.
+
+    Plain text (one or more targets per line, "#" comments), CSV with a
+    header row, JSON Lines and JSON program exports are recognised by
+    extension and content. Entries marked as not eligible yield None.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig") as f:
+        if extension == ".csv":
+            yield from _iter_csv_targets(f)
+            return
+        if extension == ".json":
+            for value in _iter_json_values(f):
+                yield from _iter_json_targets(value)
+            return
+        if extension in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield from _iter_json_targets(json.loads(line))
+            return
+        yield from _iter_text_targets(f)
+
+
+def _looks_like_network(target: str) -> bool:
+    head, _, tail = target.partition("/")
+    return tail.isdigit() and (head.replace(".", "").isdigit() or ":" in head)
+
+
+def _wildcard_regex(host: str) -> str:
+    """Translate a glob-style host (api-*.example.com) into an anchored regex."""
+    parts = [part.replace(".", r"\.") for part in host.split("*")]
+    return "^" + "[^.]*".join(parts) + "$"
+
+
+def classify_target(target: str) -> List[ScopeEntry]:
+    """
+    Classify one raw scope target.
+
+    Returns an empty list when the target is not a hostname, IP address,
+    network or IP range.
+    """
+    value = target.strip().lower()
+    if not _looks_like_network(value):
+        # Drops scheme, user info, path and port, and punycode-encodes IDN labels
+        value = normalize_host(target)
+    if not value:
+        return []
+
+    if "-" in value and value.replace("-", "").replace(".", "").replace(":", "").isalnum():
+        # 10.0.0.1-10.0.0.50
+        first, _, last = value.partition("-")
+        try:
+            networks = ipaddress.summarize_address_range(ipaddress.ip_address(first), ipaddress.ip_address(last))
+            return [ScopeEntry("network", str(network), target) for network in networks]
+        except ValueError:
+            pass
+
+    try:
+        if "/" in value:
+            network = ipaddress.ip_network(value, strict=False)
+            if network.num_addresses == 1:
+                return [ScopeEntry("host", str(network.network_address), target)]
+            return [ScopeEntry("network", str(network), target)]
+        return [ScopeEntry("host", str(ipaddress.ip_address(value)), target)]
+    except ValueError:
+        pass
+
+    if not _HOST_CHARS.match(value) or ".." in value or "." not in value.strip("."):
+        # Scope entries are qualified names; bare words are prose or typos
+        return []
+    if "*" not in value:
+        return [ScopeEntry("host", value, target)]
+    if value.startswith("*.") and "*" not in value[2:]:
+        return [ScopeEntry("suffix", value[2:], target)]
+    if value.startswith("*."):
+        # *.api-*.example.com: any subdomain, with a glob inside the name
+        return [ScopeEntry("regex", r"\." + _wildcard_regex(value[2:])[1:], target)]
+    return [ScopeEntry("regex", _wildcard_regex(value), target)]
+
+
+def suffix_regex(domain: str) -> str:
+    """Return the regex matching every subdomain of domain."""
+    return r"\." + domain.replace(".", r"\.") + "$"
+
+
+def _parents(domain: str, include_self: bool) -> Iterator[str]:
+    """Yield domain's parent domains, nearest first (optionally domain itself)."""
+    if include_self:
+        yield domain
+    index = domain.find(".")
+    while index != -1:
+        yield domain[index + 1:]
+        index = domain.find(".", index + 1)
+
+
+def plan_scope_rules(targets: Iterable[Optional[str]], matcher=None,
+                     existing: Iterable[str] = ()) -> Tuple[List[Tuple[str, str, bool]], Dict]:
+    """
+    Turn scope targets into the rules to add.
+
+    Duplicates are dropped, as are entries already covered by a wildcard in
+    the same scope list or, when a matcher of the current rules is given,
+    by an existing enabled rule. Patterns listed in existing (enabled or
+    not) are never added twice.
+
+    Returns:
+        Tuple[List[Tuple[str, str, bool]], Dict]: (pattern, rule_type, enabled) tuples and a summary
+    """
+    summary = {
+        "entries": 0,
+        "out_of_scope": 0,
+        "invalid": 0,
+        "duplicates": 0,
+        "covered": 0,
+        "hosts": 0,
+        "suffixes": 0,
+        "regexes": 0,
+        "cidrs": 0,
+        "invalid_samples": [],
+    }
+
+    # Classify everything first: a wildcard later in the file may cover
+    # hosts listed before it
+    entries: Dict[Tuple[str, str], ScopeEntry] = {}
+    for target in targets:
+        summary["entries"] += 1
+        if target is None:
+            summary["out_of_scope"] += 1
+            continue
+        classified = classify_target(target)
+        if not classified:
+            summary["invalid"] += 1
+            if len(summary["invalid_samples"]) < MAX_SAMPLES:
+                summary["invalid_samples"].append(target)
+            continue
+        for entry in classified:
+            key = (entry.kind, entry.value)
+            if key in entries:
+                summary["duplicates"] += 1
+            else:
+                entries[key] = entry
+
+    suffixes = {value for kind, value in entries if kind == "suffix"}
+    existing_suffixes = matcher.suffixes if matcher is not None else {}
+    # Unanchored suffix rules such as \.example\.com land in the keyword table
+    existing_substrings = {literal for literal, _ in matcher.substrings} if matcher is not None else set()
+
+    # Overlapping and adjacent networks in the list become the fewest CIDRs
+    networks = [value for kind, value in entries if kind == "network"]
+    collapsed = collapse_networks(networks)
+    summary["duplicates"] += len(networks) - len(collapsed)
+    for value in networks:
+        del entries[("network", value)]
+    for value in collapsed:
+        entries[("network", value)] = ScopeEntry("network", value, value)
+    batch_networks = CIDRTable(build_ranges((value, value) for value in collapsed))
+
+    def network_covered(value: str) -> bool:
+        if matcher is None:
+            return False
+        network = ipaddress.ip_network(value)
+        outer = matcher.cidrs.match_address(network.network_address)
+        return outer is not None and outer == matcher.cidrs.match_address(network.broadcast_address)
+
+    def covered(domain: str, include_self: bool) -> bool:
+        for parent in _parents(domain, include_self):
+            if parent != domain and parent in suffixes:
+                return True
+            if "." + parent in existing_suffixes or "." + parent in existing_substrings:
+                return True
+        return False
+
+    existing = set(existing)
+    rules = []
+    for (kind, value), entry in entries.items():
+        # The "Match all subdomains" template form (\.example\.com, once
+        # normalised) is broader, so it counts as a duplicate too
+        if value in existing or (kind == "suffix" and (suffix_regex(value) in existing
+                                                       or suffix_regex(value)[:-1] in existing)):
+            summary["duplicates"] += 1
+            continue
+        if kind == "host":
+            if (covered(value, False) or batch_networks.match(value) is not None
+                    or (matcher is not None and matcher.match(value) is not None)):
+                summary["covered"] += 1
+                continue
+            rules.append((value, "host", True))
+            summary["hosts"] += 1
+        elif kind == "suffix":
+            if covered(value, True):
+                summary["covered"] += 1
+                continue
+            rules.append((suffix_regex(value), "regex", True))
+            summary["suffixes"] += 1
+        elif kind == "regex":
+            rules.append((value, "regex", True))
+            summary["regexes"] += 1
+        else:
+            if network_covered(value):
+                summary["covered"] += 1
+                continue
+            rules.append((value, "cidr", True))
+            summary["cidrs"] += 1
+
+    return rules, summary
@@ -0,0 +1,199 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+from cidr import parse_address
+
+
+# Count-min sketch shape: SKETCH_DEPTH rows of SKETCH_WIDTH 32-bit counters (16 MB)
+SKETCH_WIDTH = 1 << 20
+SKETCH_DEPTH = 4
+
+# Bloom filter used to count each distinct host once (16 MB, ~1% false
+# positives at 10M hosts); a false positive only drops one host from the counts
+SEEN_BITS = 1 << 27
+SEEN_HASHES = 4
+
+# Suffixes tracked by name once their estimate reaches the threshold; past
+# this many the weaker half is dropped (their counts stay in the sketch)
+MAX_CANDIDATES = 100000
+
+# Default number of distinct observed hosts under a suffix before it is proposed
+MIN_SUBDOMAINS = 20
+
+# A suffix is not proposed when one child suffix holds this share of its
+# hosts; the narrower child is proposed instead
+DOMINANT_SHARE = 0.9
+
+# Second-level labels of two-label public suffixes such as co.uk or com.au
+_SHARED_SECOND_LEVEL = {"ac", "co", "com", "edu", "gov", "net", "or", "org"}
+
+# Label put in front of a suffix to ask the matcher whether its subdomains are already covered
+PROBE_LABEL = "suggest-probe-0"
+
+_COUNT = ""
+
+
+def _positions(key: str, size: int, count: int) -> List[int]:
+    """Return count positions in [0, size) for key by double hashing Python's string hash."""
+    first = hash(key)
+    step = (first >> 32) | 1
+    return [(first + i * step) % size for i in range(count)]
+
+
+def is_shared_suffix(domain: str) -> bool:
+    """True for a TLD or a two-label public suffix like co.uk, which must never become a rule."""
+    labels = domain.split(".")
+    if len(labels) < 2:
+        return True
+    return len(labels) == 2 and len(labels[1]) == 2 and labels[0] in _SHARED_SECOND_LEVEL
+
+
+class SuffixSketch:
+    """
+    Counts distinct hosts under every parent domain of a host stream, in bounded memory.
+
+    Each new host (deduplicated through a Bloom filter) increments a
+    count-min sketch once for each of its parent domains, using
+    conservative update so estimates stay close to the true counts. Only
+    parent domains whose estimate reaches min_hosts are kept by name, at
+    most max_candidates of them, so memory is fixed by the sketch and filter
+    sizes however many hostnames are streamed through (10M+).
+    """
+
+    def __init__(self, min_hosts: int = MIN_SUBDOMAINS, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH,
+                 seen_bits: int = SEEN_BITS, max_candidates: int = MAX_CANDIDATES):
+        self.min_hosts = min_hosts
+        self.width = width
+        self.depth = depth
+        self.seen_bits = seen_bits
+        self.max_candidates = max_candidates
+        self._counters = array("I", bytes(4 * width * depth))
+        self._seen = bytearray((seen_bits + 7) // 8)
+        # Estimate needed to become a candidate; raised when candidates are pruned
+        self._admit = min_hosts
+        self.candidates: Dict[str, int] = {}
+        self.hosts = 0
+        self.distinct = 0
+
+    def _first_sighting(self, host: str) -> bool:
+        seen = self._seen
+        new = False
+        for position in _positions(host, self.seen_bits, SEEN_HASHES):
+            bit = 1 << (position & 7)
+            if not seen[position >> 3] & bit:
+                seen[position >> 3] |= bit
+                new = True
+        return new
+
+    def _increment(self, key: str) -> int:
+        """Count key once more (conservative update) and return its new estimate."""
+        counters = self._counters
+        width = self.width
+        cells = [row * width + position for row, position in enumerate(_positions(key, width, self.depth))]
+        estimate = min(counters[cell] for cell in cells) + 1
+        for cell in cells:
+            if counters[cell] < estimate:
+                counters[cell] = estimate
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        """Return the estimated number of distinct hosts under key (never an undercount, bar filter false positives)."""
+        counters = self._counters
+        width = self.width
+        return min(counters[row * width + position]
+                   for row, position in enumerate(_positions(key, width, self.depth)))
+
+    def add(self, host: str):
+        """Count host once under each of its parent domains; IP addresses are ignored."""
+        self.hosts += 1
+        if parse_address(host) is not None or not self._first_sighting(host):
+            return
+        self.distinct += 1
+        index = host.find(".")
+        while index != -1:
+            parent = host[index + 1:]
+            if "." not in parent:
+                break
+            estimate = self._increment(parent)
+            if estimate >= self._admit:
+                self.candidates[parent] = estimate
+            index = host.find(".", index + 1)
+        if len(self.candidates) > self.max_candidates:
+            self._prune()
+
+    def update(self, hosts: Iterable[str]):
+        for host in hosts:
+            self.add(host)
+
+    def _prune(self):
+        counts = sorted(self.candidates.values())
+        self._admit = max(self._admit, counts[len(counts) // 2] + 1)
+        self.candidates = {suffix: count for suffix, count in self.candidates.items() if count >= self._admit}
+
+    def trie(self) -> Dict:
+        """
+        Return the candidates as a reversed-label frequency trie.
+
+        Labels run from the TLD down (com -> example -> api) and each node
+        stores its estimated host count under the "" key.
+        """
+        root: Dict = {}
+        for suffix, count in self.candidates.items():
+            node = root
+            for label in reversed(suffix.split(".")):
+                node = node.setdefault(label, {})
+            node[_COUNT] = count
+        return root
+
+    def clusters(self) -> List[Dict]:
+        """
+        Return the suffixes worth a "Match all subdomains" rule, most hosts first.
+
+        Public suffixes are skipped, and a suffix whose hosts sit almost all
+        (DOMINANT_SHARE) under one child suffix gives way to that child. The
+        result never holds a suffix together with one of its parents.
+        """
+        clusters = []
+
+        def walk(node: Dict, labels: List[str]):
+            children = [(label, child) for label, child in node.items() if label != _COUNT]
+            for label, child in children:
+                walk(child, labels + [label])
+            count = node.get(_COUNT)
+            if count is None or count < self.min_hosts:
+                return
+            domain = ".".join(reversed(labels))
+            if is_shared_suffix(domain):
+                return
+            largest = max((child.get(_COUNT, 0) for _, child in children), default=0)
+            if largest >= DOMINANT_SHARE * count:
+                return
+            clusters.append({"suffix": domain, "observed": count})
+
+        walk(self.trie(), [])
+        clusters.sort(key=lambda cluster: (-cluster["observed"], cluster["suffix"]))
+        chosen: List[Dict] = []
+        taken: Set[str] = set()
+        # Taken suffixes and all their parents
+        covering: Set[str] = set()
+        for cluster in clusters:
+            suffix = cluster["suffix"]
+            parents = parent_domains(suffix)
+            if suffix in covering or any(parent in taken for parent in parents):
+                continue
+            taken.add(suffix)
+            covering.add(suffix)
+            covering.update(parents)
+            chosen.append(cluster)
+        return chosen
+
+
+def parent_domains(domain: str) -> List[str]:
+    """Return domain's parent domains, nearest first."""
+    parts = domain.split(".")
+    return [".".join(parts[i:]) for i in range(1, len(parts))]
+
+
+def covering_rule(matcher, domain: str) -> Optional[str]:
+    """Return the pattern of the enabled rule that already matches the subdomains of domain, or None."""
+    return matcher.match(f"{PROBE_LABEL}.{domain}")
@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Bytes read at a time from HAR files
+READ_SIZE = 1 << 20
+
+# Largest HAR entry (in characters) read whole; a longer one is skipped as malformed
+MAX_ENTRY_SIZE = 1 << 28
+
+# Sidecar layout version
+HITS_VERSION = 1
+
+# Rules listed by name when reporting hot and dead rules
+REPORTED_RULES = 5
+
+_URL = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://[^\s\"'<>/?#]+")
+_CONNECT = re.compile(r"\bCONNECT\s+(\S+)")
+_HAR_ENTRIES = re.compile(r'"entries"\s*:\s*\[')
+_NEXT_OBJECT = re.compile(r",\s*\{")
+# Squid-style epoch seconds, or the [10/Oct/2026:13:55:36 +0000] of the common log format
+_EPOCH = re.compile(r"^(\d{9,10})(?:\.\d+)?\s")
+_CLF_TIME = re.compile(r"\[(\d{2}/\w{3}/\d{4}:\d{2}:\d{2}:\d{2} [+-]\d{4})\]")
+_BURP_TIME_FORMAT = "%a %b %d %H:%M:%S %Z %Y"
+
+
+def extract_host(text: str) -> Optional[str]:
+    """
+    Return the host part of the first URL (or CONNECT target) in text.
+
+    Only the scheme://authority prefix is matched, so no URL is fully
+    parsed; user info and port are left for normalize_host to drop. Text
+    that is a single bare word (a host list line) is returned as is.
+    """
+    match = _URL.search(text)
+    if match is not None:
+        return match.group(0)
+    match = _CONNECT.search(text)
+    if match is not None:
+        return match.group(1)
+    text = text.strip()
+    return text if text and not any(char.isspace() for char in text) else None
+
+
+def _iso(moment: Optional[datetime]) -> Optional[str]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def _har_timestamp(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return _iso(datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+def _log_timestamp(line: str) -> Optional[str]:
+    match = _EPOCH.match(line)
+    if match is not None:
+        return _iso(datetime.fromtimestamp(int(match.group(1)), timezone.utc))
+    match = _CLF_TIME.search(line)
+    if match is not None:
+        try:
+            return _iso(datetime.strptime(match.group(1), "%d/%b/%Y:%H:%M:%S %z"))
+        except ValueError:
+            return None
+    return None
+
+
+def _iter_log(path: str) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.strip():
+                yield extract_host(line), _log_timestamp(line)
+
+
+def _incomplete(error: json.JSONDecodeError) -> bool:
+    """True when a decode error may only mean the value runs past the end of the buffer."""
+    return error.msg.startswith("Unterminated string") or error.pos >= len(error.doc) - 16
+
+
+def _skip_to_next_object(f, buffer: str, position: int) -> Optional[Tuple[str, int]]:
+    """Return (buffer, position) at the next "{" following a comma, reading on as needed; None at end of file."""
+    match = _NEXT_OBJECT.search(buffer, position + 1)
+    while match is None:
+        chunk = f.read(READ_SIZE)
+        if not chunk:
+            return None
+        # Keep a tail in case the separator straddles two reads
+        buffer = buffer[-64:] + chunk
+        match = _NEXT_OBJECT.search(buffer)
+    return buffer, match.end() - 1
+
+
+def _iter_har(path: str) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    """
+    Decode the entries of a HAR file one at a time.
+
+    Only the current entry is held in memory, so multi-GB captures stream
+    through; a truncated capture yields the entries before the cut. A
+    malformed entry (or one over MAX_ENTRY_SIZE) yields (None, None) and
+    decoding resumes at the next entry.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        buffer = ""
+        while True:
+            match = _HAR_ENTRIES.search(buffer)
+            if match is not None:
+                break
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                return
+            # Keep a tail in case the key straddles two reads
+            buffer = buffer[-64:] + chunk
+        buffer = buffer[match.end():]
+        position = 0
+        read_size = READ_SIZE
+        # Set after a malformed entry until the next entry decodes; objects
+        # decoded meanwhile are pieces of the skipped entry
+        skipping = False
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]" and not skipping:
+                return
+            try:
+                entry, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                if position == len(buffer) or (_incomplete(error) and len(buffer) - position < MAX_ENTRY_SIZE):
+                    chunk = f.read(read_size)
+                    if not chunk:
+                        return
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    # Grow reads for huge entries so decoding stays linear
+                    read_size = max(read_size, len(buffer))
+                    continue
+                if not skipping:
+                    skipping = True
+                    yield None, None
+                resumed = _skip_to_next_object(f, buffer, position)
+                if resumed is None:
+                    return
+                buffer, position = resumed
+                read_size = READ_SIZE
+                continue
+            read_size = READ_SIZE
+            if not isinstance(entry, dict) or (skipping and "request" not in entry):
+                continue
+            skipping = False
+            request = entry.get("request") or {}
+            url = request.get("url") if isinstance(request, dict) else None
+            yield (extract_host(url) if isinstance(url, str) else None), _har_timestamp(entry.get("startedDateTime"))
+
+
+def _iter_burp_xml(path: str) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    """
+    Stream the <item> elements of a Burp "Save items" XML export.
+
+    Each item is detached from its parent once read, so the tree never
+    grows past the item being parsed.
+    """
+    # Open elements, outermost first
+    parents = []
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag != "item":
+            continue
+        host = element.findtext("host") or extract_host(element.findtext("url") or "")
+        timestamp = None
+        text = element.findtext("time")
+        if text:
+            try:
+                timestamp = _iso(datetime.strptime(text.strip(), _BURP_TIME_FORMAT))
+            except ValueError:
+                pass
+        if parents:
+            parents[-1].remove(element)
+        yield host, timestamp
+
+
+def iter_traffic(path: str) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    """
+    Yield (raw host, ISO timestamp) for every request in a traffic capture.
+
+    HAR files (.har) are decoded entry by entry, Burp XML exports (.xml)
+    item by item, and anything else is read as a proxy access log, URL
+    list or host list, one request per line. The host is None for
+    requests without a recognisable URL and the timestamp None when the
+    format has none.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".har":
+        return _iter_har(path)
+    if extension == ".xml":
+        return _iter_burp_xml(path)
+    return _iter_log(path)
+
+
+def load_hits(path: str) -> Dict:
+    """Return the hit counters in a sidecar file, or empty counters if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == HITS_VERSION:
+            # Measured regex costs (microseconds per search), by rule pattern
+            data.setdefault("costs", {})
+            return data
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {"version": HITS_VERSION, "updated": None, "requests": 0, "unmatched": 0, "rules": {}, "costs": {}}
+
+
+def save_hits(path: str, data: Dict):
+    """Write the hit counters atomically."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def record_hit(data: Dict, pattern: str, timestamp: Optional[str]):
+    """Count one request matched by pattern, keeping the latest timestamp seen."""
+    entry = data["rules"].get(pattern)
+    if entry is None:
+        entry = data["rules"][pattern] = {"hits": 0, "last_seen": None}
+    entry["hits"] += 1
+    if timestamp is not None and (entry["last_seen"] is None or timestamp > entry["last_seen"]):
+        entry["last_seen"] = timestamp
+
+
+def now_iso() -> str:
+    return _iso(datetime.now(timezone.utc))
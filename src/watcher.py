@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class RuleFileWatcher:
+    """
+    Notices external edits to a rule store (git pull, a text editor, another
+    tool) and reloads it.
+
+    The store is polled through RuleManager.watch_key(), which only stats
+    the files. A change is processed once the fingerprint has been stable
+    for ``debounce`` seconds, so an editor's burst of writes triggers a
+    single reload. Only the sections whose bytes changed are re-parsed,
+    then the Burp sync file is regenerated and ``callback(rules, changed)``
+    is called.
+    """
+
+    def __init__(self, rule_manager, callback: Optional[Callable[[List, List[str]], None]] = None,
+                 interval: float = 0.5, debounce: float = 0.3, sync: bool = True):
+        self.rule_manager = rule_manager
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.sync = sync
+        self.sections: Dict[str, Dict] = {}
+        self.reloads = 0
+        self._key = None
+        self._changed_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def rules(self) -> List:
+        """All rules from the last reload, in file order."""
+        return [rule for section in self.sections.values() for rule in section["rules"]]
+
+    def start(self):
+        """Take the initial snapshot and start polling in a daemon thread."""
+        self._key = self.rule_manager.watch_key()
+        self.sections, _ = self.rule_manager.load_sections()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rule-file-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error reloading rule file: {e}")
+
+    def check(self) -> bool:
+        """
+        Run one polling step.
+
+        Returns:
+            bool: True if a change was processed
+        """
+        now = time.monotonic()
+        key = self.rule_manager.watch_key()
+        if key != self._key:
+            # Still changing (or missing mid-save); wait for it to settle
+            self._key = key
+            self._changed_at = now
+            return False
+        if self._changed_at is None or key is None or now - self._changed_at < self.debounce:
+            return False
+
+        self._changed_at = None
+        self.sections, changed = self.rule_manager.load_sections(self.sections)
+        if not changed:
+            return False
+
+        self.reloads += 1
+        rules = self.rules
+        if self.sync:
+            self.rule_manager.update_burp_sync(rules)
+        if self.callback is not None:
+            self.callback(rules, changed)
+        return True
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from rules import RuleManager  # noqa: E402
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A RuleManager on an empty rule file in tmp_path (the Burp sync file is written to the cwd)."""
+    monkeypatch.chdir(tmp_path)
+    return RuleManager(str(tmp_path / "rules.txt"), str(tmp_path / "backups"))
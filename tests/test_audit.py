@@ -0,0 +1,52 @@
+from audit import audit_rules
+from matcher import RuleMatcher
+
+
+def _audit(rules, hosts):
+    matcher = RuleMatcher.from_rules([{"pattern": pattern, "type": rule_type, "enabled": True}
+                                      for pattern, rule_type in rules])
+    return audit_rules(matcher, rules, hosts)
+
+
+def _subsumed(report):
+    return {entry["pattern"]: entry["covered_by"] for entry in report["subsumed"]}
+
+
+def test_coverage_unused_and_unmatched():
+    report = _audit([("a.example.com", "host"), ("never.test", "host"), (r"^api\d+\.", "regex")],
+                    ["a.example.com", "api1.example.com", "other.net"])
+    assert report["hosts"] == 3
+    assert report["matched"] == 2
+    assert report["unmatched_samples"] == ["other.net"]
+    assert report["unused"] == ["never.test"]
+    assert [rule["coverage"] for rule in report["rules"]] == [1, 0, 1]
+
+
+def test_duplicate_host_rules_are_subsumed_not_unused():
+    report = _audit([("a.example.com", "host"), (r"^a\.example\.com$", "regex")], ["a.example.com"])
+    assert report["unused"] == []
+    assert _subsumed(report) == {"a.example.com": [r"^a\.example\.com$"],
+                                 r"^a\.example\.com$": ["a.example.com"]}
+
+
+def test_duplicate_suffix_rules_are_subsumed_not_unused():
+    report = _audit([(r"\.x\.org$", "regex"), (r".*\.x\.org$", "regex")], ["a.x.org", "b.x.org"])
+    assert report["unused"] == []
+    assert [rule["coverage"] for rule in report["rules"]] == [2, 2]
+    assert _subsumed(report)[r".*\.x\.org$"] == [r"\.x\.org$"]
+
+
+def test_nested_cidr_is_subsumed_not_unused():
+    report = _audit([("10.0.0.0/8", "cidr"), ("10.1.0.0/16", "cidr"), ("10.1.2.0/24", "cidr")],
+                    ["10.1.2.3", "10.1.9.9", "10.9.9.9"])
+    assert report["unused"] == []
+    assert [rule["coverage"] for rule in report["rules"]] == [3, 2, 1]
+    subsumed = _subsumed(report)
+    assert subsumed["10.1.0.0/16"] == ["10.0.0.0/8"]
+    assert sorted(subsumed["10.1.2.0/24"]) == ["10.0.0.0/8", "10.1.0.0/16"]
+
+
+def test_overlapping_pairs_are_counted():
+    report = _audit([(r"\.example\.com$", "regex"), (r"^api\.", "regex")],
+                    ["api.example.com", "www.example.com", "api.other.net"])
+    assert report["overlaps"] == [{"rules": (r"\.example\.com$", r"^api\."), "hosts": 1}]
@@ -0,0 +1,104 @@
+import random
+import re
+
+from dfa import HostDFA
+from matcher import RuleMatcher
+
+
+PATTERNS = [
+    r"^ads?\.",
+    r"track(er|ing)",
+    r"\.doubleclick\.net$",
+    r"^[a-z]+\d{2,3}\.cdn\.",
+    r"^(a|b)*c$",
+    r"(ab){2}x",
+    r"^[^.]*\.example\.com$",
+    r"-metrics-[0-9]+\.",
+    r"^\d+\.\d+\.\d+\.\d+$",
+    r"^$",
+    r"x?y{0,2}z\.",
+    r"\.(com|net)$",
+    r"^api-[a-f0-9]{4}\.",
+    r"[^a-z]",
+    r"\w\W",
+]
+
+# Outside what the DFA expresses, so matched with re by the caller
+UNSUPPORTED = [r"(a)\1", r"ads(?=\.)", r"\bcdn", r"(?i)ADS"]
+
+HOSTS = [
+    "",
+    "ad.example.com",
+    "ads.example.com",
+    "bad.example.com",
+    "tracker.io",
+    "mytracking.example.org",
+    "ad.doubleclick.net",
+    "doubleclick.net.evil",
+    "img12.cdn.example.com",
+    "img1234.cdn.example.com",
+    "ababc",
+    "c",
+    "xababx.org",
+    "www.example.com",
+    "a.b.example.com",
+    "app-metrics-42.example.com",
+    "10.0.0.1",
+    "10.0.0.1.nip.io",
+    "yyz.example.com",
+    "api-beef.example.com",
+    "api-beeg.example.com",
+    "aa.ads.aa",
+    "host-with_underscore.com",
+]
+
+
+def _random_hosts(count, seed=1):
+    rng = random.Random(seed)
+    alphabet = "abcdxyz0123.-"
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 14))) for _ in range(count)]
+
+
+def _expected(patterns, host):
+    return [index for index, pattern in enumerate(patterns) if re.search(pattern, host)]
+
+
+def test_search_agrees_with_re():
+    dfa = HostDFA(PATTERNS)
+    assert dfa.unsupported == []
+    for host in HOSTS + _random_hosts(2000):
+        if "_" in host:
+            continue
+        assert dfa.search(host) == _expected(PATTERNS, host), host
+
+
+def test_agrees_with_re_across_cache_flushes():
+    dfa = HostDFA(PATTERNS, max_states=8)
+    for host in HOSTS + _random_hosts(500, seed=2):
+        if "_" in host:
+            continue
+        assert dfa.search(host) == _expected(PATTERNS, host), host
+    assert dfa.flushes > 0
+    assert len(dfa) <= 8 + 1
+
+
+def test_unsupported_rules_are_listed_not_compiled():
+    dfa = HostDFA(UNSUPPORTED + [r"^ads\."])
+    assert dfa.unsupported == [0, 1, 2, 3]
+    assert dfa.supported == [4]
+    assert dfa.search("ads.example.com") == [4]
+
+
+def test_hosts_outside_the_alphabet_are_left_to_re():
+    assert HostDFA(PATTERNS).search("host-with_underscore.com") is None
+
+
+def test_matcher_engines_agree():
+    patterns = PATTERNS + UNSUPPORTED
+    rules = [{"pattern": pattern, "type": "regex", "enabled": True} for pattern in patterns]
+    by_re = RuleMatcher.from_rules(rules, regex_engine="re")
+    by_dfa = RuleMatcher.from_rules(rules, regex_engine="dfa")
+    assert by_dfa.dfa is not None
+    for host in HOSTS + _random_hosts(1000, seed=3):
+        assert by_dfa.match_all(host) == by_re.match_all(host), host
+        assert by_dfa.match(host) == by_re.match(host), host
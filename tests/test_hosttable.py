@@ -0,0 +1,94 @@
+import pytest
+
+import rules
+from hosttable import HostTable, build_host_table
+
+
+DIGEST = "0" * 32
+
+
+def _hosts(count):
+    return [f"host{index}.example.com" for index in range(count)]
+
+
+@pytest.fixture
+def table(tmp_path):
+    path = str(tmp_path / "rules.hosts")
+    # Small runs, with every host listed twice, exercise the merge and its de-duplication
+    build_host_table(path, _hosts(500) + _hosts(500)[::-1], DIGEST, run_size=64)
+    table = HostTable(path, DIGEST)
+    yield table
+    table.close()
+
+
+def test_build_drops_duplicates_across_runs(tmp_path):
+    path = str(tmp_path / "rules.hosts")
+    assert build_host_table(path, _hosts(500) * 3, DIGEST, run_size=64) == 500
+    assert build_host_table(path, ["b.com", "a.com", "b.com"], DIGEST) == 2
+
+
+def test_lookup(table):
+    assert len(table) == 500
+    for host in _hosts(500):
+        assert host in table
+        assert table.get(host) == host
+    for host in ("host500.example.com", "host1.example.co", "", "a.host1.example.com", "zzz"):
+        assert host not in table
+        assert table.get(host) is None
+
+
+def test_bloom_filter_answers_most_misses(table):
+    misses = [f"other{index}.example.net" for index in range(1000)]
+    assert not any(host in table for host in misses)
+    stats = table.stats()
+    assert stats["hosts"] == 500
+    assert stats["lookups"] == 1000
+    # Sized for ~1% false positives
+    assert stats["bloom_rejections"] >= 950
+    assert stats["bloom_bits"] >= 500 * 10
+
+
+def test_empty_table(tmp_path):
+    path = str(tmp_path / "rules.hosts")
+    assert build_host_table(path, [], DIGEST) == 0
+    table = HostTable(path, DIGEST)
+    try:
+        assert "a.com" not in table
+        assert len(table) == 0
+    finally:
+        table.close()
+
+
+def test_stale_or_corrupt_tables_are_rejected(tmp_path):
+    path = tmp_path / "rules.hosts"
+    build_host_table(str(path), _hosts(10), DIGEST)
+    assert HostTable.open(str(path), "1" * 32) is None
+    with pytest.raises(ValueError):
+        HostTable(str(path), "1" * 32)
+
+    path.write_bytes(path.read_bytes()[:-3])
+    assert HostTable.open(str(path), DIGEST) is None
+    assert HostTable.open(str(tmp_path / "missing.hosts"), DIGEST) is None
+
+
+def test_manager_serves_large_host_sections_from_the_table(manager, monkeypatch):
+    monkeypatch.setattr(rules, "HOST_TABLE_MIN_BYTES", 1)
+    manager.add_rules([(host, "host", True) for host in _hosts(50)] + [(r"^ads\.", "regex", True)])
+    manager.toggle_rule(rule_id=manager.find_rule_id("host7.example.com"))
+
+    matcher = manager.load_matcher()
+    assert matcher.host_table is not None
+    assert matcher.hosts == {}
+    assert len(matcher.host_table) == 49
+    assert matcher.match("host3.example.com") == "host3.example.com"
+    assert matcher.match("host7.example.com") is None
+    assert matcher.match("ads.example.com") == r"^ads\."
+
+    # Edits outside the hosts section keep the table
+    table = matcher.host_table
+    manager.add_rule("10.0.0.0/8", "cidr")
+    assert manager.load_matcher().host_table is table
+
+    manager.add_rule("new.example.com", "host")
+    assert manager.load_matcher().match("new.example.com") == "new.example.com"
+    manager._release_host_table()
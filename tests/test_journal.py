@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from journal import RuleJournal
+from rules import RuleManager
+
+
+@pytest.fixture
+def journaled(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = RuleManager(str(tmp_path / "rules.txt"), str(tmp_path / "backups"), journaled=True,
+                          compact_interval=3600)
+    yield manager
+    manager.stop_compactor(compact=False)
+
+
+def _rules(manager):
+    return [(rule.pattern, rule.type, rule.enabled) for rule in manager.iter_rules()]
+
+
+def test_edits_go_to_the_journal_not_the_rule_file(tmp_path, journaled):
+    rule_file = tmp_path / "rules.txt"
+    before = rule_file.read_bytes()
+    journaled.add_rule("a.example.com", "host")
+    journaled.add_rule(r"\.example\.org$", "regex")
+    rule_id = journaled.find_rule_id("a.example.com")
+    assert journaled.toggle_rule(rule_id=rule_id)
+
+    assert rule_file.read_bytes() == before
+    assert len(journaled.journal) == 3
+    assert _rules(journaled) == [("a.example.com", "host", False), (r"\.example\.org$", "regex", True)]
+
+
+def test_another_manager_replays_the_journal(tmp_path, journaled):
+    journaled.add_rule("a.example.com", "host")
+    journaled.add_rule("b.example.com", "host")
+    journaled.remove_rule(rule_id=journaled.find_rule_id("b.example.com"))
+
+    reader = RuleManager(str(tmp_path / "rules.txt"), str(tmp_path / "backups"), journaled=True,
+                         compact_interval=3600)
+    try:
+        assert _rules(reader) == [("a.example.com", "host", True)]
+    finally:
+        reader.stop_compactor(compact=False)
+
+
+def test_compaction_folds_records_into_the_rule_file(tmp_path, journaled):
+    journaled.add_rule("a.example.com", "host")
+    journaled.add_rule("b.example.com", "host")
+    journaled.toggle_rule(rule_id=journaled.find_rule_id("a.example.com"))
+    journaled.remove_rule(rule_id=journaled.find_rule_id("b.example.com"))
+    expected = _rules(journaled)
+    ids = [rule.id for rule in journaled.iter_rules()]
+
+    assert journaled.compact_journal()
+    assert len(journaled.journal) == 0
+    assert not journaled.compact_journal()
+    assert _rules(journaled) == expected
+    assert [rule.id for rule in journaled.iter_rules()] == ids
+    assert "a.example.com" in (tmp_path / "rules.txt").read_text(encoding="utf-8")
+
+
+def test_replaying_folded_records_is_harmless(tmp_path, journaled):
+    journaled.add_rule("a.example.com", "host")
+    journal_path = tmp_path / "rules.journal"
+    records = journal_path.read_bytes()
+    journaled.compact_journal()
+    expected = _rules(journaled)
+
+    # A crash between swapping in the rule file and clearing the journal
+    journal_path.write_bytes(records)
+    assert _rules(journaled) == expected
+    journaled.compact_journal()
+    assert _rules(journaled) == expected
+
+
+def test_partial_last_record_waits_for_the_rest(tmp_path):
+    path = tmp_path / "rules.journal"
+    record = json.dumps({"op": "add", "id": "abcd1234", "pattern": "a.example.com", "type": "host",
+                         "enabled": True})
+    path.write_text(record[:20], encoding="utf-8")
+    journal = RuleJournal(str(path))
+    journal.refresh()
+    assert len(journal) == 0
+    path.write_text(record + "\n", encoding="utf-8")
+    journal.refresh()
+    assert len(journal) == 1
+    assert journal.state("abcd1234") is True
+
+
+def test_plain_manager_folds_a_leftover_journal(tmp_path, journaled):
+    journaled.add_rule("a.example.com", "host")
+    plain = RuleManager(str(tmp_path / "rules.txt"), str(tmp_path / "backups"))
+    assert not (tmp_path / "rules.journal").exists() or not (tmp_path / "rules.journal").stat().st_size
+    assert _rules(plain) == [("a.example.com", "host", True)]
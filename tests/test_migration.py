@@ -0,0 +1,60 @@
+import os
+
+from rulefile import FORMAT_VERSION, RuleFileReader, detect_format_version
+from rules import RuleManager
+
+
+V2_FILE = """# TLS BYPASS RULE FILE
+# Version: 2.0
+# Last Updated: 2024-01-01 00:00:00
+# For authorized security testing only
+
+[BLOCK_HOSTS]
+api.example.com
+#DISABLED old.example.com
+# a real comment
+
+[BLOCK_RULES]
+.*\\.example\\.org
+#DISABLED ^legacy\\.
+"""
+
+
+def _open_v2(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "rules.txt"
+    path.write_text(V2_FILE, encoding="utf-8")
+    return RuleManager(str(path), str(tmp_path / "backups"))
+
+
+def _rules(manager):
+    return [(rule.pattern, rule.type, rule.enabled) for rule in manager.iter_rules()]
+
+
+def test_v2_file_is_migrated_on_open(tmp_path, monkeypatch):
+    manager = _open_v2(tmp_path, monkeypatch)
+    assert manager.get_format_version() == FORMAT_VERSION
+    # Disabled hosts stay hosts instead of being re-typed by their content
+    assert _rules(manager) == [
+        ("api.example.com", "host", True),
+        ("old.example.com", "host", False),
+        (".*\\.example\\.org", "regex", True),
+        ("^legacy\\.", "regex", False),
+    ]
+    text = (tmp_path / "rules.txt").read_text(encoding="utf-8")
+    assert "# a real comment" in text
+    assert os.listdir(tmp_path / "backups")
+
+
+def test_migrated_rules_have_unique_ids(tmp_path, monkeypatch):
+    manager = _open_v2(tmp_path, monkeypatch)
+    ids = [rule.id for rule in manager.iter_rules()]
+    assert all(ids) and len(set(ids)) == len(ids)
+
+
+def test_reader_detects_versions(tmp_path):
+    assert detect_format_version(V2_FILE.encode("utf-8")) == 2
+    path = tmp_path / "v2.txt"
+    path.write_text(V2_FILE, encoding="utf-8")
+    with RuleFileReader(str(path)) as reader:
+        assert reader.format_version == 2
@@ -0,0 +1,68 @@
+import pytest
+
+from normalize import normalize_host, normalize_rule, regex_to_host
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r".*\.example\.com", r"\.example\.com"),
+    (r"^.*\.example\.com", r"\.example\.com"),
+    (r".*?\.example\.com.*", r"\.example\.com"),
+    (r"\.example\.com.*$", r"\.example\.com"),
+    # Anchors are never added or dropped
+    (r"\.example\.com$", r"\.example\.com$"),
+    # An escaped dot followed by * is a repeat of the dot, not a wildcard
+    (r"api\.*", r"api\.*"),
+    (r".*", ".*"),
+])
+def test_redundant_wildcards(pattern, expected):
+    assert normalize_rule(pattern, "regex")[0] == expected
+
+
+def test_double_escapes_are_collapsed():
+    pattern, rule_type, changes = normalize_rule(r".*\\.mozilla\\.org", "regex")
+    assert (pattern, rule_type) == (r"\.mozilla\.org", "regex")
+    assert any("double-escaped" in change for change in changes)
+
+
+def test_exact_match_regex_becomes_host():
+    assert normalize_rule(r"^API\.Example\.com$", "regex")[:2] == ("api.example.com", "host")
+    assert normalize_rule(r"^(?:api)\.example\.com$", "regex")[:2] == ("api.example.com", "host")
+    assert normalize_rule(r"^api\.example\.com", "regex")[1] == "regex"
+
+
+@pytest.mark.parametrize("pattern, expected", [
+    (r"^API\.X\.com\D", r"^api\.x\.com\D"),
+    (r"\.Foo[^A-Z]\.COM$", r"\.foo[^A-Z]\.com$"),
+    (r"[]A]B", r"[]A]b"),
+    (r"[^]A]B", r"[^]A]b"),
+    (r"[A\]B]C", r"[A\]B]c"),
+])
+def test_lowercasing_leaves_escapes_and_classes_alone(pattern, expected):
+    assert normalize_rule(pattern, "regex")[0] == expected
+
+
+def test_invalid_regex_is_left_alone():
+    assert normalize_rule("(unclosed", "regex") == ("(unclosed", "regex", [])
+
+
+def test_cidr_host_bits_are_cleared():
+    assert normalize_rule("10.1.2.3/8", "cidr")[0] == "10.0.0.0/8"
+    assert normalize_rule("2001:DB8::1/32", "cidr")[0] == "2001:db8::/32"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Mail.Google.com.", "mail.google.com"),
+    ("https://user@API.example.com:8443/path?q=1", "api.example.com"),
+    ("[2001:db8::1]:443", "2001:db8::1"),
+    ("2001:db8::1", "2001:db8::1"),
+    ("Bücher.example", "xn--bcher-kva.example"),
+    ("  spaced.example.com  ", "spaced.example.com"),
+])
+def test_normalize_host(raw, expected):
+    assert normalize_host(raw) == expected
+
+
+def test_regex_to_host():
+    assert regex_to_host(r"^api\.example\.com$") == "api.example.com"
+    assert regex_to_host(r"^api\.example\.com") is None
+    assert regex_to_host(r"^api.example\.com$") is None
@@ -0,0 +1,53 @@
+import pytest
+
+import regex_safety
+from regex_safety import analyze_regex, static_analysis
+
+
+@pytest.mark.parametrize("pattern", [r"(a+)+$", r"^(a|a)*$", r"^(a*)*b$", r"^(\w+\s?)*$"])
+def test_catastrophic_patterns_are_rejected(pattern):
+    report = analyze_regex(pattern)
+    assert not report["valid"]
+    assert report["error"].startswith("catastrophic backtracking")
+
+
+@pytest.mark.parametrize("pattern", [r"\.example\.com$", r"^api-[^.]*\.example\.com$", r"^(\d+\.){3}\d+$",
+                                     r"(\.[a-z]+)+$"])
+def test_safe_patterns_pass(pattern):
+    report = analyze_regex(pattern)
+    assert report["valid"]
+    assert report["risk"] == "low"
+
+
+def test_low_risk_patterns_are_not_fuzzed(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("fuzzed a pattern without a static hazard")
+    monkeypatch.setattr(regex_safety, "fuzz_regex", fail)
+    assert analyze_regex(r"\.example\.com$")["valid"]
+
+
+def test_slow_sample_alone_does_not_reject(monkeypatch):
+    # A loaded machine: every sample is slow, but time does not grow with length
+    monkeypatch.setattr(regex_safety, "_time_search", lambda compiled, text, budget: 1.0)
+    report = analyze_regex(r"^([a-z0-9-]+\.)*example\.com$")
+    assert report["valid"]
+    assert any("took" in issue for issue in report["issues"])
+
+
+def test_invalid_regex():
+    report = analyze_regex("(unclosed")
+    assert not report["valid"]
+    assert report["cost"] == float("inf")
+
+
+@pytest.mark.parametrize("pattern, risk", [
+    (r"(.*a){12}", "high"),
+    (r"^(.*,){6}x", "high"),
+    (r"(.*a){2}", "medium"),
+    (r"^(\d{1,3}\.){3}\d{1,3}$", "low"),
+    (r"^(a|a)*$", "high"),
+    (r"^(ab|a)*b$", "low"),
+    (r"^(a|aa)*$", "medium"),
+])
+def test_static_risk(pattern, risk):
+    assert static_analysis(pattern)["risk"] == risk
@@ -0,0 +1,63 @@
+from rules import RuleManager
+
+
+V2_FILE = """# TLS BYPASS RULE FILE
+# Version: 2.0
+# Last Updated: 2024-01-01 00:00:00
+# For authorized security testing only
+
+[BLOCK_HOSTS]
+api.example.com
+#DISABLED old.example.com
+# a real comment
+
+[BLOCK_RULES]
+.*\\.example\\.org
+#DISABLED ^legacy\\.
+"""
+
+
+def _open_v2(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "rules.txt"
+    path.write_text(V2_FILE, encoding="utf-8")
+    return RuleManager(str(path), str(tmp_path / "backups"))
+
+
+def _rules(manager):
+    return [(rule.pattern, rule.type, rule.enabled) for rule in manager.iter_rules()]
+
+
+def test_id_edits_rewrite_only_their_rule(tmp_path, monkeypatch):
+    manager = _open_v2(tmp_path, monkeypatch)
+    before = {rule.pattern: rule.id for rule in manager.iter_rules()}
+
+    assert manager.toggle_rule(rule_id=before["old.example.com"])
+    assert manager.remove_rule(rule_id=before["api.example.com"])
+    assert not manager.toggle_rule(rule_id="missing")
+    assert not manager.remove_rule(rule_id="missing")
+
+    after = {rule.pattern: (rule.id, rule.enabled) for rule in manager.iter_rules()}
+    assert "api.example.com" not in after
+    assert after["old.example.com"] == (before["old.example.com"], True)
+    assert after[".*\\.example\\.org"] == (before[".*\\.example\\.org"], True)
+
+
+def test_toggle_keeps_file_size_and_header_width(tmp_path, monkeypatch):
+    manager = _open_v2(tmp_path, monkeypatch)
+    path = tmp_path / "rules.txt"
+    size = path.stat().st_size
+    manager.toggle_rule(pattern="^legacy\\.")
+    assert path.stat().st_size == size
+    assert ("^legacy\\.", "regex", True) in _rules(manager)
+
+
+def test_hand_written_rules_get_ids_before_edits(tmp_path, monkeypatch):
+    manager = _open_v2(tmp_path, monkeypatch)
+    path = tmp_path / "rules.txt"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n[BLOCK_HOSTS]\nhand.example.com\n")
+    rule_id = manager.find_rule_id("hand.example.com")
+    assert rule_id
+    assert manager.toggle_rule(rule_id=rule_id)
+    assert ("hand.example.com", "host", False) in _rules(manager)
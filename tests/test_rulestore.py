@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from rules import RuleManager
+from rulestore import SQLiteRuleManager, reversed_host_key
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manager = SQLiteRuleManager(str(tmp_path / "tls_bypass_rule.db"), str(tmp_path / "backups"))
+    yield manager
+    manager.close()
+
+
+def test_sidecar_files_do_not_collide_with_text_store(tmp_path, store):
+    text = RuleManager(str(tmp_path / "tls_bypass_rule.txt"), str(tmp_path / "backups"))
+    for name in ("compiled_file", "hits_file", "host_table_file"):
+        assert getattr(store, name) != getattr(text, name)
+        assert getattr(store, name).startswith(store.rule_file)
+    assert store.journal.path != text.journal.path
+
+
+@pytest.mark.parametrize("pattern", [r"\.example\.com$", r"\.example\.com", r".*\.example\.com"])
+def test_suffix_regex_forms_share_a_reversed_host_key(pattern):
+    assert reversed_host_key(pattern, "regex") == "com.example"
+
+
+def test_find_hosts_under(store):
+    store.add_rules([("api.example.com", "host", True), (r"\.example\.com", "regex", True),
+                     ("example.org", "host", True), (r"^api\d+\.", "regex", True)])
+    assert sorted(rule.pattern for rule in store.find_hosts_under("example.com")) == \
+        [r"\.example\.com", "api.example.com"]
+
+
+def test_edits_take_backups(tmp_path, store):
+    store.add_rule("a.example.com", "host")
+    rule_id = store.find_rule_id("a.example.com")
+    backups = tmp_path / "backups"
+    for name in os.listdir(backups):
+        os.remove(backups / name)
+
+    assert not store.toggle_rule(rule_id="missing")
+    assert not os.listdir(backups)
+    assert store.toggle_rule(rule_id=rule_id)
+    assert os.listdir(backups)
+    assert [rule.enabled for rule in store.iter_rules()] == [False]
+
+    for name in os.listdir(backups):
+        os.remove(backups / name)
+    assert store.remove_rules(["missing"]) == 0
+    assert not os.listdir(backups)
+    assert store.remove_rules([rule_id, "missing"]) == 1
+    assert os.listdir(backups)
+
+
+def test_import_text_normalises(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "source.txt"
+    source.write_text("[BLOCK_HOSTS]\nA.Example.com\n[BLOCK_RULES]\n.*\\.Example\\.org\n^X\\.y\\.com$\n",
+                      encoding="utf-8")
+    store = SQLiteRuleManager(str(tmp_path / "rules.db"), str(tmp_path / "backups"), import_from=str(source))
+    try:
+        assert sorted((rule.pattern, rule.type) for rule in store.iter_rules()) == \
+            [(r"\.example\.org", "regex"), ("a.example.com", "host"), ("x.y.com", "host")]
+    finally:
+        store.close()
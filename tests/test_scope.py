@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+import scope
+from matcher import RuleMatcher
+from scope import ScopeEntry, classify_target, iter_scope_targets, plan_scope_rules
+
+
+@pytest.mark.parametrize("target, expected", [
+    ("Example.COM.", [("host", "example.com")]),
+    ("https://user@api.example.com:8443/v1?x=1", [("host", "api.example.com")]),
+    ("bücher.example", [("host", "xn--bcher-kva.example")]),
+    ("*.example.com", [("suffix", "example.com")]),
+    ("api-*.example.com", [("regex", r"^api-[^.]*\.example\.com$")]),
+    ("*.api-*.example.com", [("regex", r"\.api-[^.]*\.example\.com$")]),
+    ("10.1.2.3", [("host", "10.1.2.3")]),
+    ("10.1.2.3/32", [("host", "10.1.2.3")]),
+    ("10.1.2.3/24", [("network", "10.1.2.0/24")]),
+    ("2001:db8::/32", [("network", "2001:db8::/32")]),
+    ("10.0.0.0-10.0.0.5", [("network", "10.0.0.0/30"), ("network", "10.0.0.4/31")]),
+    ("localhost", []),
+    ("a..example.com", []),
+    ("see our policy", []),
+    ("", []),
+])
+def test_classify_target(target, expected):
+    assert [(entry.kind, entry.value) for entry in classify_target(target)] == expected
+
+
+def test_classify_target_keeps_the_source():
+    assert classify_target(" *.Example.com ") == [ScopeEntry("suffix", "example.com", " *.Example.com ")]
+
+
+def test_plan_drops_duplicates_and_covered_entries():
+    targets = [
+        "a.example.com",       # covered by the wildcard listed later
+        "example.com",         # the wildcard does not cover its own apex
+        "*.example.com",
+        "*.api.example.com",   # covered by *.example.com
+        "Example.com",         # duplicate
+        "other.org",
+        None,                  # out of scope
+        "not a target",
+        "10.0.0.0/25",
+        "10.0.0.128/25",       # collapsed with the previous network
+        "10.0.0.7",            # inside the collapsed network
+    ]
+    rules, summary = plan_scope_rules(targets)
+    assert sorted(rules) == sorted([
+        ("example.com", "host", True),
+        (r"\.example\.com$", "regex", True),
+        ("other.org", "host", True),
+        ("10.0.0.0/24", "cidr", True),
+    ])
+    assert summary["entries"] == 11
+    assert summary["out_of_scope"] == 1
+    assert summary["invalid"] == 1
+    assert summary["invalid_samples"] == ["not a target"]
+    assert summary["duplicates"] == 2
+    assert summary["covered"] == 3
+    assert (summary["hosts"], summary["suffixes"], summary["regexes"], summary["cidrs"]) == (2, 1, 0, 1)
+
+
+def test_plan_skips_what_existing_rules_cover():
+    existing = [
+        {"pattern": r"\.example\.com$", "type": "regex", "enabled": True},
+        {"pattern": r"\.example\.net", "type": "regex", "enabled": True},
+        {"pattern": "10.0.0.0/8", "type": "cidr", "enabled": True},
+        {"pattern": "taken.org", "type": "host", "enabled": False},
+    ]
+    matcher = RuleMatcher.from_rules(existing)
+    targets = ["a.example.com", "*.b.example.com", "*.example.net", "10.1.0.0/16", "taken.org", "free.org"]
+    rules, summary = plan_scope_rules(targets, matcher, [rule["pattern"] for rule in existing])
+    assert rules == [("free.org", "host", True)]
+    assert summary["covered"] == 3
+    # Listed already: the template form \.example\.net and the disabled host
+    assert summary["duplicates"] == 2
+
+
+def test_iter_scope_targets_formats(tmp_path):
+    text = tmp_path / "scope.txt"
+    text.write_text("a.example.com, b.example.com  # comment\n\n# only a comment\nc.example.com\n", encoding="utf-8")
+    assert list(iter_scope_targets(str(text))) == ["a.example.com", "b.example.com", "c.example.com"]
+
+    csv_file = tmp_path / "scope.csv"
+    csv_file.write_text("identifier,eligible_for_submission\na.example.com,true\nb.example.com,false\n",
+                        encoding="utf-8")
+    assert list(iter_scope_targets(str(csv_file))) == ["a.example.com", None]
+
+    lines = tmp_path / "scope.jsonl"
+    lines.write_text('{"target": "a.example.com"}\n\n{"target": "b.example.com", "in_scope": false}\n',
+                     encoding="utf-8")
+    assert list(iter_scope_targets(str(lines))) == ["a.example.com", None]
+
+
+def test_json_export_is_streamed_in_small_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(scope, "READ_SIZE", 7)
+    assets = [{"asset_identifier": f"host{index}.example.com", "eligible_for_submission": index % 3 != 0}
+              for index in range(50)]
+    path = tmp_path / "scope.json"
+    path.write_text(json.dumps({"relationships": {"structured_scopes": {"data": assets}}}) + "\n"
+                    + json.dumps([12345, "tail.example.com"]), encoding="utf-8")
+    expected = [None if index % 3 == 0 else f"host{index}.example.com" for index in range(50)]
+    assert list(iter_scope_targets(str(path))) == expected + ["tail.example.com"]
+
+
+def test_truncated_json_is_an_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(scope, "READ_SIZE", 4)
+    path = tmp_path / "scope.json"
+    path.write_text('["a.example.com", "b.exa', encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_scope_targets(str(path)))
+
+
+def test_ingest_scope(manager, tmp_path):
+    manager.add_rule(r"\.covered\.com", "regex")
+    path = tmp_path / "scope.txt"
+    path.write_text("*.example.com\na.example.com\nx.covered.com\n*.covered.com\nfree.org\n", encoding="utf-8")
+
+    preview = manager.ingest_scope(str(path), dry_run=True)
+    assert preview["added"] == 0
+    assert sorted(preview["rules"]) == [(r"\.example\.com$", "regex", True), ("free.org", "host", True)]
+
+    summary = manager.ingest_scope(str(path))
+    assert summary["added"] == 2
+    assert summary["rejected"] == []
+    matcher = manager.load_matcher()
+    assert matcher.match("deep.a.example.com") == r"\.example\.com$"
+    assert matcher.match("free.org") == "free.org"
+
+    # Running it again adds nothing
+    assert manager.ingest_scope(str(path))["added"] == 0
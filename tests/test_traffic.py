@@ -0,0 +1,170 @@
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import traffic
+from traffic import extract_host, iter_traffic
+
+
+def _entry(url, started="2024-03-01T12:00:00.000+01:00"):
+    return {"startedDateTime": started, "request": {"method": "GET", "url": url, "headers": []},
+            "response": {"status": 200, "content": {"text": "x" * 40}}}
+
+
+def _har(entries):
+    return '{"log": {"version": "1.2", "entries": [' + ", ".join(entries) + "]}}"
+
+
+@pytest.fixture(params=[1 << 20, 5], ids=["one-read", "small-reads"])
+def read_size(request, monkeypatch):
+    monkeypatch.setattr(traffic, "READ_SIZE", request.param)
+    return request.param
+
+
+def test_har_entries(tmp_path, read_size):
+    path = tmp_path / "capture.har"
+    entries = [json.dumps(_entry(f"https://host{index}.example.com:443/path?q={index}")) for index in range(20)]
+    path.write_text(_har(entries), encoding="utf-8")
+    found = list(iter_traffic(str(path)))
+    assert [host for host, _ in found] == [f"https://host{index}.example.com:443" for index in range(20)]
+    assert {timestamp for _, timestamp in found} == {"2024-03-01T11:00:00+00:00"}
+
+
+def test_har_malformed_entries_are_skipped(tmp_path, read_size):
+    path = tmp_path / "capture.har"
+    entries = [
+        json.dumps(_entry("https://a.example.com/")),
+        '{"request": {"url": "https://broken.example.com/", "headers": [,]}, "response": {}}',
+        json.dumps(_entry("https://b.example.com/", started="not a date")),
+        '{"request": {"method": "GET"}}',
+        '"not an entry"',
+        json.dumps(_entry("https://c.example.com/")),
+    ]
+    path.write_text(_har(entries), encoding="utf-8")
+    assert list(iter_traffic(str(path))) == [
+        ("https://a.example.com", "2024-03-01T11:00:00+00:00"),
+        (None, None),
+        ("https://b.example.com", None),
+        (None, None),
+        ("https://c.example.com", "2024-03-01T11:00:00+00:00"),
+    ]
+
+
+def test_har_oversized_entry_is_skipped(tmp_path, monkeypatch):
+    # The limit bounds how far the buffer grows for an entry spanning reads
+    monkeypatch.setattr(traffic, "READ_SIZE", 5)
+    monkeypatch.setattr(traffic, "MAX_ENTRY_SIZE", 200)
+    path = tmp_path / "capture.har"
+    huge = _entry("https://huge.example.com/")
+    huge["response"]["content"]["text"] = "y" * 1000
+    entries = [json.dumps(_entry("https://a.example.com/")), json.dumps(huge),
+               json.dumps(_entry("https://b.example.com/"))]
+    path.write_text(_har(entries), encoding="utf-8")
+    assert [host for host, _ in iter_traffic(str(path))] == ["https://a.example.com", None, "https://b.example.com"]
+
+
+def test_truncated_har_yields_the_entries_before_the_cut(tmp_path, read_size):
+    path = tmp_path / "capture.har"
+    text = _har([json.dumps(_entry(f"https://host{index}.example.com/")) for index in range(3)])
+    path.write_text(text[:text.rindex("host2") + 5], encoding="utf-8")
+    assert [host for host, _ in iter_traffic(str(path))] == ["https://host0.example.com", "https://host1.example.com"]
+
+
+def test_har_without_entries(tmp_path, read_size):
+    path = tmp_path / "capture.har"
+    path.write_text('{"log": {"version": "1.2", "pages": []}}', encoding="utf-8")
+    assert list(iter_traffic(str(path))) == []
+
+
+BURP_ITEM = """
+  <item>
+    <time>Fri Mar 01 12:00:00 UTC 2024</time>
+    <url><![CDATA[{url}]]></url>
+    {host}
+    <request base64="true"><![CDATA[R0VUIC8gSFRUUC8xLjE=]]></request>
+  </item>"""
+
+
+def _burp(items):
+    return '<?xml version="1.0"?>\n<items burpVersion="2024.1">' + "".join(items) + "\n</items>\n"
+
+
+def test_burp_items(tmp_path):
+    path = tmp_path / "export.xml"
+    path.write_text(_burp([
+        BURP_ITEM.format(url="https://a.example.com/x", host='<host ip="10.0.0.1">a.example.com</host>'),
+        BURP_ITEM.format(url="https://b.example.com:8443/y", host=""),
+        BURP_ITEM.format(url="", host="").replace("Fri Mar 01", "sometime"),
+    ]), encoding="utf-8")
+    assert list(iter_traffic(str(path))) == [
+        ("a.example.com", "2024-03-01T12:00:00+00:00"),
+        ("https://b.example.com:8443", "2024-03-01T12:00:00+00:00"),
+        (None, None),
+    ]
+
+
+def test_burp_items_are_detached_once_read(tmp_path, monkeypatch):
+    roots = []
+    iterparse = ET.iterparse
+
+    def recording_iterparse(*args, **kwargs):
+        for event, element in iterparse(*args, **kwargs):
+            if element.tag == "items":
+                roots.append(element)
+            yield event, element
+
+    monkeypatch.setattr(traffic.ET, "iterparse", recording_iterparse)
+    path = tmp_path / "export.xml"
+    path.write_text(_burp([BURP_ITEM.format(url=f"https://h{index}.example.com/", host="") for index in range(50)]),
+                    encoding="utf-8")
+    seen = set()
+    for host, _ in iter_traffic(str(path)):
+        seen.add(host + "/")
+        # The parser may have built items ahead, but none already yielded is kept
+        assert not seen & {child.findtext("url") for child in roots[0]}
+    assert len(seen) == 50
+    assert len(roots[0]) == 0
+
+
+def test_truncated_burp_export_raises_after_the_complete_items(tmp_path):
+    path = tmp_path / "export.xml"
+    text = _burp([BURP_ITEM.format(url=f"https://h{index}.example.com/", host="") for index in range(3)])
+    path.write_text(text[:text.rindex("<item>") + 20], encoding="utf-8")
+    found = []
+    with pytest.raises(ET.ParseError):
+        for host, _ in iter_traffic(str(path)):
+            found.append(host)
+    assert found == ["https://h0.example.com", "https://h1.example.com"]
+
+
+def test_logs_and_url_lists(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_text(
+        '1709294400.123 45 10.0.0.2 TCP_MISS/200 512 GET http://a.example.com/x - DIRECT/1.2.3.4 text/html\n'
+        '10.0.0.2 - - [01/Mar/2024:13:00:00 +0100] "CONNECT b.example.com:443 HTTP/1.1" 200 0\n'
+        "\n"
+        "c.example.com\n"
+        "not a request line\n",
+        encoding="utf-8")
+    assert list(iter_traffic(str(path))) == [
+        ("http://a.example.com", "2024-03-01T12:00:00+00:00"),
+        ("b.example.com:443", "2024-03-01T12:00:00+00:00"),
+        ("c.example.com", None),
+        (None, None),
+    ]
+
+
+def test_extract_host():
+    assert extract_host("GET https://user@a.example.com:8080/p?x HTTP/1.1") == "https://user@a.example.com:8080"
+    assert extract_host("  a.example.com \n") == "a.example.com"
+    assert extract_host("two words") is None
+
+
+def test_ingest_traffic_counts_malformed_entries_as_unparsed(manager, tmp_path, read_size):
+    manager.add_rule("a.example.com", "host")
+    path = tmp_path / "capture.har"
+    path.write_text(_har([json.dumps(_entry("https://a.example.com/")), '{"request": {"url": [}',
+                          json.dumps(_entry("https://z.example.com/"))]), encoding="utf-8")
+    summary = manager.ingest_traffic(str(path))
+    assert (summary["requests"], summary["matched"], summary["unmatched"], summary["unparsed"]) == (3, 1, 1, 1)